@@ -0,0 +1,109 @@
+# benchmark.py
+# Concurrent load benchmark for a running API server.
+#
+#   python benchmark.py --url http://localhost:8000 --concurrency 50 --requests 2000
+#
+# Run it once against the current tree and once against an older checkout
+# (same machine, same database, one uvicorn worker) to compare throughput.
+# Start the server with RATE_LIMIT_ENABLED=false SHED_MAX_IN_FLIGHT=0
+# SHED_MAX_LOOP_LAG_MS=0, or most requests will be answered 429/503.
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# One client at full speed is the point of most benchmarks, so they turn off
+# the per-client rate limits and load shedding (ratelimit.py), which would
+# answer most of their requests 429/503; benchmark_ratelimit.py keeps them on
+FULL_SPEED = {"RATE_LIMIT_ENABLED": "false", "SHED_MAX_IN_FLIGHT": "0", "SHED_MAX_LOOP_LAG_MS": "0"}
+
+def throwaway_database(name, full_speed=True, **settings):
+    # Points the in-process benchmarks' app at a fresh SQLite database and
+    # thumbnail cache in a new temporary directory, plus any other settings;
+    # call it before the app is imported. Returns the database's path.
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, f"{name}.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["MEDIA_CACHE_DIR"] = os.path.join(workdir, "media")
+    if full_speed:
+        os.environ.update(FULL_SPEED)
+    os.environ.update(settings)
+    return path
+
+async def run_scenario(client, name, make_request, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<28} {total / elapsed:>9.1f} req/s"
+        f"  p50 {statistics.median(latencies) * 1000:>7.1f} ms"
+        f"  p95 {percentile(latencies, 95) * 1000:>7.1f} ms"
+        f"  p99 {percentile(latencies, 99) * 1000:>7.1f} ms"
+        f"  errors {errors}"
+    )
+
+def list_destinations(client, i):
+    # Vary the filter so requests don't all hit one catalog cache entry
+    return client.get("/destinations", params={"min_price": i % 1000})
+
+def list_bookings(client, i):
+    return client.get(f"/users/{i % 2 + 1}/bookings")
+
+def create_booking(client, i):
+    departure = datetime.now() + timedelta(days=30 + i % 300)
+    return client.post("/bookings", json={
+        "user_id": 1,
+        "destination_id": 1,
+        "seat_class_id": 1,
+        "accommodation_id": 1,
+        "departure_date": departure.isoformat(),
+        "return_date": (departure + timedelta(days=7)).isoformat(),
+        "passengers": 1,
+    })
+
+SCENARIOS = {
+    "GET /destinations": list_destinations,
+    "GET /users/{id}/bookings": list_bookings,
+    "POST /bookings": create_booking,
+}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent load benchmark for the booking API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="Scenario to run (repeatable, default: all)")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        print(f"{args.url}: {args.requests} requests per scenario, concurrency {args.concurrency}")
+        for name in args.scenario or SCENARIOS:
+            await run_scenario(client, name, SCENARIOS[name], args.requests, args.concurrency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
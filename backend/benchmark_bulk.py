@@ -0,0 +1,77 @@
+# benchmark_bulk.py
+# Compares ingesting a partner batch through POST /bookings one row at a time
+# with a single POST /bookings/bulk call (JSON array and NDJSON).
+#
+#   python benchmark_bulk.py --rows 5000
+#
+# Runs the app in-process through httpx's ASGI transport, so no server is needed.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Single-row vs bulk booking ingestion benchmark")
+parser.add_argument("--rows", type=int, default=5000)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported, with enough
+# seats that inventory never rejects a row
+throwaway_database("bulk", SEATS_PER_LAUNCH=str(args.rows * 10))
+
+import httpx
+
+from main import app
+from manage import setup_database
+
+def make_rows(count):
+    rows = []
+    for i in range(count):
+        departure = datetime(2030, 1, 1, 9) + timedelta(days=i % 90)
+        rows.append({
+            "user_id": i % 2 + 1,
+            "destination_id": 1,
+            "seat_class_id": i % 3 + 1,
+            "accommodation_id": i % 3 + 1,
+            "departure_date": departure.isoformat(),
+            "return_date": (departure + timedelta(days=7)).isoformat(),
+            "passengers": i % 4 + 1,
+        })
+    return rows
+
+async def main():
+    setup_database()
+
+    rows = make_rows(args.rows)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        started = time.perf_counter()
+        for row in rows:
+            response = await client.post("/bookings", json=row)
+            response.raise_for_status()
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = await client.post("/bookings/bulk", json=rows)
+        response.raise_for_status()
+        bulk_array = time.perf_counter() - started
+        assert response.json()["created"] == args.rows, response.json()["errors"][:5]
+
+        body = "\n".join(json.dumps(row) for row in rows)
+        started = time.perf_counter()
+        response = await client.post("/bookings/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        bulk_ndjson = time.perf_counter() - started
+        assert response.json()["created"] == args.rows, response.json()["errors"][:5]
+
+    print(f"{args.rows} bookings")
+    for name, elapsed in [("POST /bookings x N", single), ("POST /bookings/bulk (JSON)", bulk_array), ("POST /bookings/bulk (NDJSON)", bulk_ndjson)]:
+        print(f"{name:<30} {elapsed:>8.2f} s  {args.rows / elapsed:>10.1f} rows/s  {single / elapsed:>6.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+# benchmark_bundle.py
+# Booking-page assembly: the destination, seat-class and accommodation calls
+# (one after another, as the UI makes them, and all three at once) against
+# one bundle call, with the catalog cache cold and warm; then a grid of
+# destinations as per-destination calls against one batch call.
+#
+#   python benchmark_bundle.py --destinations 2000 --pages 300 --rtt-ms 20
+#
+# Requests run in process, so there is no network in the numbers unless
+# --rtt-ms adds a simulated round trip to every request.
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description="Destination bundle benchmark")
+parser.add_argument("--destinations", type=int, default=2000)
+parser.add_argument("--pages", type=int, default=300)
+parser.add_argument("--grid", type=int, default=24, help="destinations on one grid page")
+parser.add_argument("--rtt-ms", type=float, default=0.0, help="simulated network round trip per request")
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("bundle")
+
+import httpx
+
+from cache import catalog_cache
+from database import SessionLocal
+from generate import add_catalog
+from main import app
+from manage import setup_database
+
+# The catalog inserts are slow queries by design
+logging.getLogger("space_travel.sql").setLevel(logging.ERROR)
+
+class RoundTripTransport(httpx.ASGITransport):
+    async def handle_async_request(self, request):
+        await asyncio.sleep(args.rtt_ms / 1000)
+        return await super().handle_async_request(request)
+
+def queries(response):
+    # From the Server-Timing header: db;dur=...;desc="N queries"
+    return int(response.headers["server-timing"].split('desc="')[1].split()[0])
+
+async def sequential(client, destination_id):
+    responses = []
+    for path in ("", "/seat-classes", "/accommodations"):
+        responses.append(await client.get(f"/destinations/{destination_id}{path}"))
+    return responses
+
+async def parallel(client, destination_id):
+    return await asyncio.gather(*(
+        client.get(f"/destinations/{destination_id}{path}") for path in ("", "/seat-classes", "/accommodations")
+    ))
+
+async def bundle(client, destination_id):
+    return [await client.get(f"/destinations/{destination_id}/bundle")]
+
+async def grid_calls(client, destination_ids):
+    return await asyncio.gather(*(
+        client.get(f"/destinations/{destination_id}{path}")
+        for destination_id in destination_ids for path in ("", "/seat-classes", "/accommodations")
+    ))
+
+async def grid_bundles(client, destination_ids):
+    return await asyncio.gather(*(client.get(f"/destinations/{destination_id}/bundle") for destination_id in destination_ids))
+
+async def grid_batch(client, destination_ids):
+    return [await client.get("/destinations/bundles", params={"ids": destination_ids})]
+
+async def measure(client, name, assemble, pages, cold):
+    latencies = []
+    statements = []
+    if not cold:
+        for page in pages:
+            await assemble(client, page)
+    for page in pages:
+        if cold:
+            catalog_cache.clear()
+        started = time.perf_counter()
+        responses = await assemble(client, page)
+        latencies.append(time.perf_counter() - started)
+        for response in responses:
+            response.raise_for_status()
+        statements.append(sum(queries(response) for response in responses))
+    print(
+        f"{name:<34} {'cold' if cold else 'warm'}"
+        f"  p50 {statistics.median(latencies) * 1000:>7.2f} ms  p95 {percentile(latencies, 95) * 1000:>7.2f} ms"
+        f"  {len(responses)} requests  {statistics.mean(statements):>5.1f} SQL statements"
+    )
+
+async def main():
+    setup_database()
+    with SessionLocal() as db:
+        catalog = add_catalog(db, random.Random(1), args.destinations, datetime.now())
+        db.commit()
+    destination_ids = [destination_id for destination_id, _, _ in catalog]
+    rng = random.Random(2)
+    pages = [rng.choice(destination_ids) for _ in range(args.pages)]
+    grids = [rng.sample(destination_ids, args.grid) for _ in range(max(args.pages // 10, 10))]
+
+    transport = RoundTripTransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # The bundle must carry exactly what the three calls return
+        for destination_id in pages[:20]:
+            destination, seat_classes, accommodations = [response.json() for response in await sequential(client, destination_id)]
+            combined = (await client.get(f"/destinations/{destination_id}/bundle")).json()
+            assert combined == {**destination, "seat_classes": seat_classes, "accommodations": accommodations}
+
+        print(f"{args.destinations} destinations, simulated round trip {args.rtt_ms:g} ms")
+        for cold in (True, False):
+            await measure(client, "3 calls, one after another", sequential, pages, cold)
+            await measure(client, "3 calls, concurrently", parallel, pages, cold)
+            await measure(client, "1 bundle call", bundle, pages, cold)
+        print(f"Grid of {args.grid} destinations:")
+        for cold in (True, False):
+            await measure(client, f"{3 * args.grid} calls, concurrently", grid_calls, grids, cold)
+            await measure(client, f"{args.grid} bundle calls, concurrently", grid_bundles, grids, cold)
+            await measure(client, "1 batch call", grid_batch, grids, cold)
+
+if __name__ == "__main__":
+    asyncio.run(main())
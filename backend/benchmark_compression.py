@@ -0,0 +1,105 @@
+# benchmark_compression.py
+# Bytes on the wire for a full page of booking history with and without
+# compression, and the CPU cost of encoding that page to JSON.
+#
+#   python benchmark_compression.py --bookings 200 --repeat 50
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Response compression and serialization benchmark")
+parser.add_argument("--bookings", type=int, default=200)
+parser.add_argument("--repeat", type=int, default=50)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("compression")
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import selectinload
+
+import models
+from database import SessionLocal
+from main import app, booking_list_adapter
+from manage import setup_database
+
+def add_bookings(count):
+    db = SessionLocal()
+    destination = db.query(models.Destination).first()
+    seat_class = destination.seat_classes[0]
+    accommodation = destination.accommodations[0]
+    departure = datetime(2031, 1, 1)
+    db.add_all(
+        models.Booking(
+            user_id=1, destination_id=destination.id, seat_class_id=seat_class.id,
+            accommodation_id=accommodation.id, departure_date=departure + timedelta(days=i),
+            return_date=departure + timedelta(days=i + 14), passengers=1 + i % 4,
+            total_price=seat_class.price, status="confirmed",
+        )
+        for i in range(count)
+    )
+    db.commit()
+    db.close()
+
+def serialization_cost():
+    db = SessionLocal()
+    bookings = (
+        db.query(models.Booking)
+        .options(selectinload(models.Booking.destination), selectinload(models.Booking.seat_class),
+                 selectinload(models.Booking.accommodation))
+        .filter(models.Booking.user_id == 1)
+        .limit(args.bookings)
+        .all()
+    )
+    db.close()
+
+    def encoder_path():
+        # What FastAPI's generic path does: validate, jsonable_encoder, json.dumps
+        validated = booking_list_adapter.validate_python(bookings, from_attributes=True)
+        return json.dumps(jsonable_encoder(validated)).encode()
+
+    def adapter_path():
+        return booking_list_adapter.dump_json(booking_list_adapter.validate_python(bookings, from_attributes=True))
+
+    for name, encode in [("jsonable_encoder + json.dumps", encoder_path), ("TypeAdapter.dump_json", adapter_path)]:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.process_time()
+            encode()
+            timings.append(time.process_time() - started)
+        print(f"{name:<30} {statistics.median(timings) * 1000:>7.2f} ms CPU per page of {len(bookings)}")
+
+async def main():
+    setup_database()
+    add_bookings(args.bookings)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        params = {"limit": min(args.bookings, 200)}
+        for encoding in ["identity", "gzip", "br"]:
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/users/1/bookings", params=params, headers={"Accept-Encoding": encoding})
+                latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            wire = int(response.headers.get("content-length", len(response.content)))
+            print(
+                f"{encoding:<9} {response.headers.get('content-encoding', 'identity'):<9} "
+                f"{wire:>8} bytes on the wire ({len(response.content)} decoded)  "
+                f"p50 {statistics.median(latencies) * 1000:>6.2f} ms"
+            )
+
+    serialization_cost()
+
+if __name__ == "__main__":
+    asyncio.run(main())
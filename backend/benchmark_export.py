@@ -0,0 +1,95 @@
+# benchmark_export.py
+# Peak memory and time of the streaming booking export against materializing
+# the same bookings as BookingWithDetails, at growing table sizes.
+#
+#   python benchmark_export.py --sizes 10000 50000 200000
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Streaming vs materialized booking export benchmark")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("export")
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+import models
+import schemas
+from database import AsyncSessionLocal, SessionLocal
+from export import export_query, stream_bookings
+from manage import setup_database
+
+booking_list_adapter = TypeAdapter(list[schemas.BookingWithDetails])
+
+def add_bookings(count):
+    db = SessionLocal()
+    start = datetime(2030, 1, 1, 9)
+    db.execute(insert(models.Booking), [
+        {
+            "user_id": i % 2 + 1,
+            "destination_id": i % 5 + 1,
+            "seat_class_id": (i % 5) * 3 + 1,
+            "accommodation_id": (i % 5) * 3 + 1,
+            "departure_date": start + timedelta(days=i % 365),
+            "return_date": start + timedelta(days=i % 365 + 7),
+            "passengers": 1,
+            "total_price": 1000000,
+            "status": "Confirmed",
+            "booking_date": start,
+        }
+        for i in range(count)
+    ])
+    db.commit()
+    db.close()
+
+async def materialized():
+    async with AsyncSessionLocal() as db:
+        bookings = (await db.scalars(
+            select(models.Booking).options(
+                joinedload(models.Booking.destination),
+                joinedload(models.Booking.seat_class),
+                joinedload(models.Booking.accommodation),
+            )
+        )).all()
+        return len(booking_list_adapter.dump_json(booking_list_adapter.validate_python(bookings, from_attributes=True)))
+
+async def streamed():
+    size = 0
+    async for chunk in stream_bookings(export_query(), "ndjson"):
+        size += len(chunk)
+    return size
+
+async def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = await run()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+async def main():
+    setup_database()
+
+    total = 0
+    for size in args.sizes:
+        add_bookings(size - total)
+        total = size
+        for name, run in [("materialized", materialized), ("streamed", streamed)]:
+            elapsed, peak, body = await measure(run)
+            print(f"{size:>9} bookings  {name:<13} {elapsed:>7.2f} s  peak {peak / 2**20:>8.1f} MiB  body {body / 2**20:>8.1f} MiB")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+# benchmark_features.py
+# Time to load and serialize a large accommodation list, the path every
+# catalog cache miss takes.
+#
+#   python benchmark_features.py --rows 10000 --repeat 5
+import argparse
+import os
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Accommodation list serialization benchmark")
+parser.add_argument("--rows", type=int, default=10000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("features", full_speed=False)
+
+from pydantic import TypeAdapter
+
+import models
+import schemas
+from database import SessionLocal
+from manage import setup_database
+
+accommodation_list_adapter = TypeAdapter(list[schemas.Accommodation])
+
+def main():
+    setup_database()
+    db = SessionLocal()
+    db.add_all(
+        models.Accommodation(
+            name=f"Pod {i}",
+            description="Basic accommodation with essential amenities and shared facilities.",
+            price_per_night=12000,
+            features=["Shared bathroom", "Basic amenities", "Daily cleaning", "Communal dining", f"Bay {i % 40}"],
+            rating=3.5,
+            destination_id=i % 5 + 1,
+        )
+        for i in range(args.rows)
+    )
+    db.commit()
+    db.close()
+
+    load, serialize = [], []
+    for _ in range(args.repeat):
+        db = SessionLocal()
+        started = time.perf_counter()
+        accommodations = db.query(models.Accommodation).all()
+        loaded = time.perf_counter()
+        accommodation_list_adapter.dump_json(accommodation_list_adapter.validate_python(accommodations, from_attributes=True))
+        # A second pass over the same objects, as when a list is serialized again
+        accommodation_list_adapter.dump_json(accommodation_list_adapter.validate_python(accommodations, from_attributes=True))
+        done = time.perf_counter()
+        db.close()
+        load.append(loaded - started)
+        serialize.append((done - loaded) / 2)
+
+    print(f"{len(accommodations)} accommodations, best of {args.repeat}")
+    print(f"load      {min(load) * 1000:>8.1f} ms")
+    print(f"serialize {min(serialize) * 1000:>8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmark_idempotency.py
+# Retry storm against POST /bookings with Idempotency-Key: every key is sent
+# several times at once, and the run fails unless each key produced exactly
+# one booking. Also compares first-request latency with replays.
+#
+#   python benchmark_idempotency.py --keys 200 --retries 5
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+parser = argparse.ArgumentParser(description="Idempotent booking benchmark")
+parser.add_argument("--keys", type=int, default=200)
+parser.add_argument("--retries", type=int, default=5, help="concurrent copies of each request")
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("idempotency")
+
+import httpx
+
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+
+def booking_payload(n):
+    return {
+        "user_id": 1, "destination_id": 1, "seat_class_id": 1, "accommodation_id": 1,
+        "departure_date": f"2032-{n % 12 + 1:02d}-{n % 28 + 1:02d}T09:00:00",
+        "return_date": f"2033-{n % 12 + 1:02d}-{n % 28 + 1:02d}T09:00:00",
+        "passengers": 1,
+    }
+
+def count_bookings():
+    with SessionLocal() as db:
+        return db.query(models.Booking).count()
+
+async def main():
+    setup_database()
+    before = count_bookings()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def post(n, key):
+            started = time.perf_counter()
+            response = await client.post("/bookings", json=booking_payload(n), headers={"Idempotency-Key": key})
+            response.raise_for_status()
+            return response, time.perf_counter() - started
+
+        keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(post(n, key) for n, key in enumerate(keys) for _ in range(args.retries)))
+        elapsed = time.perf_counter() - started
+
+        created = count_bookings() - before
+        by_key = {}
+        for (response, _), key in zip(results, [key for key in keys for _ in range(args.retries)]):
+            by_key.setdefault(key, set()).add(response.json()["id"])
+        replays = sum(response.headers.get("idempotent-replayed") == "true" for response, _ in results)
+        print(f"{len(results)} requests for {args.keys} keys in {elapsed:.2f}s: {created} bookings created, {replays} replayed")
+        assert created == args.keys, f"expected {args.keys} bookings, got {created}"
+        assert all(len(ids) == 1 for ids in by_key.values()), "a key returned more than one booking id"
+
+        # Sequential latency: a fresh key against a replay of it
+        first, replay = [], []
+        for n in range(50):
+            key = str(uuid.uuid4())
+            first.append((await post(n, key))[1])
+            replay.append((await post(n, key))[1])
+        print(f"first request p50 {statistics.median(first) * 1000:.2f} ms, replay p50 {statistics.median(replay) * 1000:.2f} ms")
+
+        response = await client.post("/bookings", json={**booking_payload(0), "passengers": 2}, headers={"Idempotency-Key": keys[0]})
+        assert response.status_code == 422, "reusing a key with a different body must be rejected"
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+# benchmark_inventory.py
+# Seat inventory stress test: fires many concurrent POST /bookings for one
+# launch at a fresh database and checks that no seat class is oversold.
+#
+#   python benchmark_inventory.py --bookings 2000 --capacity 500 --concurrency 100
+#
+# Runs the app in-process through httpx's ASGI transport, so no server is needed.
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Concurrent booking stress test for seat inventory")
+parser.add_argument("--bookings", type=int, default=2000)
+parser.add_argument("--capacity", type=int, default=500)
+parser.add_argument("--concurrency", type=int, default=100)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("stress", SEATS_PER_LAUNCH=str(args.capacity))
+
+import httpx
+from sqlalchemy import func, select
+
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+
+async def main():
+    setup_database()
+
+    departure = (datetime.now() + timedelta(days=60)).replace(hour=9, minute=0, second=0, microsecond=0)
+    payload = {
+        "user_id": 1,
+        "destination_id": 1,
+        "seat_class_id": 1,
+        "accommodation_id": 1,
+        "departure_date": departure.isoformat(),
+        "return_date": (departure + timedelta(days=7)).isoformat(),
+        "passengers": 1,
+    }
+
+    statuses = Counter()
+    remaining = iter(range(args.bookings))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=60) as client:
+        async def worker():
+            for _ in remaining:
+                response = await client.post("/bookings", json=payload)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    booked = db.scalar(
+        select(func.coalesce(func.sum(models.Booking.passengers), 0)).where(
+            models.Booking.seat_class_id == 1, models.Booking.departure_date == departure
+        )
+    )
+    reserved = db.scalar(
+        select(models.SeatInventory.reserved).where(
+            models.SeatInventory.seat_class_id == 1,
+            models.SeatInventory.launch_date == departure.date(),
+        )
+    )
+    db.close()
+
+    print(f"{args.bookings} requests, capacity {args.capacity}, concurrency {args.concurrency}")
+    print(f"{args.bookings / elapsed:.1f} req/s over {elapsed:.2f} s")
+    print("responses: " + ", ".join(f"{code}={count}" for code, count in sorted(statuses.items())))
+    print(f"seats booked {booked}, inventory reserved {reserved}")
+
+    expected = min(args.bookings, args.capacity)
+    if booked != expected or reserved != expected or statuses[200] != expected:
+        sys.exit(f"FAIL: expected exactly {expected} seats sold")
+    print("OK: no oversell")
+
+if __name__ == "__main__":
+    asyncio.run(main())
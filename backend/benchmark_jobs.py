@@ -0,0 +1,137 @@
+# benchmark_jobs.py
+# POST /bookings latency with follow-up work (confirmation email, payment
+# capture) run inline versus queued for the background workers, using local
+# stand-ins for the mail and payment services. The payment stand-in fails
+# the first capture of every Nth booking, so the drain time includes retries.
+# That every booking gets one email and one capture is checked by
+# tests/test_jobs.py.
+#
+#   python benchmark_jobs.py --bookings 300 --concurrency 5
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+parser = argparse.ArgumentParser(description="Background job benchmark")
+parser.add_argument("--bookings", type=int, default=300)
+parser.add_argument("--concurrency", type=int, default=5)
+parser.add_argument("--mail-ms", type=float, default=40, help="stand-in mail service latency")
+parser.add_argument("--payment-ms", type=float, default=120, help="stand-in payment service latency")
+parser.add_argument("--flaky-every", type=int, default=5, help="every Nth booking's first capture attempt fails")
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database, and retry quickly, before it is imported
+throwaway_database("jobs")
+os.environ.setdefault("JOB_BACKOFF_SECONDS", "0.05")
+os.environ.setdefault("JOB_POLL_SECONDS", "0.05")
+os.environ.setdefault("JOB_MAX_ATTEMPTS", "4")
+os.environ.setdefault("JOB_WORKERS", "4")
+
+import httpx
+from sqlalchemy import delete, func, select
+
+import followups
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+
+class StandInMailer:
+    def __init__(self):
+        self.sent = Counter()  # booking id -> emails
+
+    async def send(self, to, subject, body):
+        await asyncio.sleep(args.mail_ms / 1000)
+        self.sent[int(body.split(":")[0].split()[-1])] += 1
+
+class StandInPaymentGateway:
+    def __init__(self):
+        self.captured = Counter()  # reference -> successful captures
+        self.attempts = Counter()
+
+    async def capture(self, reference, amount):
+        self.attempts[reference] += 1
+        await asyncio.sleep(args.payment_ms / 1000)
+        flaky = int(reference.split("-")[1]) % args.flaky_every == 0 and self.attempts[reference] == 1
+        if flaky:
+            raise ConnectionError(f"payment service unavailable for {reference}")
+        self.captured[reference] += 1
+
+def booking_payload(n):
+    return {
+        "user_id": 1, "destination_id": 1 + n % 5, "seat_class_id": 1 + (n % 5) * 3, "accommodation_id": 1 + (n % 5) * 3,
+        "departure_date": f"2032-{n % 12 + 1:02d}-{n % 28 + 1:02d}T09:00:00",
+        "return_date": f"2033-{n % 12 + 1:02d}-{n % 28 + 1:02d}T09:00:00",
+        "passengers": 1,
+    }
+
+def job_counts():
+    with SessionLocal() as db:
+        return dict(db.execute(select(models.Job.status, func.count()).group_by(models.Job.status)).all())
+
+async def post_bookings(client, first, count, after=None):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, ids = [], []
+
+    async def one(n):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/bookings", json=booking_payload(n))
+            response.raise_for_status()
+            if after is not None:
+                await after(response.json()["id"])
+            latencies.append(time.perf_counter() - started)
+            ids.append(response.json()["id"])
+
+    await asyncio.gather(*(one(n) for n in range(first, first + count)))
+    return latencies, ids
+
+def report(name, latencies):
+    print(f"{name:<8} p50 {statistics.median(latencies) * 1000:>7.1f} ms  p99 {percentile(latencies, 99) * 1000:>7.1f} ms")
+
+async def main():
+    setup_database()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # Inline: the request does the follow-up work itself before returning
+        followups.mailer = StandInMailer()
+        followups.payment_gateway = StandInPaymentGateway()
+
+        async def inline(booking_id):
+            await followups.send_confirmation({"booking_id": booking_id})
+            for _ in range(int(os.environ["JOB_MAX_ATTEMPTS"])):
+                try:
+                    return await followups.capture_payment({"booking_id": booking_id})
+                except ConnectionError:
+                    pass
+
+        inline_latencies, _ = await post_bookings(client, 0, args.bookings, after=inline)
+        with SessionLocal() as db:
+            # Those bookings' work is done; drop their queued copies
+            db.execute(delete(models.Job))
+            db.commit()
+
+        # Queued: the same work goes to the worker pool started by the app
+        async with app.router.lifespan_context(app):
+            followups.mailer = StandInMailer()
+            followups.payment_gateway = gateway = StandInPaymentGateway()
+
+            queued_latencies, _ = await post_bookings(client, args.bookings, args.bookings)
+            started = time.perf_counter()
+            while job_counts().get("queued", 0) + job_counts().get("running", 0):
+                await asyncio.sleep(0.05)
+            drained = time.perf_counter() - started
+
+    report("inline", inline_latencies)
+    report("queued", queued_latencies)
+    counts = job_counts()
+    print(f"queue drained {drained:.2f}s after the last response; jobs {counts}; {sum(gateway.attempts.values())} capture attempts")
+
+if __name__ == "__main__":
+    asyncio.run(main())
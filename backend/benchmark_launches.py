@@ -0,0 +1,135 @@
+# benchmark_launches.py
+# Upcoming-launch queries over a schedule of millions of flights: GET
+# /launches for everywhere in a date window, for one destination, and deep
+# keyset pages, next to the same window read with the launches indexes
+# ignored (a table scan, which is what filtering parsed text amounts to).
+#
+#   python benchmark_launches.py --destinations 2000 --launches 2000000
+#
+# Launches are spread evenly over --years around today.
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="Launch schedule benchmark")
+parser.add_argument("--destinations", type=int, default=2000)
+parser.add_argument("--launches", type=int, default=1000000)
+parser.add_argument("--years", type=float, default=10.0)
+parser.add_argument("--requests", type=int, default=200)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database before it is imported
+database_path = throwaway_database("launches")
+
+import httpx
+
+import models
+from database import SessionLocal
+from generate import add_catalog, insert_batches
+from main import app
+from manage import migrate
+
+# The bulk inserts are slow queries by design
+logging.getLogger("space_travel.sql").setLevel(logging.ERROR)
+
+def add_launches(db, destination_ids, count, start, span_days):
+    rng = random.Random(3)
+    insert_batches(db, models.Launch, (
+        {"destination_id": rng.choice(destination_ids),
+         "departs_at": start + timedelta(minutes=rng.randrange(int(span_days * 1440))),
+         "duration_hours": rng.randrange(24, 20000), "capacity": 100,
+         "status": "Scheduled" if rng.random() < 0.98 else "Scrubbed"}
+        for _ in range(count)
+    ))
+
+def window(start, days):
+    return {"departs_from": start.isoformat(), "departs_to": (start + timedelta(days=days)).isoformat(), "limit": 50}
+
+async def measure(client, name, params_for):
+    rng = random.Random(4)
+    latencies = []
+    rows = 0
+    for _ in range(args.requests):
+        params = params_for(rng)
+        started = time.perf_counter()
+        response = await client.get("/launches", params=params)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        rows += len(response.json())
+    print(f"{name:<44} p50 {statistics.median(latencies) * 1000:>7.2f} ms  p95 {percentile(latencies, 95) * 1000:>7.2f} ms"
+          f"  {rows / args.requests:>5.1f} rows")
+
+async def deep_pages(client, pages):
+    # Follow X-Next-Cursor through consecutive pages of the whole schedule
+    latencies = []
+    params = {"limit": 200}
+    for _ in range(pages):
+        started = time.perf_counter()
+        response = await client.get("/launches", params=params)
+        latencies.append(time.perf_counter() - started)
+        params = {"limit": 200, "cursor": response.headers["x-next-cursor"]}
+    print(f"{f'{pages} consecutive pages of 200':<44} first {latencies[0] * 1000:>7.2f} ms  last {latencies[-1] * 1000:>7.2f} ms"
+          f"  p50 {statistics.median(latencies) * 1000:>7.2f} ms")
+
+def scan_baseline(window_start, window_end, destination_id):
+    # The same queries with the launches indexes ignored
+    # Stored the way SQLAlchemy writes DateTime on SQLite
+    window_start, window_end = window_start.isoformat(" "), window_end.isoformat(" ")
+    with sqlite3.connect(database_path) as conn:
+        queries = [
+            ("window, table scan", "SELECT * FROM launches NOT INDEXED WHERE status = 'Scheduled' AND departs_at >= ? "
+             "AND departs_at < ? ORDER BY departs_at, id LIMIT 50", (window_start, window_end)),
+            ("one destination, table scan", "SELECT * FROM launches NOT INDEXED WHERE status = 'Scheduled' "
+             "AND destination_id = ? AND departs_at >= ? ORDER BY departs_at, id LIMIT 20", (destination_id, window_start)),
+        ]
+        for name, sql, params in queries:
+            timings = []
+            for _ in range(5):
+                started = time.perf_counter()
+                conn.execute(sql, params).fetchall()
+                timings.append(time.perf_counter() - started)
+            print(f"{name:<44} p50 {statistics.median(timings) * 1000:>7.2f} ms")
+        for name, sql, params in queries:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql.replace(" NOT INDEXED", ""), params).fetchall()
+            print(f"  plan with indexes, {name.split(',')[0]}: {'; '.join(row[-1] for row in plan)}")
+
+async def main():
+    migrate()
+    now = datetime.now().replace(microsecond=0)
+    span_days = args.years * 365
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        catalog = add_catalog(db, random.Random(1), args.destinations, now)
+        destination_ids = [destination_id for destination_id, _, _ in catalog]
+        add_launches(db, destination_ids, args.launches, now - timedelta(days=span_days / 2), span_days)
+        db.commit()
+    print(f"{args.destinations} destinations, {args.launches} launches over {args.years:g} years:"
+          f" {time.perf_counter() - started:.1f}s to generate")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await measure(client, "upcoming, everywhere", lambda rng: {"limit": 50})
+        await measure(client, "30 days from a random day, everywhere", lambda rng: window(now + timedelta(days=rng.randrange(365)), 30))
+        await measure(client, "upcoming, one destination", lambda rng: {
+            "destination_id": rng.choice(destination_ids), "limit": 20,
+        })
+        await measure(client, "one destination, a year's window", lambda rng: {
+            "destination_id": rng.choice(destination_ids), "departs_to": (now + timedelta(days=365)).isoformat(),
+            "limit": 200,
+        })
+        await deep_pages(client, 200)
+
+    scan_baseline(now, now + timedelta(days=30), destination_ids[0])
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+# benchmark_media.py
+# The destination grid's images: one page of GET /destinations followed by
+# every image on it, fetched concurrently, as full-size originals against the
+# list's thumbnail_url variants (rendered cold, then from the disk cache),
+# and a repeat view revalidating with If-None-Match. Reports requests, bytes
+# and page time for each, and checks thumbnails, 304s and Range requests.
+#
+#   python benchmark_media.py --destinations 2000 --grid 24 --pages 50
+#
+# Requests run in process, so there is no network in the numbers: bytes are
+# what a client would download.
+import argparse
+import asyncio
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description="Destination grid media benchmark")
+parser.add_argument("--destinations", type=int, default=2000)
+parser.add_argument("--grid", type=int, default=24, help="destinations on one grid page")
+parser.add_argument("--pages", type=int, default=50)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database and thumbnail cache before it is imported
+throwaway_database("media")
+
+import httpx
+from sqlalchemy import select, update
+
+import config
+import media
+import media_versions
+import models
+from database import SessionLocal
+from generate import add_catalog
+from main import app
+from manage import setup_database
+
+# The catalog inserts are slow queries by design
+logging.getLogger("space_travel.sql").setLevel(logging.ERROR)
+
+def use_shipped_images(db):
+    # Generated destinations name images that don't exist; spread the ones in
+    # MEDIA_ROOT over the catalog instead
+    images = sorted(name for name in os.listdir(os.path.join(config.MEDIA_ROOT, "images")) if not name.startswith("."))
+    destination_ids = db.scalars(select(models.Destination.id).order_by(models.Destination.id)).all()
+    for n, image in enumerate(images):
+        db.execute(
+            update(models.Destination)
+            .where(models.Destination.id.in_(destination_ids[n::len(images)]))
+            .values(image_url=f"/images/{image}")
+        )
+    db.commit()
+    return images
+
+def page_params(cursor):
+    return {"limit": args.grid} if cursor is None else {"limit": args.grid, "cursor": cursor}
+
+async def grid_page(client, cursor, field, validators=None):
+    # One list call, then every image on the page at once; returns the time
+    # taken, the image responses and their ETags by URL
+    started = time.perf_counter()
+    listing = await client.get("/destinations", params=page_params(cursor))
+    listing.raise_for_status()
+    urls = [destination[field] for destination in listing.json() if destination[field]]
+    responses = await asyncio.gather(*(
+        client.get(url, headers={"If-None-Match": validators[url]} if validators else {}) for url in urls
+    ))
+    elapsed = time.perf_counter() - started
+    for response in responses:
+        assert response.status_code in (200, 304), f"{response.request.url}: {response.status_code}"
+    return elapsed, responses, {url: response.headers["etag"] for url, response in zip(urls, responses)}
+
+async def measure(client, name, field, cursors, validators=None):
+    timings, requests, total_bytes = [], 0, 0
+    for cursor in cursors:
+        elapsed, responses, _ = await grid_page(client, cursor, field, validators)
+        timings.append(elapsed)
+        requests += len(responses)
+        total_bytes += sum(len(response.content) for response in responses)
+    pages = len(cursors)
+    print(f"{name:<36} p50 {statistics.median(timings) * 1000:>8.2f} ms  p95 {percentile(timings, 95) * 1000:>8.2f} ms"
+          f"  {requests / pages:>5.1f} images  {total_bytes / pages / 1024:>9.1f} KiB per page")
+
+async def check(client, images):
+    original = await client.get(f"/images/{images[0]}")
+    partial = await client.get(f"/images/{images[0]}", headers={"Range": "bytes=0-65535"})
+    assert partial.status_code == 206 and len(partial.content) == 65536 and partial.content == original.content[:65536]
+    for width in media.THUMBNAIL_WIDTHS if media.Image is not None else ():
+        thumbnail = await client.get(f"/images/{images[0]}", params={"w": width})
+        assert media.Image.open(io.BytesIO(thumbnail.content)).size[0] <= width
+    revalidated = await client.get(f"/images/{images[0]}", headers={"If-None-Match": original.headers["etag"]})
+    assert revalidated.status_code == 304 and not revalidated.content
+    print(f"OK: Range gives 206 with the requested bytes, thumbnails fit {media.THUMBNAIL_WIDTHS}, revalidation gives 304")
+
+async def main():
+    setup_database()
+    with SessionLocal() as db:
+        add_catalog(db, random.Random(1), args.destinations, datetime.now())
+        db.commit()
+        images = use_shipped_images(db)
+    # As the app's lifespan does, which in-process requests skip
+    media_versions.refresh()
+    print(f"{args.destinations} destinations over {len(images)} shipped images, {args.grid} per grid page")
+    if media.Image is None:
+        print("Pillow is not installed; thumbnail URLs serve the originals")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # The cursors of consecutive grid pages, so every run walks the same pages
+        cursors, cursor = [], None
+        for _ in range(args.pages):
+            cursors.append(cursor)
+            response = await client.get("/destinations", params=page_params(cursor))
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+
+        await measure(client, "originals (image_url)", "image_url", cursors)
+        await measure(client, "thumbnails, rendered on first use", "thumbnail_url", cursors[:1])
+        await measure(client, "thumbnails, from the disk cache", "thumbnail_url", cursors)
+        _, _, originals = await grid_page(client, cursors[0], "image_url")
+        _, _, thumbnails = await grid_page(client, cursors[0], "thumbnail_url")
+        await measure(client, "repeat view, originals revalidated", "image_url", cursors[:1], originals)
+        await measure(client, "repeat view, thumbnails revalidated", "thumbnail_url", cursors[:1], thumbnails)
+        print("repeat view, versioned thumbnails: no image requests until the page changes (Cache-Control: immutable)")
+        await check(client, images)
+
+if __name__ == "__main__":
+    asyncio.run(main())
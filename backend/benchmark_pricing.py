@@ -0,0 +1,115 @@
+# benchmark_pricing.py
+# Pricing a batch of itineraries with every rule enabled: one trip_price call
+# per row (as a booking is priced), then PricingEngine.price_batch over the
+# same rows as columns, with numpy when it is installed and in plain Python.
+# Every method must produce the same prices.
+#
+#   python benchmark_pricing.py --rows 100000 --repeat 5
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pricing
+from pricing import Itineraries, Itinerary, PricingEngine, days_ahead, trip_price
+
+parser = argparse.ArgumentParser(description="Batch pricing benchmark")
+parser.add_argument("--rows", type=int, default=100000)
+parser.add_argument("--repeat", type=int, default=5)
+args = parser.parse_args()
+
+def itineraries(rng, count, now):
+    rows = []
+    for _ in range(count):
+        departure = now + timedelta(days=rng.randrange(1, 365))
+        rows.append({
+            "seat_price": rng.randrange(300000, 100000000),
+            "price_per_night": rng.randrange(3000, 5000000),
+            "passengers": rng.choice([1, 1, 2, 2, 3, 4, 5, 6, 8]),
+            "departure_date": departure,
+            "return_date": departure + timedelta(days=rng.randrange(0, 30)),
+            "load": rng.randrange(0, 10001),
+        })
+    return rows
+
+def columns(rows, now):
+    return Itineraries(
+        [row["seat_price"] for row in rows],
+        [row["price_per_night"] for row in rows],
+        [row["passengers"] for row in rows],
+        [(row["return_date"] - row["departure_date"]).days for row in rows],
+        [days_ahead(now, row["departure_date"]) for row in rows],
+        [row["load"] for row in rows],
+    )
+
+def per_row(rows, now):
+    return [
+        trip_price(row["seat_price"], row["price_per_night"], row["passengers"],
+                   row["departure_date"], row["return_date"], now, row["load"])
+        for row in rows
+    ]
+
+def batch(rows, now):
+    return pricing.engine.price_batch(columns(rows, now))
+
+def prepared_rows(rows, now):
+    return [
+        Itinerary(row["seat_price"], row["price_per_night"], row["passengers"],
+                  (row["return_date"] - row["departure_date"]).days, days_ahead(now, row["departure_date"]), row["load"])
+        for row in rows
+    ]
+
+def measure(name, price, prepare, expected):
+    # `prepare` runs outside the timing, so the rules are measured on their own
+    timings = []
+    for _ in range(args.repeat):
+        prepared = prepare()
+        started = time.perf_counter()
+        prices = price(prepared)
+        timings.append(time.perf_counter() - started)
+    assert prices == expected, f"{name} disagrees with trip_price"
+    best = min(timings)
+    print(f"{name:<40} median {statistics.median(timings) * 1000:>8.1f} ms  best {best * 1000:>8.1f} ms"
+          f"  {len(expected) / best / 1e6:>6.2f} M rows/s")
+
+def main():
+    now = datetime.now()
+    pricing.engine = pricing.build_engine("demand_surge,early_booking,passenger_tiers")
+    rows = itineraries(random.Random(1), args.rows, now)
+    expected = per_row(rows, now)
+    print(f"{args.rows} itineraries, rules: {', '.join(type(rule).__name__ for rule in pricing.engine.rules)}")
+
+    numpy = pricing.numpy
+    backends = [("numpy", numpy), ("plain Python", None)] if numpy is not None else [("plain Python", None)]
+    if numpy is None:
+        print("numpy is not installed; only the plain Python batch runs")
+
+    print("From booking rows (dates to days, then pricing):")
+    measure("trip_price per row", lambda rows: per_row(rows, now), lambda: rows, expected)
+    for name, module in backends:
+        pricing.numpy = module
+        measure(f"price_batch, {name}", lambda rows: batch(rows, now), lambda: rows, expected)
+
+    print("Pricing only (itineraries or columns built beforehand):")
+    pricing.numpy = numpy
+    measure("engine.price per row", lambda built: [pricing.engine.price(i) for i in built],
+            lambda: prepared_rows(rows, now), expected)
+    for name, module in backends:
+        pricing.numpy = module
+        measure(f"price_batch, {name}", pricing.engine.price_batch, lambda: columns(rows, now), expected)
+    pricing.numpy = numpy
+
+    # With no rules the engine charges the base fare
+    pricing.engine = PricingEngine()
+    assert batch(rows[:1000], now) == [
+        pricing.quote_price(row["seat_price"], row["price_per_night"], row["passengers"],
+                            (row["return_date"] - row["departure_date"]).days)
+        for row in rows[:1000]
+    ]
+
+if __name__ == "__main__":
+    main()
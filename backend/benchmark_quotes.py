@@ -0,0 +1,95 @@
+# benchmark_quotes.py
+# Quote search latency over a synthetic catalog, checked against pricing
+# every combination by brute force.
+#
+#   python benchmark_quotes.py --destinations 400 --repeat 200
+#
+# 400 destinations with 5 seat classes and 5 accommodations each is 10k
+# combinations.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Quote search benchmark")
+parser.add_argument("--destinations", type=int, default=400)
+parser.add_argument("--repeat", type=int, default=200)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("quotes")
+
+import httpx
+
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+from pricing import quote_price
+
+def add_catalog(count):
+    rng = random.Random(7)
+    db = SessionLocal()
+    for n in range(count):
+        destination = models.Destination(
+            name=f"Outpost {n}", description="Synthetic destination", type=rng.choice(["Space Station", "Planetary Base"]),
+            travel_time="3 days", base_price=rng.randrange(500000, 20000000), image_url="", next_launch="",
+        )
+        destination.seat_classes = [
+            models.SeatClass(name=f"Class {k}", description="", price=rng.randrange(500000, 50000000), features=[])
+            for k in range(5)
+        ]
+        destination.accommodations = [
+            models.Accommodation(name=f"Stay {k}", description="", price_per_night=rng.randrange(5000, 1000000), features=[], rating=4.0)
+            for k in range(5)
+        ]
+        db.add(destination)
+    db.commit()
+    db.close()
+
+def brute_force(passengers, nights, max_price, limit):
+    db = SessionLocal()
+    totals = sorted(
+        quote_price(seat.price, stay.price_per_night, passengers, nights)
+        for destination in db.query(models.Destination).all()
+        for seat in destination.seat_classes
+        for stay in destination.accommodations
+    )
+    db.close()
+    return [t for t in totals if max_price is None or t <= max_price][:limit]
+
+async def main():
+    setup_database()
+    add_catalog(args.destinations)
+    combinations = args.destinations * 25
+
+    queries = [
+        {"passengers": 2, "nights": 7, "limit": 50},
+        {"passengers": 4, "nights": 30, "max_price": 40000000, "limit": 200},
+        {"passengers": 1, "nights": 0, "limit": 10},
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        (await client.get("/quotes")).raise_for_status()
+        print(f"{combinations} combinations, first query (builds index) {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for params in queries:
+            expected = brute_force(params["passengers"], params["nights"], params.get("max_price"), params["limit"])
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/quotes", params=params)
+                latencies.append(time.perf_counter() - started)
+            totals = [quote["total_price"] for quote in response.json()]
+            assert totals == expected, f"quotes differ from brute force for {params}"
+            print(f"{str(params):<60} p50 {statistics.median(latencies) * 1000:>6.2f} ms  max {max(latencies) * 1000:>6.2f} ms  {len(totals)} quotes")
+
+if __name__ == "__main__":
+    asyncio.run(main())
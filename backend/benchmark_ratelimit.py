@@ -0,0 +1,109 @@
+# benchmark_ratelimit.py
+# A few aggressive clients hammer GET /destinations and POST /bookings while
+# one well-behaved client browses; reports what each sees with rate limiting
+# and load shedding off and on, then checks that a stalled event loop sheds.
+#
+#   python benchmark_ratelimit.py --aggressive 8 --concurrency 25 --seconds 5
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+parser = argparse.ArgumentParser(description="Rate limiting and load shedding benchmark")
+parser.add_argument("--aggressive", type=int, default=8, help="number of aggressive clients")
+parser.add_argument("--concurrency", type=int, default=25, help="requests in flight per aggressive client")
+parser.add_argument("--seconds", type=float, default=5)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("ratelimit", full_speed=False, SEATS_PER_LAUNCH="1000000")
+
+import httpx
+
+import config
+from main import app
+from manage import setup_database
+
+BOOKING = {
+    "user_id": 1, "destination_id": 1, "seat_class_id": 1, "accommodation_id": 1,
+    "departure_date": "2032-01-01T09:00:00", "return_date": "2032-01-08T09:00:00", "passengers": 1,
+}
+
+def client(address):
+    # Each client gets its own address, which is what the limiter keys on
+    transport = httpx.ASGITransport(app=app, client=(address, 4000), raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+async def aggressive(address, deadline, statuses):
+    async with client(address) as http:
+        async def loop(n):
+            while time.perf_counter() < deadline:
+                if n % 3:
+                    response = await http.get("/destinations", params={"sort": "price", "limit": 1 + n % 50})
+                else:
+                    response = await http.post("/bookings", json=BOOKING)
+                statuses[response.status_code] += 1
+                # A rejected request completes without ever suspending; yield
+                # as a real socket would, or this loop starves everyone else
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(loop(n) for n in range(args.concurrency)))
+
+async def polite(deadline):
+    latencies, statuses = [], Counter()
+    async with client("10.0.1.1") as http:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await http.get("/destinations", params={"type": "Space Station"})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            await asyncio.sleep(0.1)
+    return latencies, statuses
+
+async def scenario(name):
+    deadline = time.perf_counter() + args.seconds
+    statuses = Counter()
+    _, (latencies, polite_statuses) = await asyncio.gather(
+        asyncio.gather(*(aggressive(f"10.0.0.{n}", deadline, statuses) for n in range(args.aggressive))),
+        polite(deadline),
+    )
+    p99 = percentile(latencies, 99)
+    print(name)
+    print(f"  aggressive clients: {sum(statuses.values()) / args.seconds:.0f} req/s, statuses {dict(sorted(statuses.items()))}")
+    print(f"  polite client:      p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, "
+          f"statuses {dict(sorted(polite_statuses.items()))}")
+
+async def stalled_loop():
+    # Block the loop for longer than the lag threshold, as a synchronous call
+    # in a handler would, and check the next request is shed
+    config.SHED_MAX_LOOP_LAG_MS = 100
+    async with client("10.0.2.1") as http:
+        await http.get("/")  # starts the lag monitor
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)
+        await asyncio.sleep(0.06)
+        status = (await http.get("/")).status_code
+        await asyncio.sleep(0.2)
+        recovered = (await http.get("/")).status_code
+    print(f"after a 300 ms stall: {status}; once the loop catches up: {recovered}")
+    assert (status, recovered) == (503, 200)
+
+async def main():
+    setup_database()
+    # The load generator shares this event loop, so loop lag here measures the
+    # benchmark as much as the app; only in-flight shedding is on for the runs
+    config.SHED_MAX_LOOP_LAG_MS = 0
+    for enabled in (False, True):
+        config.RATE_LIMIT_ENABLED = enabled
+        config.SHED_MAX_IN_FLIGHT = 64 if enabled else 0
+        await scenario("limits and shedding on" if enabled else "limits and shedding off")
+    await stalled_loop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
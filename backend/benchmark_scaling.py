@@ -0,0 +1,152 @@
+# benchmark_scaling.py
+# Throughput of `python manage.py serve` from 1 to N worker processes on this
+# host: each run starts the real server on a throwaway database, drives a mix
+# of catalog, tips, quotes and launch requests from separate load-generator
+# processes over keep-alive connections, and reports requests per second and
+# latency per worker count. Meaningful on a multi-core box; the load
+# generators share the cores, so leave some for them.
+#
+#   python benchmark_scaling.py --max-workers 8 --clients 4 --connections 64 --duration 10
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND)
+
+from benchmark import FULL_SPEED, percentile
+
+PATHS = [
+    "/destinations?limit=20",
+    "/destinations/1",
+    "/destinations/bundles?ids=1&ids=2&ids=3",
+    "/space-travel-tips",
+    "/quotes?passengers=2&nights=7",
+    "/launches?limit=20",
+]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def connection(port, deadline, latencies, errors):
+    # A minimal HTTP/1.1 keep-alive client: httpx would spend more CPU per
+    # request than the server does and become the bottleneck
+    rng = random.Random()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(f"GET {rng.choice(PATHS)} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(head.split(b"\r\n", 1)[0].decode())
+    finally:
+        writer.close()
+
+def load(port, connections, duration):
+    # One load-generator process; returns its latencies and error lines
+    async def run():
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(connection(port, deadline, latencies, errors) for _ in range(connections)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+def drive(pool, port, clients, connections, duration):
+    per_client = max(1, connections // clients)
+    futures = [pool.submit(load, port, per_client, duration) for _ in range(clients)]
+    latencies, errors = [], []
+    for future in futures:
+        client_latencies, client_errors = future.result()
+        latencies += client_latencies
+        errors += client_errors
+    return latencies, errors
+
+def start_server(workers, port, env):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND, "manage.py"), "serve"],
+        env=dict(env, WEB_CONCURRENCY=str(workers), PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    sys.exit(f"FAIL: the server with {workers} workers did not come up")
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker scaling benchmark")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="load-generator processes")
+    parser.add_argument("--connections", type=int, default=64, help="keep-alive connections in total")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of load before measuring")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'scaling.db')}",
+        # Every worker starts at once: the first migrates and seeds, the rest wait on the lock
+        STARTUP_MIGRATE="true", STARTUP_SEED="true",
+        STARTUP_LOCK_PATH=os.path.join(workdir, "startup.lock"),
+        CATALOG_CACHE_SHARED_PATH=os.path.join(workdir, "catalog.generations"),
+        # Full speed is the point here: no access log or job workers either
+        ACCESS_LOG="false", JOB_WORKERS="0", **FULL_SPEED,
+    )
+    print(f"{os.cpu_count()} CPUs, {args.clients} load-generator processes, {args.connections} connections,"
+          f" {args.duration:g}s per run")
+    if (os.cpu_count() or 1) < 2:
+        print("Single CPU: extra workers only add contention here")
+
+    baseline = None
+    with ProcessPoolExecutor(args.clients) as pool:
+        for workers in range(1, args.max_workers + 1):
+            port = free_port()
+            server = start_server(workers, port, env)
+            try:
+                if args.warmup:
+                    drive(pool, port, args.clients, args.connections, args.warmup)
+                latencies, errors = drive(pool, port, args.clients, args.connections, args.duration)
+            finally:
+                stop_server(server)
+            throughput = len(latencies) / args.duration
+            baseline = baseline or throughput
+            print(f"{workers:>3} workers  {throughput:>8.0f} req/s  x{throughput / baseline:>5.2f}"
+                  f"  p50 {statistics.median(latencies) * 1000:>7.2f} ms  p99 {percentile(latencies, 99) * 1000:>7.2f} ms"
+                  f"  {len(errors)} errors")
+            if errors:
+                print(f"  first error: {errors[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmark_search.py
+# /search latency over a synthetic catalog (100k destinations and
+# accommodations by default) against a LIKE scan of the same columns, plus
+# the cost of keeping the index current as rows are inserted and updated.
+#
+#   python benchmark_search.py --rows 100000 --repeat 50
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="Catalog search benchmark")
+parser.add_argument("--rows", type=int, default=100000, help="destinations + accommodations")
+parser.add_argument("--repeat", type=int, default=50)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("search")
+
+import httpx
+from sqlalchemy import String, cast, insert, or_, select, update
+
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+
+THEMED = (
+    "orbital lunar martian europa venus titan ceres crater canyon ridge ice ocean cloud ring dome "
+    "habitat observatory station outpost colony research hotel resort base port zero gravity view "
+    "panoramic private shared suite cabin pod capsule garden spa dining lounge telescope rover walk "
+    "dust storm aurora eclipse sunrise horizon luxury budget family quiet premium classic deluxe"
+).split()
+
+# Themed words plus a few thousand made-up ones, drawn with a Zipf-like skew
+# so that, as in real text, a few words are everywhere and most are rare
+SYLLABLES = "ka lo mi ra ve tu si no ba de fi go ha ju ke ly".split()
+_rng = random.Random(5)
+WORDS = THEMED + sorted({"".join(_rng.choice(SYLLABLES) for _ in range(3)) for _ in range(4000)})
+WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+
+def phrase(rng, count):
+    return " ".join(rng.choices(WORDS, WEIGHTS, k=count))
+
+def add_catalog(rows):
+    rng = random.Random(11)
+    destinations = rows // 5
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        db.execute(insert(models.Destination), [
+            {"name": f"{phrase(rng, 2).title()} {n}", "description": phrase(rng, 25), "type": rng.choice(["Space Station", "Planetary Base", "Space Hotel"]),
+             "travel_time": "3 days", "base_price": 1000000, "image_url": "", "next_launch": ""}
+            for n in range(destinations)
+        ])
+        db.execute(insert(models.Accommodation), [
+            {"name": f"{phrase(rng, 2).title()} {n}", "description": phrase(rng, 20), "price_per_night": 10000,
+             "features": [phrase(rng, 2) for _ in range(4)], "rating": 4.0, "destination_id": 1 + n % destinations}
+            for n in range(rows - destinations)
+        ])
+        db.commit()
+        print(f"loaded {rows} rows (indexed by trigger) in {time.perf_counter() - started:.1f}s")
+
+def like_scan(words):
+    # What filtering the whole catalog without an index amounts to: every
+    # match has to be found before anything can be ranked
+    with SessionLocal() as db:
+        results = []
+        for model, columns in [
+            (models.Destination, [models.Destination.name, models.Destination.description, models.Destination.type]),
+            (models.Accommodation, [models.Accommodation.name, models.Accommodation.description, cast(models.Accommodation.features, String)]),
+        ]:
+            query = select(model.id)
+            for word in words:
+                query = query.where(or_(*(column.like(f"%{word}%") for column in columns)))
+            results.extend(db.scalars(query).all())
+        return results
+
+async def main():
+    setup_database()
+    add_catalog(args.rows)
+
+    queries = ["orbital", "lu", "hab", "zero gravity", "panoramic spa", "aurora quiet deluxe", WORDS[2000]]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'query':<28} {'/search p50':>12} {'p95':>9} {'LIKE scan p50':>15}")
+        for q in queries:
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/search", params={"q": q, "limit": 20})
+                latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            latencies.sort()
+            scans = []
+            for _ in range(3):
+                started = time.perf_counter()
+                like_scan(q.split())
+                scans.append(time.perf_counter() - started)
+            print(f"{q:<28} {statistics.median(latencies) * 1000:>9.2f} ms {latencies[int(len(latencies) * 0.95)] * 1000:>6.2f} ms "
+                  f"{statistics.median(scans) * 1000:>12.1f} ms")
+
+        # Incremental updates: a new row and a renamed one are searchable at once
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            db.add(models.Accommodation(name="Quasar Lodge", description="Brand new", price_per_night=1, features=["wormhole"], rating=5.0, destination_id=1))
+            db.execute(update(models.Destination).where(models.Destination.id == 1).values(name="Nebula Gateway"))
+            db.commit()
+            print(f"insert + update with index maintenance: {(time.perf_counter() - started) * 1000:.2f} ms")
+        names = {r["name"] for q in ["quasar", "wormh", "nebula"] for r in (await client.get("/search", params={"q": q})).json()}
+        assert {"Quasar Lodge", "Nebula Gateway"} <= names, names
+        old_name = (await client.get("/search", params={"q": "nebula", "kind": "destination"})).json()
+        assert [r["id"] for r in old_name] == [1]
+        print("OK: new and updated rows are searchable immediately")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+# benchmark_sqlite.py
+# Mixed read/write load against SQLite with and without the connection
+# pragmas from config.py (WAL, synchronous=NORMAL, busy_timeout, mmap).
+#
+#   python benchmark_sqlite.py --requests 3000 --concurrency 50 --write-ratio 0.3
+#
+# Each configuration runs in its own process on a fresh database, in-process
+# through httpx's ASGI transport. Failed requests are mostly "database is locked".
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import FULL_SPEED, percentile
+
+PRAGMA_SETTINGS = ["SQLITE_JOURNAL_MODE", "SQLITE_SYNCHRONOUS", "SQLITE_BUSY_TIMEOUT_MS", "SQLITE_MMAP_SIZE"]
+
+async def run_load(args):
+    import httpx
+
+    from main import app
+    from manage import setup_database
+
+    setup_database()
+
+    rng = random.Random(42)
+    plan = [rng.random() < args.write_ratio for _ in range(args.requests)]
+    remaining = iter(plan)
+    reads, writes, failures = [], [], 0
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker():
+            nonlocal failures
+            for write in remaining:
+                started = time.perf_counter()
+                if write:
+                    departure = datetime(2030, 1, 1, 9) + timedelta(days=rng.randrange(365))
+                    response = await client.post("/bookings", json={
+                        "user_id": rng.randint(1, 2),
+                        "destination_id": 1,
+                        "seat_class_id": rng.randint(1, 3),
+                        "accommodation_id": 1,
+                        "departure_date": departure.isoformat(),
+                        "return_date": (departure + timedelta(days=7)).isoformat(),
+                        "passengers": 1,
+                    })
+                else:
+                    response = await client.get(f"/users/{rng.randint(1, 2)}/bookings")
+                (writes if write else reads).append(time.perf_counter() - started)
+                if response.status_code >= 500:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": args.requests / elapsed,
+        "read_p95_ms": percentile(reads, 95) * 1000,
+        "write_p50_ms": statistics.median(writes) * 1000,
+        "write_p95_ms": percentile(writes, 95) * 1000,
+        "failures": failures,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite pragma mixed read/write benchmark")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_load(args))))
+        return
+
+    configurations = {
+        "SQLite defaults": {name: "" for name in PRAGMA_SETTINGS},
+        "config.py pragmas": {},
+    }
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.write_ratio:.0%} writes")
+    for name, overrides in configurations.items():
+        env = {key: value for key, value in os.environ.items() if key not in PRAGMA_SETTINGS}
+        env.update(overrides)
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/mixed.db"
+        env["SEATS_PER_LAUNCH"] = str(args.requests)
+        env.update(FULL_SPEED)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--write-ratio", str(args.write_ratio)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{name:<18} {result['throughput']:>8.1f} req/s"
+            f"  read p95 {result['read_p95_ms']:>7.1f} ms"
+            f"  write p50 {result['write_p50_ms']:>7.1f} ms"
+            f"  write p95 {result['write_p95_ms']:>7.1f} ms"
+            f"  failed {result['failures']}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmark_startup.py
+# Guards fast startup: importing main and running the app's lifespan must not
+# touch the database. Reports import and startup time, and exits non-zero if
+# any SQL is executed or a database file is created.
+#
+#   python benchmark_startup.py --repeat 5
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def measure():
+    # Runs in a fresh interpreter, so nothing is imported yet
+    import asyncio
+
+    from sqlalchemy import event
+
+    started = time.perf_counter()
+    import database
+    statements = []
+    for engine in (database.engine, database.async_engine.sync_engine):
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *rest: statements.append(statement))
+        event.listen(engine, "connect", lambda *rest: statements.append("<connect>"))
+
+    import main
+    imported = time.perf_counter()
+
+    async def lifespan():
+        async with main.app.router.lifespan_context(main.app):
+            pass
+
+    asyncio.run(lifespan())
+    started_up = time.perf_counter()
+    return {
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (started_up - imported) * 1000,
+        "statements": statements,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="App import and startup benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+        print(json.dumps(measure()))
+        return
+
+    database_path = os.path.join(tempfile.mkdtemp(), "startup.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database_path}")
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"import   best {min(r['import_ms'] for r in runs):>7.1f} ms  worst {max(r['import_ms'] for r in runs):>7.1f} ms")
+    print(f"startup  best {min(r['startup_ms'] for r in runs):>7.1f} ms  worst {max(r['startup_ms'] for r in runs):>7.1f} ms")
+
+    statements = runs[0]["statements"]
+    if statements or os.path.exists(database_path):
+        sys.exit(f"FAIL: startup touched the database: {statements[:5]}")
+    print("OK: no database I/O on import or startup")
+
+if __name__ == "__main__":
+    main()
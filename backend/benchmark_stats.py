@@ -0,0 +1,130 @@
+# benchmark_stats.py
+# Travel stats and the leaderboard on a synthetic user base: books through
+# the API, checks the incrementally maintained stats against a full
+# reconciliation, and compares the indexed leaderboard with ranking users by
+# aggregating their bookings on the fly.
+#
+#   python benchmark_stats.py --users 50000 --bookings 200000
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="User stats and leaderboard benchmark")
+parser.add_argument("--users", type=int, default=50000)
+parser.add_argument("--bookings", type=int, default=200000, help="historical bookings inserted directly")
+parser.add_argument("--api-bookings", type=int, default=500, help="bookings made through POST /bookings")
+parser.add_argument("--repeat", type=int, default=50)
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import throwaway_database
+
+# Point the app at a throwaway database before it is imported
+throwaway_database("stats")
+
+import httpx
+from sqlalchemy import func, insert, select, text
+
+import models
+from database import SessionLocal
+from main import app
+from manage import setup_database
+from stats import COUNTED_STATUSES, reconcile
+
+STAT_COLUMNS = [models.User.id, models.User.total_miles, models.User.completed_trips,
+                models.User.destinations, models.User.traveler_level]
+
+def add_history():
+    rng = random.Random(3)
+    with SessionLocal() as db:
+        db.execute(insert(models.User), [
+            {"username": f"traveler{n}", "email": f"traveler{n}@example.com", "hashed_password": "x", "full_name": f"Traveler {n}"}
+            for n in range(args.users)
+        ])
+        user_ids = db.scalars(select(models.User.id)).all()
+        seat_classes = db.execute(select(models.SeatClass.id, models.SeatClass.destination_id)).all()
+        departure = datetime(2020, 1, 1)
+        db.execute(insert(models.Booking), [
+            {
+                "user_id": rng.choice(user_ids), "destination_id": destination_id, "seat_class_id": seat_class_id,
+                "accommodation_id": 1, "departure_date": departure, "return_date": departure + timedelta(days=7),
+                "passengers": 1, "total_price": 1, "status": rng.choice(["Completed", "Completed", "Cancelled"]),
+                "booking_date": departure,
+            }
+            for seat_class_id, destination_id in (rng.choice(seat_classes) for _ in range(args.bookings))
+        ])
+        started = time.perf_counter()
+        reconcile(db)
+        db.commit()
+        print(f"reconcile over {args.users} users / {args.bookings} bookings: {time.perf_counter() - started:.2f}s")
+        return user_ids, seat_classes
+
+def snapshot():
+    with SessionLocal() as db:
+        return db.execute(select(*STAT_COLUMNS).order_by(models.User.id)).all()
+
+def timed(run):
+    latencies = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+async def main():
+    setup_database()
+    user_ids, seat_classes = add_history()
+
+    rng = random.Random(5)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def book(n):
+            seat_class_id, destination_id = rng.choice(seat_classes)
+            departure = datetime(2031, 1, 1) + timedelta(days=n % 365)
+            response = await client.post("/bookings", json={
+                "user_id": rng.choice(user_ids[:100]), "destination_id": destination_id, "seat_class_id": seat_class_id,
+                "accommodation_id": 1, "departure_date": departure.isoformat(),
+                "return_date": (departure + timedelta(days=7)).isoformat(), "passengers": 1,
+            })
+            response.raise_for_status()
+
+        await asyncio.gather(*(book(n) for n in range(args.api_bookings)))
+
+        incremental = snapshot()
+        with SessionLocal() as db:
+            reconcile(db)
+            db.commit()
+        drift = [(a, b) for a, b in zip(incremental, snapshot()) if a != b]
+        print(f"{args.api_bookings} API bookings: {len(drift)} users differ from a full reconciliation")
+        assert not drift, drift[:5]
+
+        for by in ["miles", "level"]:
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                (await client.get("/leaderboard", params={"by": by, "limit": 50})).raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            print(f"GET /leaderboard?by={by:<6} p50 {statistics.median(latencies) * 1000:.2f} ms")
+
+    with SessionLocal() as db:
+        plan = db.execute(text("EXPLAIN QUERY PLAN SELECT * FROM users ORDER BY total_miles DESC, id DESC LIMIT 50")).all()
+        print("leaderboard plan:", "; ".join(row[-1] for row in plan))
+        on_the_fly = (
+            select(models.Booking.user_id, func.sum(2 * models.Destination.distance_miles).label("miles"))
+            .join(models.Destination, models.Destination.id == models.Booking.destination_id)
+            .where(models.Booking.status.in_(COUNTED_STATUSES))
+            .group_by(models.Booking.user_id)
+            .order_by(text("miles DESC"))
+            .limit(50)
+        )
+        indexed = select(models.User).order_by(models.User.total_miles.desc(), models.User.id.desc()).limit(50)
+        print(f"top 50 by aggregating bookings  p50 {timed(lambda: db.execute(on_the_fly).all()):.2f} ms")
+        print(f"top 50 from the users index     p50 {timed(lambda: db.scalars(indexed).all()):.2f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
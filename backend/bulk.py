@@ -0,0 +1,164 @@
+# bulk.py
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from fastapi import HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, select
+
+import config
+import models
+import schemas
+import pricing
+from inventory import launch_date_of, launch_loads, try_reserve_seats
+from pricing import Itineraries, days_ahead
+from followups import booking_jobs
+from jobs import enqueue
+from launches import arrival_error, arrivals
+from stats import record_trips, status_delta
+
+booking_create_adapter = TypeAdapter(schemas.BookingCreate)
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+def validation_detail(error: ValidationError):
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+async def ndjson_lines(request: Request):
+    # Split the body into lines as it arrives instead of buffering it whole
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    yield pending
+
+async def read_booking_rows(request: Request):
+    # Returns [(row index, BookingCreate or error message)]; a malformed row
+    # only fails that row, a malformed envelope fails the whole request
+    rows = []
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if media_type in NDJSON_MEDIA_TYPES:
+        async for line in ndjson_lines(request):
+            if not line.strip():
+                continue
+            try:
+                rows.append((len(rows), booking_create_adapter.validate_json(line)))
+            except ValidationError as e:
+                rows.append((len(rows), validation_detail(e)))
+            if len(rows) > config.BULK_BOOKING_MAX_ROWS:
+                break
+    else:
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for index, item in enumerate(payload):
+            try:
+                rows.append((index, booking_create_adapter.validate_python(item)))
+            except ValidationError as e:
+                rows.append((index, validation_detail(e)))
+
+    if len(rows) > config.BULK_BOOKING_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {config.BULK_BOOKING_MAX_ROWS} bookings per request")
+    return rows
+
+async def ingest_bookings(db, rows):
+    errors = [schemas.BulkBookingError(index=index, detail=row) for index, row in rows if isinstance(row, str)]
+    bookings = [(index, row) for index, row in rows if not isinstance(row, str)]
+
+    # Resolve every referenced id with one IN query per table instead of
+    # three primary-key lookups per row
+    destination_ids = set((await db.scalars(
+        select(models.Destination.id).where(models.Destination.id.in_({b.destination_id for _, b in bookings}))
+    )).all())
+    seat_prices = dict((await db.execute(
+        select(models.SeatClass.id, models.SeatClass.price)
+        .where(models.SeatClass.id.in_({b.seat_class_id for _, b in bookings}))
+    )).all())
+    nightly_rates = dict((await db.execute(
+        select(models.Accommodation.id, models.Accommodation.price_per_night)
+        .where(models.Accommodation.id.in_({b.accommodation_id for _, b in bookings}))
+    )).all())
+
+    # Trips on a scheduled launch can't end before it arrives; the launches
+    # are looked up for the whole batch at once, not per row
+    arrival_times = await arrivals(db, {(b.destination_id, launch_date_of(b.departure_date)) for _, b in bookings})
+
+    launches = defaultdict(list)
+    for index, booking in bookings:
+        arrives_at = arrival_times.get((booking.destination_id, launch_date_of(booking.departure_date)))
+        if booking.destination_id not in destination_ids:
+            errors.append(schemas.BulkBookingError(index=index, detail="Destination not found"))
+        elif booking.seat_class_id not in seat_prices:
+            errors.append(schemas.BulkBookingError(index=index, detail="Seat class not found"))
+        elif booking.accommodation_id not in nightly_rates:
+            errors.append(schemas.BulkBookingError(index=index, detail="Accommodation not found"))
+        elif arrives_at is not None and booking.return_date < arrives_at:
+            errors.append(schemas.BulkBookingError(index=index, detail=arrival_error(arrives_at)))
+        else:
+            launches[booking.seat_class_id, launch_date_of(booking.departure_date)].append((index, booking))
+
+    # Demand rules price every row against its launch as it was before this
+    # batch, looked up with one query for all launches
+    loads = await launch_loads(db, launches) if pricing.engine.uses_demand else {}
+
+    # Reserve each launch's seats in one statement; if the whole group does
+    # not fit, fall back to row by row so as many bookings as possible land
+    accepted = []
+    for (seat_class_id, launch_date), group in launches.items():
+        if await try_reserve_seats(db, seat_class_id, launch_date, sum(b.passengers for _, b in group)):
+            accepted.extend(group)
+            continue
+        for index, booking in group:
+            if await try_reserve_seats(db, seat_class_id, launch_date, booking.passengers):
+                accepted.append((index, booking))
+            else:
+                errors.append(schemas.BulkBookingError(index=index, detail="Seat class is sold out for this launch"))
+
+    accepted.sort(key=lambda item: item[0])
+    now = datetime.now()
+    # The whole batch is priced in one pass over columns rather than row by row
+    prices = pricing.engine.price_batch(Itineraries(
+        [seat_prices[b.seat_class_id] for _, b in accepted],
+        [nightly_rates[b.accommodation_id] for _, b in accepted],
+        [b.passengers for _, b in accepted],
+        [(b.return_date - b.departure_date).days for _, b in accepted],
+        [days_ahead(now, b.departure_date) for _, b in accepted],
+        [loads.get((b.seat_class_id, launch_date_of(b.departure_date)), 0) for _, b in accepted],
+    ))
+    values = [
+        {
+            "user_id": booking.user_id,
+            "destination_id": booking.destination_id,
+            "seat_class_id": booking.seat_class_id,
+            "accommodation_id": booking.accommodation_id,
+            "departure_date": booking.departure_date,
+            "return_date": booking.return_date,
+            "passengers": booking.passengers,
+            "total_price": price,
+            "status": "Confirmed",
+            "booking_date": now,
+        }
+        for (_, booking), price in zip(accepted, prices)
+    ]
+
+    booking_ids = []
+    if values:
+        # One executemany INSERT for the whole batch, in the same transaction
+        # as the seat reservations
+        booking_ids = (await db.scalars(
+            insert(models.Booking).returning(models.Booking.id, sort_by_parameter_order=True), values
+        )).all()
+        await record_trips(db, [(v["user_id"], v["destination_id"], status_delta(None, v["status"])) for v in values])
+        await enqueue(db, [job for booking_id in booking_ids for job in booking_jobs(booking_id)])
+    await db.commit()
+
+    errors.sort(key=lambda error: error.index)
+    return schemas.BulkBookingResult(created=len(booking_ids), booking_ids=booking_ids, errors=errors)
@@ -0,0 +1,203 @@
+# cache.py
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import config
+import models
+from locks import locked
+
+def not_modified(request: Request, etag, last_modified):
+    # Whether the client's validators still match (`last_modified` is a Unix time)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: compressed responses carry W/"..." for the same body
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+        except (TypeError, ValueError):
+            return False
+    return False
+
+class CachedResponse:
+    def __init__(self, body, destination_id=None, headers=None):
+        self.body = body
+        self.destination_id = destination_id
+        self.headers = headers or {}
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        # HTTP dates have one-second resolution; round up so a rebuild right
+        # after a write never advertises a date a client already holds
+        self.last_modified = math.ceil(time.time())
+        self.created_at = time.monotonic()
+
+    def not_modified(self, request: Request):
+        return not_modified(request, self.etag, self.last_modified)
+
+    def to_response(self, request: Request):
+        headers = {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            **self.headers,
+        }
+        if self.not_modified(request):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+# Invalidation generations: a counter per destination slot plus one for the
+# list entries. A cache entry remembers the counter it was built under and is
+# stale once that counter moves. LocalGenerations keeps the counters in this
+# process; SharedGenerations keeps them in a memory-mapped file, so a write
+# served by any worker on the host drops the entries every other worker built
+# before it. Destinations share slots modulo the slot count, which only costs
+# the odd extra miss.
+LIST_SLOT = 0
+COUNTER = struct.Struct("<Q")
+
+class LocalGenerations:
+    def __init__(self, slots):
+        self.slots = slots
+        self._counts = [0] * slots
+
+    def current(self, slot):
+        return self._counts[slot]
+
+    def bump(self, slots):
+        for slot in set(slots):
+            self._counts[slot] += 1
+
+class SharedGenerations:
+    def __init__(self, path, slots):
+        self.slots = slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = slots * COUNTER.size
+        with locked(self._fd):
+            # The first process to open the file sizes it (zero-filled)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def current(self, slot):
+        # Unlocked: a torn read can only look like a change, i.e. a spurious miss
+        return COUNTER.unpack_from(self._map, slot * COUNTER.size)[0]
+
+    def bump(self, slots):
+        with locked(self._fd):
+            for slot in set(slots):
+                COUNTER.pack_into(self._map, slot * COUNTER.size, self.current(slot) + 1)
+
+def catalog_generations():
+    if config.CATALOG_CACHE_SHARED_PATH:
+        return SharedGenerations(config.CATALOG_CACHE_SHARED_PATH, config.CATALOG_CACHE_SHARED_SLOTS)
+    return LocalGenerations(config.CATALOG_CACHE_SHARED_SLOTS)
+
+# LRU cache of serialized catalog responses with a TTL. Entries are tagged with
+# the destination they belong to, so a write to one destination (or its seat
+# classes/accommodations) only drops that destination's entries plus the
+# destination list pages. Bodies stay in each process; only the generations
+# are shared between workers.
+class CatalogCache:
+    def __init__(self, max_entries, ttl_seconds, generations):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generations = generations
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _slot(self, destination_id):
+        if destination_id is None:
+            return LIST_SLOT
+        return 1 + destination_id % (self.generations.slots - 1)
+
+    def generation(self, destination_id=None):
+        # Take this before reading what goes into an entry, and pass it to
+        # set(): a write that commits mid-build then leaves the entry stale
+        return self.generations.current(self._slot(destination_id))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if (time.monotonic() - entry.created_at > self.ttl_seconds
+                    or entry.generation != self.generation(entry.destination_id)):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, body, destination_id=None, headers=None, generation=None):
+        entry = CachedResponse(body, destination_id, headers)
+        entry.generation = self.generation(destination_id) if generation is None else generation
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_destination(self, destination_id):
+        # List entries (destination_id None) may contain any destination, so they go too
+        self.generations.bump([self._slot(destination_id), LIST_SLOT])
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.destination_id in (destination_id, None)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+catalog_cache = CatalogCache(config.CATALOG_CACHE_MAX_ENTRIES, config.CATALOG_CACHE_TTL_SECONDS, catalog_generations())
+
+async def cached_json_response(request: Request, key, build, destination_id=None):
+    # build() is only awaited on a miss; it returns (body bytes, extra headers)
+    entry = catalog_cache.get(key)
+    if entry is None:
+        generation = catalog_cache.generation(destination_id)
+        body, headers = await build()
+        entry = catalog_cache.set(key, body, destination_id, headers, generation)
+    return entry.to_response(request)
+
+# Invalidation: collect the destinations touched by each flush and drop their
+# entries once the transaction commits. Writes that bypass the ORM unit of
+# work (bulk UPDATE/DELETE statements) must call catalog_cache directly.
+# Other catalog-derived state registers here to hear about the same commits;
+# each listener is called with the set of touched destination ids.
+catalog_change_listeners = []
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_writes(session, flush_context):
+    touched = session.info.setdefault("catalog_writes", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Destination):
+            touched.add(obj.id)
+        elif isinstance(obj, (models.SeatClass, models.Accommodation)):
+            touched.add(obj.destination_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_writes(session):
+    touched = session.info.pop("catalog_writes", None)
+    if not touched:
+        return
+    for destination_id in touched:
+        catalog_cache.invalidate_destination(destination_id)
+    for listener in catalog_change_listeners:
+        listener(touched)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_writes(session):
+    session.info.pop("catalog_writes", None)
@@ -0,0 +1,198 @@
+# changes.py
+import asyncio
+import logging
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+import config
+import models
+from database import AsyncSessionLocal
+from followups import change_jobs
+import pricing
+from inventory import ensure_inventory, launch_date_of, launch_loads, release_seats, reserve_seats
+from jobs import enqueue
+from launches import check_return_after_arrival, day_range, scrub_launches
+from pricing import trip_price
+from schemas import check_trip_dates
+from stats import record_trips, status_delta
+
+logger = logging.getLogger("space_travel.changes")
+
+# Bookings can be changed or cancelled until their launch; Completed and
+# Cancelled ones are final
+CHANGEABLE_STATUSES = ("Confirmed", "Pending")
+
+# Only Confirmed bookings have been charged (see followups.BOOKING_JOBS)
+CHARGED_STATUSES = ("Confirmed",)
+
+def stale(booking_id):
+    return HTTPException(status_code=409, detail=f"Booking {booking_id} was changed by someone else; reload it and retry")
+
+async def load_for_change(db, booking_id, version):
+    booking = await db.get(models.Booking, booking_id)
+    if booking is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if booking.status not in CHANGEABLE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"{booking.status} bookings can't be changed")
+    if booking.version != version:
+        raise stale(booking_id)
+    return booking
+
+async def save(db, booking, values):
+    # Optimistic concurrency: the UPDATE only matches the version the client
+    # read, so of two concurrent changes the second matches nothing and gets
+    # a 409 instead of overwriting the first. No row is locked while the
+    # client decides; the check and the write are one statement.
+    saved = (await db.scalars(
+        update(models.Booking)
+        .where(models.Booking.id == booking.id, models.Booking.version == booking.version)
+        .values(**values, version=models.Booking.version + 1)
+        .returning(models.Booking)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )).one_or_none()
+    if saved is None:
+        raise stale(booking.id)
+    return saved
+
+def charged(status, amount):
+    return amount if status in CHARGED_STATUSES else 0
+
+async def modify_booking(db, booking_id, change):
+    booking = await load_for_change(db, booking_id, change.version)
+    old_status, old_price = booking.status, booking.total_price
+    old_seats = (booking.seat_class_id, launch_date_of(booking.departure_date), booking.passengers)
+
+    values = change.model_dump(exclude_unset=True, exclude={"version"})
+    values = {field: value for field, value in values.items() if value is not None}
+    seat_class_id = values.get("seat_class_id", booking.seat_class_id)
+    accommodation_id = values.get("accommodation_id", booking.accommodation_id)
+    departure_date = values.get("departure_date", booking.departure_date)
+    return_date = values.get("return_date", booking.return_date)
+    passengers = values.get("passengers", booking.passengers)
+    try:
+        check_trip_dates(departure_date, return_date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # The trip stays at its destination; the class and stay must belong to it
+    seat_class = await db.get(models.SeatClass, seat_class_id)
+    if seat_class is None or seat_class.destination_id != booking.destination_id:
+        raise HTTPException(status_code=422, detail="Seat class not found at this destination")
+    accommodation = await db.get(models.Accommodation, accommodation_id)
+    if accommodation is None or accommodation.destination_id != booking.destination_id:
+        raise HTTPException(status_code=422, detail="Accommodation not found at this destination")
+    await check_return_after_arrival(db, booking.destination_id, departure_date, return_date)
+
+    # Priced like a new booking made now (POST /bookings), against the new
+    # launch's load without this booking's own seats
+    new_seats = (seat_class_id, launch_date_of(departure_date), passengers)
+    load = 0
+    if pricing.engine.uses_demand:
+        loads = await launch_loads(db, [new_seats[:2]], released=[old_seats])
+        load = loads[new_seats[:2]]
+    values["total_price"] = trip_price(
+        seat_class.price, accommodation.price_per_night, passengers, departure_date, return_date, datetime.now(), load,
+    )
+    if new_seats != old_seats:
+        # Open both launches' inventory while the booking still holds its old
+        # seats, so neither row counts it on the wrong launch
+        await ensure_inventory(db, *old_seats[:2])
+        await ensure_inventory(db, *new_seats[:2])
+    booking = await save(db, booking, values)
+
+    # Seats move only if the class, launch or party size changed. The old ones
+    # go back first, so moving within a full launch still works; a sold-out
+    # new launch fails with 409 and the whole change rolls back.
+    if new_seats != old_seats:
+        await release_seats(db, [old_seats])
+        await reserve_seats(db, *new_seats)
+
+    await enqueue(db, change_jobs(booking.id, booking.version, charged(old_status, booking.total_price - old_price)))
+    return booking
+
+async def cancel_booking(db, booking_id, version):
+    booking = await load_for_change(db, booking_id, version)
+    old_status = booking.status
+    booking = await save(db, booking, {"status": "Cancelled"})
+    await release_seats(db, [(booking.seat_class_id, launch_date_of(booking.departure_date), booking.passengers)])
+    await record_trips(db, [(booking.user_id, booking.destination_id, status_delta(old_status, booking.status))])
+    await enqueue(db, change_jobs(booking.id, booking.version, -charged(old_status, booking.total_price)))
+    return booking
+
+async def cancel_launch(db, destination_id, launch_date):
+    # A scrubbed launch: its open bookings are cancelled set-based, and
+    # seats, travel stats and follow-up jobs are settled with one statement
+    # each, however many travelers were booked.
+    if await db.get(models.Destination, destination_id) is None:
+        raise HTTPException(status_code=404, detail="Destination not found")
+    await scrub_launches(db, destination_id, launch_date)
+    start, end = day_range(launch_date)
+    rows = []
+    # One UPDATE per open status (two statements, whatever the launch's
+    # size) rather than one for both: RETURNING yields the row as written,
+    # on SQLite and PostgreSQL alike, so a single statement would report
+    # every booking as Cancelled and lose the status it had. That status
+    # decides the refund (only Confirmed bookings were charged) and the stats
+    # delta. Reading the statuses first instead would be a third statement,
+    # and a booking changed between the read and the write would be settled
+    # wrongly; filtering each UPDATE on the status makes the pair exact.
+    for status in CHANGEABLE_STATUSES:
+        cancelled = await db.execute(
+            update(models.Booking)
+            .where(
+                models.Booking.destination_id == destination_id,
+                models.Booking.departure_date >= start,
+                models.Booking.departure_date < end,
+                models.Booking.status == status,
+            )
+            .values(status="Cancelled", version=models.Booking.version + 1)
+            .returning(models.Booking.id, models.Booking.version, models.Booking.user_id,
+                       models.Booking.seat_class_id, models.Booking.passengers, models.Booking.total_price)
+            .execution_options(synchronize_session=False)
+        )
+        rows.extend((status, row) for row in cancelled)
+
+    await release_seats(db, [(row.seat_class_id, launch_date, row.passengers) for _, row in rows])
+    await record_trips(db, [(row.user_id, destination_id, status_delta(status, "Cancelled")) for status, row in rows])
+    await enqueue(db, [
+        job for status, row in rows for job in change_jobs(row.id, row.version, -charged(status, row.total_price))
+    ])
+    return {
+        "destination_id": destination_id,
+        "launch_date": launch_date,
+        "cancelled": len(rows),
+        "seats_released": sum(row.passengers for _, row in rows),
+    }
+
+async def complete_trips(db):
+    # Confirmed bookings whose return date has passed were flown: one UPDATE
+    # marks them all Completed and returns who flew where, and their
+    # travelers' stats move with one record_trips call. Only rows still
+    # Confirmed match, so runs racing in several processes complete each
+    # trip once. Pending bookings were never paid for and stay as they are.
+    completed = (await db.execute(
+        update(models.Booking)
+        .where(models.Booking.status == "Confirmed", models.Booking.return_date < datetime.now())
+        .values(status="Completed", version=models.Booking.version + 1)
+        .returning(models.Booking.user_id, models.Booking.destination_id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    delta = status_delta("Confirmed", "Completed")
+    await record_trips(db, [(row.user_id, row.destination_id, delta) for row in completed])
+    return len(completed)
+
+async def keep_completing_trips():
+    # Run by the API's lifespan and `manage.py worker`; waits before its first
+    # pass, so starting the app does no database I/O
+    while True:
+        await asyncio.sleep(config.TRIP_COMPLETION_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                completed = await complete_trips(db)
+                await db.commit()
+            if completed:
+                logger.info("Completed %s trips", completed)
+        except Exception:
+            logger.exception("Trip completion failed")
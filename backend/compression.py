@@ -0,0 +1,105 @@
+# compression.py
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+import config
+
+# Already-compressed or event-stream bodies are passed through untouched
+SKIP_MEDIA_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+def accepted_encodings(scope):
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return {part.split(";")[0].strip() for part in value.decode("latin-1").lower().split(",")}
+    return set()
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(config.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body, final):
+        flush = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(body) + self._compressor.flush(flush)
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=config.BROTLI_QUALITY)
+
+    def compress(self, body, final):
+        data = self._compressor.process(body)
+        return data + (self._compressor.finish() if final else self._compressor.flush())
+
+def choose_encoder(scope):
+    accepted = accepted_encodings(scope)
+    if brotli is not None and "br" in accepted:
+        return BrotliEncoder
+    if "gzip" in accepted:
+        return GzipEncoder
+    return None
+
+# Negotiated response compression, brotli preferred over gzip. Bodies under
+# COMPRESSION_MIN_BYTES go out as-is; streamed bodies are compressed chunk by
+# chunk with a sync flush so clients can decode as data arrives.
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        encoder_class = choose_encoder(scope) if scope["type"] == "http" else None
+        if encoder_class is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                media_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or message["status"] in (204, 206, 304)
+                    or media_type.startswith(SKIP_MEDIA_TYPES)
+                )
+                if passthrough:
+                    return await send(message)
+                start = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = [(k, v) for k, v in start.get("headers", []) if k != b"content-length"]
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body and len(body) < config.COMPRESSION_MIN_BYTES:
+                    passthrough = True
+                    await send({**start, "headers": start["headers"] + [(b"vary", b"Accept-Encoding")]})
+                    return await send(message)
+                encoder = encoder_class()
+                headers.append((b"content-encoding", encoder.name.encode()))
+                # The compressed body is a different representation, so its
+                # ETag can only be a weak match for the original
+                headers = [(k, b"W/" + v if k == b"etag" and not v.startswith(b"W/") else v) for k, v in headers]
+                if not more_body:
+                    body = encoder.compress(body, final=True)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    return await send({**message, "body": body})
+                await send({**start, "headers": headers})
+                start = None
+            await send({**message, "body": encoder.compress(body, final=not more_body)})
+
+        await self.app(scope, receive, send_compressed)
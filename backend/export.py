@@ -0,0 +1,82 @@
+# export.py
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+import config
+import models
+from database import AsyncSessionLocal
+
+# One flat row per booking; the joined names come from the same statement, so
+# there are no per-row lookups
+EXPORT_COLUMNS = [
+    models.Booking.id,
+    models.Booking.user_id,
+    models.Booking.booking_date,
+    models.Booking.departure_date,
+    models.Booking.return_date,
+    models.Booking.passengers,
+    models.Booking.total_price,
+    models.Booking.status,
+    models.Booking.destination_id,
+    models.Destination.name.label("destination_name"),
+    models.Booking.seat_class_id,
+    models.SeatClass.name.label("seat_class_name"),
+    models.Booking.accommodation_id,
+    models.Accommodation.name.label("accommodation_name"),
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+def export_query(status=None, destination_id=None, booked_from=None, booked_to=None,
+                 departure_from=None, departure_to=None):
+    query = (
+        select(*EXPORT_COLUMNS)
+        .join(models.Destination, models.Booking.destination_id == models.Destination.id)
+        .join(models.SeatClass, models.Booking.seat_class_id == models.SeatClass.id)
+        .join(models.Accommodation, models.Booking.accommodation_id == models.Accommodation.id)
+    )
+    if status is not None:
+        query = query.where(models.Booking.status == status)
+    if destination_id is not None:
+        query = query.where(models.Booking.destination_id == destination_id)
+    if booked_from is not None:
+        query = query.where(models.Booking.booking_date >= booked_from)
+    if booked_to is not None:
+        query = query.where(models.Booking.booking_date < booked_to)
+    if departure_from is not None:
+        query = query.where(models.Booking.departure_date >= departure_from)
+    if departure_to is not None:
+        query = query.where(models.Booking.departure_date < departure_to)
+    return query.order_by(models.Booking.id)
+
+def ndjson_batch(rows):
+    # Datetimes are the only non-JSON values; encode them like the API does
+    return "".join(
+        json.dumps(row._asdict(), default=datetime.isoformat, separators=(",", ":")) + "\n" for row in rows
+    )
+
+def csv_batch(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+async def stream_bookings(query, format):
+    # The generator owns its session, since it keeps reading after the route
+    # has returned. Rows come off a server-side cursor yield_per at a time and
+    # each batch is encoded and sent before the next is fetched, so memory
+    # stays flat however many bookings match.
+    encode = csv_batch if format == "csv" else ndjson_batch
+    if format == "csv":
+        yield csv_header()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=config.EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield encode(rows)
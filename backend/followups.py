@@ -0,0 +1,93 @@
+# followups.py
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+import models
+from database import AsyncSessionLocal
+from jobs import job_handler
+
+logger = logging.getLogger("space_travel.followups")
+
+# Work that follows a booking but need not hold up its response. POST /bookings
+# enqueues these in the booking's transaction; workers run them afterwards.
+BOOKING_JOBS = ("booking.confirmation_email", "booking.capture_payment")
+
+def booking_jobs(booking_id):
+    return [(kind, {"booking_id": booking_id}) for kind in BOOKING_JOBS]
+
+def change_jobs(booking_id, version, amount):
+    # After a booking is changed or cancelled: tell the traveler, and capture
+    # (amount > 0) or refund (amount < 0) the price difference. `version` is
+    # the booking's version after the change, which keys the adjustment.
+    jobs = [("booking.change_email", {"booking_id": booking_id})]
+    if amount:
+        jobs.append(("booking.adjust_payment", {"booking_id": booking_id, "version": version, "amount": amount}))
+    return jobs
+
+# Outside services. These defaults only log; deployments (and benchmarks)
+# replace them with real clients by assigning followups.mailer and
+# followups.payment_gateway.
+class LogMailer:
+    async def send(self, to, subject, body):
+        logger.info("Mail to %s: %s", to, subject)
+
+class LogPaymentGateway:
+    async def capture(self, reference, amount):
+        # `reference` is stable per booking so the gateway can ignore a
+        # capture retried after a timeout
+        logger.info("Capture %s for %s", amount, reference)
+
+    async def refund(self, reference, amount):
+        logger.info("Refund %s for %s", amount, reference)
+
+mailer = LogMailer()
+payment_gateway = LogPaymentGateway()
+
+async def load_booking(booking_id):
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(models.Booking)
+            .options(joinedload(models.Booking.user), joinedload(models.Booking.destination))
+            .where(models.Booking.id == booking_id)
+        )).scalar_one()
+
+@job_handler("booking.confirmation_email")
+async def send_confirmation(payload):
+    booking = await load_booking(payload["booking_id"])
+    await mailer.send(
+        booking.user.email,
+        f"Your trip to {booking.destination.name} is confirmed",
+        f"Booking {booking.id}: {booking.passengers} passenger(s) departing "
+        f"{booking.departure_date:%B %d, %Y}. Total ${booking.total_price:,}.",
+    )
+
+@job_handler("booking.capture_payment")
+async def capture_payment(payload):
+    booking = await load_booking(payload["booking_id"])
+    await payment_gateway.capture(f"booking-{booking.id}", booking.total_price)
+
+@job_handler("booking.change_email")
+async def send_change(payload):
+    booking = await load_booking(payload["booking_id"])
+    if booking.status == "Cancelled":
+        subject = f"Your trip to {booking.destination.name} is cancelled"
+    else:
+        subject = f"Your trip to {booking.destination.name} has changed"
+    await mailer.send(
+        booking.user.email,
+        subject,
+        f"Booking {booking.id}: {booking.passengers} passenger(s) departing "
+        f"{booking.departure_date:%B %d, %Y}. Total ${booking.total_price:,}.",
+    )
+
+@job_handler("booking.adjust_payment")
+async def adjust_payment(payload):
+    # One reference per booking version, so a retried adjustment is ignored
+    # by the gateway but each later change is charged or refunded separately
+    reference = f"booking-{payload['booking_id']}-v{payload['version']}"
+    if payload["amount"] > 0:
+        await payment_gateway.capture(reference, payload["amount"])
+    else:
+        await payment_gateway.refund(reference, -payload["amount"])
@@ -0,0 +1,230 @@
+# generate.py
+# Seeded synthetic dataset for performance work: thousands of destinations,
+# millions of bookings, and a long-tailed user base where a few frequent
+# travelers and popular destinations account for most bookings.
+#
+#   DATABASE_URL=sqlite:////tmp/large.db python generate.py --destinations 2000 --users 200000 --bookings 2000000
+#
+# The same --seed always produces the same rows. Rows are appended to
+# whatever the database already holds, so point DATABASE_URL at a scratch
+# database rather than a real one.
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import accumulate
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, insert, select
+
+import config
+import models
+from database import SessionLocal
+from launches import parse_travel_time
+from manage import migrate
+from pricing import nightly_rate, quote_price, seat_class_price
+from stats import reconcile
+
+BATCH_SIZE = 20000
+LAUNCH_HORIZON_DAYS = 1095  # Launches run from two years ago to a year ahead
+
+# Search and names draw on this vocabulary, so /search has realistic hits
+NAME_PARTS = ["Lunar", "Orbital", "Martian", "Europa", "Titan", "Kepler", "Nova", "Aurora", "Helios", "Vesta",
+              "Ceres", "Callisto", "Ganymede", "Io", "Phobos", "Deimos", "Triton", "Oberon", "Rhea", "Enceladus"]
+NAME_SUFFIXES = ["Gateway", "Outpost", "Colony", "Station", "Habitat", "Observatory", "Resort", "Base", "Dome", "Ring"]
+TYPES = ["Space Station", "Planetary Base", "Moon Base", "Orbital Resort", "Atmospheric Observatory", "Asteroid Colony"]
+WORDS = ["breathtaking", "views", "crater", "ice", "canyon", "zero-gravity", "spa", "research", "laboratory", "dunes",
+         "volcano", "aurora", "rings", "eclipse", "sunrise", "geysers", "ocean", "telescope", "garden", "dining",
+         "excursions", "spacewalk", "rover", "mining", "history", "landing", "panorama", "nebula", "comet", "orbit"]
+SEAT_CLASSES = [("Economy", 70), ("Luxury Cabin", 25), ("VIP Zero-G Suite", 5)]  # name, share %
+STAYS = [("Standard Pod", 3.5, 60), ("Comfort Suite", 4.2, 30), ("Luxury Habitat", 4.8, 10)]  # name, rating, share %
+PASSENGERS = [(1, 45), (2, 30), (3, 10), (4, 10), (5, 3), (6, 2)]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October",
+          "November", "December"]
+
+def zipf_weights(count, exponent):
+    # Cumulative weights for rng.choices: rank n is picked in proportion to 1 / n^exponent
+    return list(accumulate(1 / (n + 1) ** exponent for n in range(count)))
+
+def insert_batches(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+
+def new_ids(db, column, after):
+    return db.scalars(select(column).where(column > after).order_by(column)).all()
+
+def max_id(db, column):
+    return db.scalar(select(func.max(column))) or 0
+
+def describe(rng, words):
+    return " ".join(rng.sample(WORDS, words)).capitalize() + "."
+
+def add_catalog(db, rng, count, today):
+    before = max_id(db, models.Destination.id)
+    destinations = []
+    for n in range(count):
+        # Distances are log-uniform from low orbit to the outer planets
+        distance = int(10 ** rng.uniform(2.3, 8.7))
+        days = max(1, distance // 1000000)
+        launch = today + timedelta(days=rng.randrange(1, 365))
+        destinations.append({
+            "name": f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_SUFFIXES)} {before + n + 1}",
+            "description": describe(rng, 12),
+            "type": rng.choice(TYPES),
+            "travel_time": f"{days} days" if days < 60 else f"{days // 30} months",
+            "base_price": int(10 ** rng.uniform(5.5, 7.5)) // 1000 * 1000,
+            "image_url": f"/images/destination-{n % 50}.jpg",
+            "next_launch": f"{MONTHS[launch.month - 1]} {launch.day}, {launch.year}",
+            "distance_miles": distance,
+        })
+    insert_batches(db, models.Destination, destinations)
+    destination_ids = new_ids(db, models.Destination.id, before)
+
+    seat_before = max_id(db, models.SeatClass.id)
+    stay_before = max_id(db, models.Accommodation.id)
+    insert_batches(db, models.SeatClass, (
+        {"name": name, "description": describe(rng, 8), "price": seat_class_price(row["base_price"], name),
+         "features": rng.sample(WORDS, 4), "destination_id": destination_id}
+        for destination_id, row in zip(destination_ids, destinations)
+        for name, _ in SEAT_CLASSES
+    ))
+    insert_batches(db, models.Accommodation, (
+        {"name": f"{name} at {row['name']}", "description": describe(rng, 8),
+         "price_per_night": nightly_rate(row["base_price"], name), "features": rng.sample(WORDS, 5),
+         "rating": round(min(5.0, rating + rng.uniform(-0.4, 0.4)), 1), "destination_id": destination_id}
+        for destination_id, row in zip(destination_ids, destinations)
+        for name, rating, _ in STAYS
+    ))
+
+    # Per destination: its seat classes and stays (id, price), in SEAT_CLASSES / STAYS order
+    seats = {}
+    for row in db.execute(select(models.SeatClass.id, models.SeatClass.price, models.SeatClass.destination_id)
+                          .where(models.SeatClass.id > seat_before).order_by(models.SeatClass.id)):
+        seats.setdefault(row.destination_id, []).append((row.id, row.price))
+    stays = {}
+    for row in db.execute(select(models.Accommodation.id, models.Accommodation.price_per_night, models.Accommodation.destination_id)
+                          .where(models.Accommodation.id > stay_before).order_by(models.Accommodation.id)):
+        stays.setdefault(row.destination_id, []).append((row.id, row.price_per_night))
+    return [(destination_id, seats[destination_id], stays[destination_id]) for destination_id in destination_ids]
+
+def add_users(db, rng, count, seed):
+    before = max_id(db, models.User.id)
+    insert_batches(db, models.User, (
+        {"username": f"traveler-{seed}-{n}", "email": f"traveler-{seed}-{n}@example.com", "hashed_password": "x",
+         "full_name": f"{rng.choice(NAME_PARTS)} Traveler {n}", "bio": describe(rng, 6),
+         "avatar_url": f"/avatars/user{n % 20}.jpg"}
+        for n in range(count)
+    ))
+    return new_ids(db, models.User.id, before)
+
+def add_launches(db, rng, catalog, today):
+    # Each destination launches on its own schedule, every week to every two
+    # months, from two years ago to a year ahead. Returns per destination
+    # (first launch, days between launches, hours in flight).
+    travel_times = dict(db.execute(
+        select(models.Destination.id, models.Destination.travel_time)
+        .where(models.Destination.id.in_([destination_id for destination_id, _, _ in catalog]))
+    ).all())
+    schedules = [
+        (today - timedelta(days=rng.randrange(730)), rng.randrange(7, 60), parse_travel_time(travel_times[destination_id]))
+        for destination_id, _, _ in catalog
+    ]
+    insert_batches(db, models.Launch, (
+        {"destination_id": destination_id, "departs_at": first_launch + timedelta(days=interval * n),
+         "duration_hours": duration, "capacity": config.SEATS_PER_LAUNCH, "status": "Scheduled"}
+        for (destination_id, _, _), (first_launch, interval, duration) in zip(catalog, schedules)
+        for n in range(LAUNCH_HORIZON_DAYS // interval)
+    ))
+    return schedules
+
+def booking_rows(rng, count, users, catalog, schedules, today, reserved):
+    # Frequent travelers and popular destinations follow a Zipf curve, and
+    # every booking is on one of its destination's launches, so bookings pile
+    # up on the same launches like they do in production
+    user_weights = zipf_weights(len(users), 0.6)
+    destination_weights = zipf_weights(len(catalog), 0.8)
+    seat_weights = [share for _, share in SEAT_CLASSES]
+    stay_weights = [share for _, _, share in STAYS]
+    passenger_values, passenger_weights = zip(*PASSENGERS)
+
+    for _ in range(count // BATCH_SIZE + 1):
+        size = min(BATCH_SIZE, count)
+        count -= size
+        user_ids = rng.choices(users, cum_weights=user_weights, k=size)
+        picks = rng.choices(range(len(catalog)), cum_weights=destination_weights, k=size)
+        for user_id, pick in zip(user_ids, picks):
+            destination_id, seats, stays = catalog[pick]
+            first_launch, interval, duration = schedules[pick]
+            departure = first_launch + timedelta(days=interval * rng.randrange(LAUNCH_HORIZON_DAYS // interval))
+            seat_class_id, seat_price = rng.choices(seats, weights=seat_weights)[0]
+            accommodation_id, price_per_night = rng.choices(stays, weights=stay_weights)[0]
+            passengers = rng.choices(passenger_values, weights=passenger_weights)[0]
+            # The stay starts when the launch arrives
+            return_date = departure + timedelta(hours=duration, days=rng.randrange(1, 30))
+            nights = (return_date - departure).days
+            booked = min(today, departure - timedelta(days=rng.randrange(1, 365), seconds=rng.randrange(86400)))
+            if departure < today:
+                status = "Completed" if rng.random() < 0.85 else "Cancelled"
+            else:
+                status = rng.choices(["Confirmed", "Pending", "Cancelled"], weights=[80, 10, 10])[0]
+            if status != "Cancelled":
+                reserved[seat_class_id, departure.date()] += passengers
+            yield {
+                "user_id": user_id, "destination_id": destination_id, "seat_class_id": seat_class_id,
+                "accommodation_id": accommodation_id, "departure_date": departure,
+                "return_date": return_date, "passengers": passengers,
+                "total_price": quote_price(seat_price, price_per_night, passengers, nights),
+                "status": status, "booking_date": booked,
+            }
+
+def generate(db, seed=1, destinations=2000, users=100000, bookings=1000000, log=print):
+    rng = random.Random(seed)
+    # Dates are relative to midnight, so a rerun on another day only shifts them
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    started = time.perf_counter()
+    catalog = add_catalog(db, rng, destinations, today)
+    user_ids = add_users(db, rng, users, seed)
+    db.commit()
+    log(f"{len(catalog)} destinations, {len(user_ids)} users: {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    schedules = add_launches(db, rng, catalog, today)
+    reserved = Counter()
+    insert_batches(db, models.Booking, booking_rows(rng, bookings, user_ids, catalog, schedules, today, reserved))
+    # Open inventory for every booked launch with the seats already taken,
+    # growing capacity where the generator overbooked
+    insert_batches(db, models.SeatInventory, (
+        {"seat_class_id": seat_class_id, "launch_date": launch_date,
+         "capacity": max(config.SEATS_PER_LAUNCH, seats), "reserved": seats}
+        for (seat_class_id, launch_date), seats in reserved.items()
+    ))
+    db.commit()
+    launches = sum(LAUNCH_HORIZON_DAYS // interval for _, interval, _ in schedules)
+    log(f"{launches} launches, {bookings} bookings in {len(reserved)} launch seat classes: {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    reconcile(db)
+    db.commit()
+    log(f"travel stats: {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic dataset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--destinations", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--bookings", type=int, default=1000000)
+    args = parser.parse_args()
+
+    migrate()
+    with SessionLocal() as db:
+        generate(db, args.seed, args.destinations, args.users, args.bookings)
@@ -0,0 +1,115 @@
+# idempotency.py
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+import config
+import models
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+def request_hash(payload):
+    # Reusing a key with a different body is a client bug, not a retry
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+def replay(record):
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+# One asyncio.Lock per key in flight, so concurrent duplicates within this
+# process queue behind the first instead of racing it to the database.
+# Entries are dropped as soon as nobody holds or waits on them.
+class KeyLocks:
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders and waiters]
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+key_locks = KeyLocks()
+
+async def stored_response(db, key, fingerprint):
+    record = await db.get(models.IdempotencyKey, key)
+    if record is None:
+        return None
+    if record.expires_at <= datetime.now():
+        # Expired but not yet purged: the key is free again
+        await db.delete(record)
+        await db.flush()
+        return None
+    if record.request_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return replay(record)
+
+async def run_once(db, key, payload, handler):
+    # Runs `handler(db)` at most once per key. The handler does its writes
+    # without committing and returns (status code, JSON body); the key row is
+    # committed in the same transaction, so the write and its stored response
+    # land together or not at all. Another process that committed the same
+    # key first makes our commit fail on the primary key, and we replay its
+    # response instead.
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+    fingerprint = request_hash(payload)
+    async with key_locks.hold(key):
+        replayed = await stored_response(db, key, fingerprint)
+        if replayed is not None:
+            return replayed
+
+        status_code, body = await handler(db)
+        now = datetime.now()
+        db.add(models.IdempotencyKey(
+            key=key,
+            request_hash=fingerprint,
+            status_code=status_code,
+            response_body=body.decode(),
+            created_at=now,
+            expires_at=now + timedelta(seconds=config.IDEMPOTENCY_KEY_TTL_SECONDS),
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            replayed = await stored_response(db, key, fingerprint)
+            if replayed is None:
+                raise
+            return replayed
+
+    await purge_expired(db)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def expired_keys():
+    return delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= datetime.now())
+
+_last_purge = 0.0
+
+async def purge_expired(db, force=False):
+    # Called after keyed writes; does real work at most once per interval
+    global _last_purge
+    if not force and time.monotonic() - _last_purge < config.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS:
+        return 0
+    _last_purge = time.monotonic()
+    result = await db.execute(expired_keys())
+    await db.commit()
+    return result.rowcount
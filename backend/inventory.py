@@ -0,0 +1,148 @@
+# inventory.py
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import config
+import models
+from launches import day_range
+from pricing import BASIS_POINTS
+
+# Dialect-specific INSERT so missing inventory rows can be created with
+# ON CONFLICT DO NOTHING when two requests open the same launch at once
+INSERT_BY_DIALECT = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+# Larger of two values in one row (SQLite's max() takes several arguments)
+GREATEST_BY_DIALECT = {
+    "sqlite": func.max,
+    "postgresql": func.greatest,
+}
+
+# Bookings in these statuses hold their seats
+OPEN_STATUSES = ("Confirmed", "Pending")
+
+def launch_date_of(departure_date):
+    # Bookings departing on the same day share one launch
+    return departure_date.date()
+
+async def ensure_inventory(db, seat_class_id, launch_date):
+    # Inventory rows are opened lazily the first time anyone books a class on
+    # a launch, with the scheduled launch's capacity, or the configured one
+    # for a day with no launch on the schedule. The seats of open bookings
+    # already on that class and day (made before inventory was tracked, or
+    # seeded) start out reserved, and where those already exceed the
+    # capacity it grows to fit them, as generate.py does, so the launch is
+    # sold out rather than the row breaking ck_seat_inventory_reserved.
+    # Callers open the row before changing any booking that would be counted.
+    insert = INSERT_BY_DIALECT[db.bind.dialect.name]
+    greatest = GREATEST_BY_DIALECT[db.bind.dialect.name]
+    first, last = day_range(launch_date)
+    destination_id = select(models.SeatClass.destination_id).where(models.SeatClass.id == seat_class_id).scalar_subquery()
+    held = (
+        select(func.coalesce(func.sum(models.Booking.passengers), 0))
+        .where(
+            # The destination narrows the search to ix_bookings_destination_departure_date
+            models.Booking.destination_id == destination_id,
+            models.Booking.departure_date >= first,
+            models.Booking.departure_date < last,
+            models.Booking.seat_class_id == seat_class_id,
+            models.Booking.status.in_(OPEN_STATUSES),
+        )
+        .scalar_subquery()
+    )
+    scheduled = (
+        select(func.max(models.Launch.capacity))
+        .join(models.SeatClass, models.SeatClass.destination_id == models.Launch.destination_id)
+        .where(
+            models.SeatClass.id == seat_class_id,
+            models.Launch.status == "Scheduled",
+            models.Launch.departs_at >= first,
+            models.Launch.departs_at < last,
+        )
+        .scalar_subquery()
+    )
+    await db.execute(
+        insert(models.SeatInventory)
+        .values(
+            seat_class_id=seat_class_id,
+            launch_date=launch_date,
+            capacity=greatest(func.coalesce(scheduled, config.SEATS_PER_LAUNCH), held),
+            reserved=held,
+        )
+        .on_conflict_do_nothing(index_elements=["seat_class_id", "launch_date"])
+    )
+
+async def take_seats(db, seat_class_id, launch_date, seats):
+    # A single conditional UPDATE: the capacity check and the decrement happen
+    # in one statement, so concurrent requests can never both take the last seat
+    result = await db.execute(
+        update(models.SeatInventory)
+        .where(
+            models.SeatInventory.seat_class_id == seat_class_id,
+            models.SeatInventory.launch_date == launch_date,
+            models.SeatInventory.reserved + seats <= models.SeatInventory.capacity,
+        )
+        .values(reserved=models.SeatInventory.reserved + seats)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+async def try_reserve_seats(db, seat_class_id, launch_date, seats):
+    # The common case (launch already open) costs one statement; a miss means
+    # either the launch has no inventory row yet or the class is sold out
+    if await take_seats(db, seat_class_id, launch_date, seats):
+        return True
+    await ensure_inventory(db, seat_class_id, launch_date)
+    return await take_seats(db, seat_class_id, launch_date, seats)
+
+async def reserve_seats(db, seat_class_id, launch_date, seats):
+    if not await try_reserve_seats(db, seat_class_id, launch_date, seats):
+        raise HTTPException(status_code=409, detail="Seat class is sold out for this launch")
+
+async def release_seats(db, releases):
+    # `releases` is an iterable of (seat_class_id, launch_date, seats) given
+    # back by cancelled or changed bookings; one executemany UPDATE. Launches
+    # with no inventory row (bookings from before inventory was tracked)
+    # have nothing to give back, and reserved never drops below zero.
+    seats = {}
+    for seat_class_id, launch_date, count in releases:
+        seats[seat_class_id, launch_date] = seats.get((seat_class_id, launch_date), 0) + count
+    if not seats:
+        return
+    inventory = models.SeatInventory.__table__
+    await db.execute(
+        update(inventory)
+        .where(
+            inventory.c.seat_class_id == bindparam("class_id"),
+            inventory.c.launch_date == bindparam("launch"),
+            inventory.c.reserved >= bindparam("seats"),
+        )
+        .values(reserved=inventory.c.reserved - bindparam("seats")),
+        [{"class_id": seat_class_id, "launch": launch_date, "seats": count}
+         for (seat_class_id, launch_date), count in seats.items()],
+    )
+
+async def launch_loads(db, launches, released=()):
+    # Reserved share of capacity in basis points per (seat_class_id,
+    # launch_date), for demand pricing; one query however many launches.
+    # Launches without an inventory row yet are empty, and `released`
+    # (seat_class_id, launch_date, seats) are counted as already given back.
+    launches = set(launches)
+    returned = {}
+    for seat_class_id, launch_date, seats in released:
+        returned[seat_class_id, launch_date] = returned.get((seat_class_id, launch_date), 0) + seats
+    if not launches:
+        return {}
+    inventory = models.SeatInventory
+    rows = await db.execute(
+        select(inventory.seat_class_id, inventory.launch_date, inventory.reserved, inventory.capacity)
+        .where(tuple_(inventory.seat_class_id, inventory.launch_date).in_(launches))
+    )
+    loads = dict.fromkeys(launches, 0)
+    for row in rows:
+        reserved = max(0, row.reserved - returned.get((row.seat_class_id, row.launch_date), 0))
+        loads[row.seat_class_id, row.launch_date] = min(BASIS_POINTS, reserved * BASIS_POINTS // max(row.capacity, 1))
+    return loads
@@ -0,0 +1,138 @@
+# jobs.py
+import asyncio
+import logging
+import random
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+import config
+import models
+from database import AsyncSessionLocal
+
+logger = logging.getLogger("space_travel.jobs")
+
+# Handlers by job kind: async callables taking the job's payload. Register
+# with @job_handler("kind"); a handler that raises is retried, so handlers
+# must be safe to run more than once.
+handlers = {}
+
+def job_handler(kind):
+    def register(handler):
+        handlers[kind] = handler
+        return handler
+    return register
+
+# Set by enqueue so idle workers in this process start at once instead of on
+# their next poll
+_wakeup = None
+
+def job_values(kind, payload, now):
+    return {"kind": kind, "payload": payload, "status": "queued", "attempts": 0, "run_after": now, "created_at": now}
+
+async def enqueue(db, jobs):
+    # `jobs` is a list of (kind, payload). Added to the caller's transaction,
+    # so the jobs exist if and only if the work that produced them commits.
+    if not jobs:
+        return
+    now = datetime.now()
+    await db.execute(insert(models.Job), [job_values(kind, payload, now) for kind, payload in jobs])
+    if _wakeup is not None:
+        _wakeup.set()
+
+def backoff(attempts):
+    # 2s, 4s, 8s, ... capped, with jitter so failed jobs do not retry in lockstep
+    delay = min(config.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), config.JOB_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+async def claim(db):
+    # Claim the oldest due job: queued jobs whose time has come, or running
+    # jobs whose worker let the lease lapse. A plain SELECT finds it first, so
+    # polling an empty queue never takes the write lock (on SQLite that would
+    # contend with every request writing a booking); only a due job costs an
+    # UPDATE. The status check in the UPDATE makes a claim that lost a race
+    # match nothing, and the next due job is tried instead.
+    while True:
+        now = datetime.now()
+        due = (await db.execute(
+            select(models.Job.id)
+            .where(models.Job.status.in_(("queued", "running")), models.Job.run_after <= now)
+            .order_by(models.Job.run_after, models.Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalar()
+        if due is None:
+            await db.commit()
+            return None
+        job = (await db.execute(
+            update(models.Job)
+            .where(models.Job.id == due, models.Job.status.in_(("queued", "running")), models.Job.run_after <= now)
+            .values(status="running", attempts=models.Job.attempts + 1,
+                    run_after=now + timedelta(seconds=config.JOB_LEASE_SECONDS))
+            .returning(models.Job.id, models.Job.kind, models.Job.payload, models.Job.attempts)
+            .execution_options(synchronize_session=False)
+        )).first()
+        await db.commit()
+        if job is not None:
+            return job
+
+async def finish(db, job, error=None):
+    now = datetime.now()
+    if error is None:
+        values = {"status": "done", "finished_at": now, "last_error": None}
+    elif job.attempts >= config.JOB_MAX_ATTEMPTS:
+        values = {"status": "failed", "finished_at": now, "last_error": error}
+    else:
+        values = {"status": "queued", "run_after": now + backoff(job.attempts), "last_error": error}
+    await db.execute(
+        update(models.Job).where(models.Job.id == job.id).values(**values).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+async def run_next():
+    # Claims and runs one job; returns False when nothing is due
+    async with AsyncSessionLocal() as db:
+        job = await claim(db)
+        if job is None:
+            return False
+        try:
+            handler = handlers[job.kind]
+            await handler(job.payload)
+        except Exception:
+            logger.warning("Job %s (%s) attempt %s failed", job.id, job.kind, job.attempts, exc_info=True)
+            await finish(db, job, traceback.format_exc(limit=5))
+        else:
+            await finish(db, job)
+        return True
+
+async def worker(wakeup):
+    # Waits before its first claim, so starting the app does no database I/O
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=config.JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        try:
+            while await run_next():
+                pass
+        except Exception:
+            logger.exception("Job worker error")
+
+class WorkerPool:
+    def __init__(self, size):
+        self.size = size
+        self._tasks = []
+
+    def start(self):
+        global _wakeup
+        _wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(worker(_wakeup)) for _ in range(self.size)]
+
+    async def stop(self):
+        # Cancelling mid-job is safe: the job's lease runs out and it is retried
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,88 @@
+# launches.py
+import re
+from datetime import datetime, time, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, update
+
+import models
+
+# Hours per unit of the free-text travel_time ("3 days", "8 months", "2.5 years")
+TRAVEL_TIME_UNITS = {"hour": 1, "day": 24, "week": 24 * 7, "month": 730, "year": 8766}
+TRAVEL_TIME_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(hour|day|week|month|year)s?\s*$", re.IGNORECASE)
+
+# Formats the free-text next_launch has been written in
+LAUNCH_DATE_FORMATS = ("%B %d, %Y", "%b %d, %Y", "%Y-%m-%d")
+
+# (destination, day) pairs per arrival lookup, keeping each statement's
+# parameter count well under SQLite's limit
+ARRIVAL_LOOKUP_CHUNK = 500
+
+def parse_travel_time(text):
+    # "8 months" -> 5840 hours; None if the text isn't a duration
+    match = TRAVEL_TIME_PATTERN.match(text or "")
+    if match is None:
+        return None
+    return round(float(match.group(1)) * TRAVEL_TIME_UNITS[match.group(2).lower()])
+
+def parse_launch_date(text):
+    # "March 15, 2025" -> midnight that day; None if the text isn't a date
+    for date_format in LAUNCH_DATE_FORMATS:
+        try:
+            return datetime.strptime((text or "").strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+def day_range(launch_date):
+    start = datetime.combine(launch_date, time.min)
+    return start, start + timedelta(days=1)
+
+async def arrivals(db, launches):
+    # Earliest arrival of the scheduled launches departing on each
+    # (destination_id, launch_date); days without a scheduled launch (trips
+    # booked before launches were tracked) are left out
+    launches = sorted(set(launches))
+    found = {}
+    for start in range(0, len(launches), ARRIVAL_LOOKUP_CHUNK):
+        days = []
+        for destination_id, launch_date in launches[start:start + ARRIVAL_LOOKUP_CHUNK]:
+            first, last = day_range(launch_date)
+            days.append(and_(
+                models.Launch.destination_id == destination_id,
+                models.Launch.departs_at >= first,
+                models.Launch.departs_at < last,
+            ))
+        rows = await db.execute(
+            select(models.Launch.destination_id, models.Launch.departs_at, models.Launch.duration_hours)
+            .where(models.Launch.status == "Scheduled", or_(*days))
+        )
+        for row in rows:
+            key = (row.destination_id, row.departs_at.date())
+            arrival = row.departs_at + timedelta(hours=row.duration_hours)
+            found[key] = min(found.get(key, arrival), arrival)
+    return found
+
+def arrival_error(arrives_at):
+    return f"Return date is before the launch arrives at the destination ({arrives_at.isoformat()})"
+
+async def check_return_after_arrival(db, destination_id, departure_date, return_date):
+    launch = (destination_id, departure_date.date())
+    arrives_at = (await arrivals(db, [launch])).get(launch)
+    if arrives_at is not None and return_date < arrives_at:
+        raise HTTPException(status_code=422, detail=arrival_error(arrives_at))
+
+async def scrub_launches(db, destination_id, launch_date):
+    # The day's scheduled launches leave the upcoming list
+    first, last = day_range(launch_date)
+    await db.execute(
+        update(models.Launch)
+        .where(
+            models.Launch.destination_id == destination_id,
+            models.Launch.status == "Scheduled",
+            models.Launch.departs_at >= first,
+            models.Launch.departs_at < last,
+        )
+        .values(status="Scrubbed")
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,329 @@
+# loadtest.py
+# Repeatable load test of every route in main.py, driven in process through
+# an ASGI client, so no server or network sits in the measurement. Each route
+# gets the same seeded request sequence on every run; throughput and
+# p50/p95/p99 latency per route are written to JSON for comparing runs.
+#
+#   python loadtest.py --output before.json
+#   python loadtest.py --database /tmp/large.db --output after.json --compare before.json
+#
+# Without --database a dataset is generated into a temporary database (see
+# generate.py); with one, the suite runs on a copy, so the bookings it makes
+# never accumulate between runs. Background job workers are not started;
+# jobs enqueued by bookings just wait in the queue.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description="In-process load test of every API route")
+parser.add_argument("--database", help="SQLite database to copy and run against (default: generate one)")
+parser.add_argument("--seed", type=int, default=1)
+parser.add_argument("--destinations", type=int, default=500, help="size of the generated dataset")
+parser.add_argument("--users", type=int, default=20000)
+parser.add_argument("--bookings", type=int, default=200000)
+parser.add_argument("--requests", type=int, default=300, help="measured requests per route")
+parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per route first")
+parser.add_argument("--concurrency", type=int, default=10)
+parser.add_argument("--route", action="append", help="route to run, e.g. 'GET /search' (repeatable, default: all)")
+parser.add_argument("--output", default="loadtest.json")
+parser.add_argument("--compare", help="earlier results file to compare against")
+parser.add_argument("--max-regression", type=float,
+                    help="exit non-zero if any route's throughput or p95 is this many percent worse than --compare")
+args = parser.parse_args()
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from benchmark import percentile, throwaway_database
+
+# Point the app at a throwaway database before it is imported. Thumbnails are
+# rendered during the run into its cache (the warmup renders most of them).
+database_path = throwaway_database("loadtest")
+if args.database:
+    # The backup API gives a consistent copy even of a WAL-mode database
+    with sqlite3.connect(args.database) as source, sqlite3.connect(database_path) as copy:
+        source.backup(copy)
+
+import httpx
+from fastapi.routing import APIRoute
+from sqlalchemy import func, select
+
+import config
+import media_versions
+import models
+from database import SessionLocal
+from generate import NAME_PARTS, TYPES, WORDS, generate
+from main import app
+from manage import migrate
+from media import MEDIA_KINDS, THUMBNAIL_WIDTHS
+
+# Slow-query warnings for every contended write would bury the report
+logging.getLogger("space_travel.sql").setLevel(logging.ERROR)
+
+class Dataset:
+    # Ids the scenarios draw their requests from
+    def __init__(self, db):
+        self.destination_ids = db.scalars(select(models.Destination.id).order_by(models.Destination.id)).all()
+        self.user_ids = db.scalars(select(models.User.id).order_by(models.User.id)).all()
+        self.seat_classes = {}
+        for row in db.execute(select(models.SeatClass.id, models.SeatClass.destination_id)):
+            self.seat_classes.setdefault(row.destination_id, []).append(row.id)
+        self.stays = {}
+        for row in db.execute(select(models.Accommodation.id, models.Accommodation.destination_id)):
+            self.stays.setdefault(row.destination_id, []).append(row.id)
+        # New bookings and date changes go on upcoming launches with seats to
+        # spare, so they aren't failed for being sold out; up to 20 per destination
+        now = datetime.now()
+        full = {
+            (row.destination_id, row.launch_date)
+            for row in db.execute(
+                select(models.SeatClass.destination_id, models.SeatInventory.launch_date)
+                .join(models.SeatInventory, models.SeatInventory.seat_class_id == models.SeatClass.id)
+                .where(models.SeatInventory.launch_date > now.date(),
+                       models.SeatInventory.reserved + 50 > models.SeatInventory.capacity)
+            )
+        }
+        self.schedule = {}
+        for launch in db.execute(
+            select(models.Launch.destination_id, models.Launch.departs_at, models.Launch.duration_hours)
+            .where(models.Launch.status == "Scheduled", models.Launch.departs_at > now)
+            .order_by(models.Launch.destination_id, models.Launch.departs_at)
+        ):
+            upcoming = self.schedule.setdefault(launch.destination_id, [])
+            if len(upcoming) < 20 and (launch.destination_id, launch.departs_at.date()) not in full:
+                upcoming.append((launch.departs_at, launch.departs_at + timedelta(hours=launch.duration_hours)))
+        self.bookable = [
+            d for d in self.destination_ids if d in self.seat_classes and d in self.stays and self.schedule.get(d)
+        ]
+        # Changes and cancellations each use a booking (and scrubs a launch)
+        # nobody has touched yet, so none of them fails on a stale version
+        needed = args.warmup + args.requests
+        self.open_bookings = db.execute(
+            select(models.Booking.id, models.Booking.version, models.Booking.destination_id)
+            .where(models.Booking.status == "Confirmed", models.Booking.departure_date > now)
+            .order_by(models.Booking.id)
+            .limit(2 * needed)
+        ).all()[::-1]
+        self.launches = db.execute(
+            select(models.SeatClass.destination_id, models.SeatInventory.launch_date)
+            .join(models.SeatInventory, models.SeatInventory.seat_class_id == models.SeatClass.id)
+            .where(models.SeatInventory.launch_date > now.date())
+            .distinct()
+            .order_by(models.SeatClass.destination_id, models.SeatInventory.launch_date)
+            .limit(needed)
+        ).all()[::-1]
+        # Generated image_urls name files that don't exist, so media requests
+        # use the shipped ones
+        self.media = {
+            kind: sorted(name for name in os.listdir(os.path.join(config.MEDIA_ROOT, kind)) if not name.startswith("."))
+            for kind in MEDIA_KINDS
+        }
+        self.counts = {
+            table.__tablename__: db.scalar(select(func.count()).select_from(table))
+            for table in (models.Destination, models.SeatClass, models.Accommodation, models.Launch, models.User, models.Booking)
+        }
+
+    def trip_dates(self, rng, destination_id):
+        # A launch and a return after it arrives
+        departs_at, arrives_at = rng.choice(self.schedule[destination_id])
+        return departs_at.isoformat(), (arrives_at + timedelta(days=rng.randrange(1, 30))).isoformat()
+
+    def new_booking(self, rng):
+        destination_id = rng.choice(self.bookable)
+        departure_date, return_date = self.trip_dates(rng, destination_id)
+        return {
+            "user_id": rng.choice(self.user_ids),
+            "destination_id": destination_id,
+            "seat_class_id": rng.choice(self.seat_classes[destination_id]),
+            "accommodation_id": rng.choice(self.stays[destination_id]),
+            "departure_date": departure_date,
+            "return_date": return_date,
+            "passengers": rng.randint(1, 3),
+        }
+
+def change_booking(client, rng, data):
+    booking_id, version, destination_id = data.open_bookings.pop()
+    change = {"version": version, "passengers": rng.randint(1, 3)}
+    if rng.random() < 0.5 and data.schedule.get(destination_id):
+        # Another launch, so the seats move
+        departure_date, return_date = data.trip_dates(rng, destination_id)
+        change.update(departure_date=departure_date, return_date=return_date)
+    return client.patch(f"/bookings/{booking_id}", json=change)
+
+def cancel_booking(client, rng, data):
+    booking_id, version, _ = data.open_bookings.pop()
+    return client.post(f"/bookings/{booking_id}/cancel", json={"version": version})
+
+def scrub_launch(client, rng, data):
+    destination_id, launch_date = data.launches.pop()
+    return client.post(f"/destinations/{destination_id}/launches/{launch_date.isoformat()}/cancel")
+
+# One request per call, keyed by route as "METHOD /template"; every route in
+# main.py must have an entry (checked at startup)
+SCENARIOS = {
+    "GET /": lambda client, rng, data: client.get("/"),
+    "GET /metrics": lambda client, rng, data: client.get("/metrics"),
+    "GET /destinations": lambda client, rng, data: client.get("/destinations", params={
+        "type": rng.choice(TYPES), "min_price": rng.randrange(0, 10000000, 100000), "sort": rng.choice(["id", "price"]),
+    }),
+    "GET /destinations/{destination_id}": lambda client, rng, data: client.get(
+        f"/destinations/{rng.choice(data.destination_ids)}"),
+    "GET /destinations/{destination_id}/seat-classes": lambda client, rng, data: client.get(
+        f"/destinations/{rng.choice(data.destination_ids)}/seat-classes"),
+    "GET /destinations/{destination_id}/accommodations": lambda client, rng, data: client.get(
+        f"/destinations/{rng.choice(data.destination_ids)}/accommodations"),
+    "GET /destinations/{destination_id}/bundle": lambda client, rng, data: client.get(
+        f"/destinations/{rng.choice(data.destination_ids)}/bundle"),
+    "GET /destinations/bundles": lambda client, rng, data: client.get("/destinations/bundles", params={
+        "ids": rng.sample(data.destination_ids, min(24, len(data.destination_ids))),
+    }),
+    # Upcoming launches: everywhere in the next month, or one destination's
+    "GET /launches": lambda client, rng, data: client.get("/launches", params=(
+        {"departs_to": (datetime.now() + timedelta(days=30)).isoformat(), "limit": 50} if rng.random() < 0.5
+        else {"destination_id": rng.choice(data.destination_ids), "limit": 20}
+    )),
+    "GET /quotes": lambda client, rng, data: client.get("/quotes", params={
+        "passengers": rng.randint(1, 4), "nights": rng.randrange(0, 30), "limit": 50,
+    }),
+    "GET /search": lambda client, rng, data: client.get("/search", params={
+        "q": f"{rng.choice(NAME_PARTS)} {rng.choice(WORDS)[:4]}",
+    }),
+    "GET /leaderboard": lambda client, rng, data: client.get("/leaderboard", params={
+        "by": rng.choice(["miles", "level"]), "limit": 50,
+    }),
+    "GET /users/{user_id}": lambda client, rng, data: client.get(f"/users/{rng.choice(data.user_ids)}"),
+    # Low ids are the generator's most frequent travelers, so about half the
+    # requests list a heavy user's bookings
+    "GET /users/{user_id}/bookings": lambda client, rng, data: client.get(
+        f"/users/{rng.choice(data.user_ids[:100] if rng.random() < 0.5 else data.user_ids)}/bookings"),
+    "GET /space-travel-tips": lambda client, rng, data: client.get("/space-travel-tips"),
+    # Half full-size originals, half resized variants
+    "GET /images/{filename}": lambda client, rng, data: client.get(
+        f"/images/{rng.choice(data.media['images'])}", params={"w": rng.choice(THUMBNAIL_WIDTHS)} if rng.random() < 0.5 else None),
+    "GET /avatars/{filename}": lambda client, rng, data: client.get(
+        f"/avatars/{rng.choice(data.media['avatars'])}", params={"w": rng.choice(THUMBNAIL_WIDTHS)} if rng.random() < 0.5 else None),
+    "GET /bookings/export": lambda client, rng, data: client.get("/bookings/export", params={
+        "format": rng.choice(["ndjson", "csv"]), "destination_id": rng.choice(data.destination_ids), "status": "Confirmed",
+    }),
+    "POST /bookings": lambda client, rng, data: client.post("/bookings", json=data.new_booking(rng)),
+    "POST /bookings/bulk": lambda client, rng, data: client.post(
+        "/bookings/bulk", json=[data.new_booking(rng) for _ in range(20)]),
+    "PATCH /bookings/{booking_id}": change_booking,
+    "POST /bookings/{booking_id}/cancel": cancel_booking,
+    "POST /destinations/{destination_id}/launches/{launch_date}/cancel": scrub_launch,
+}
+
+def app_routes():
+    return {f"{method} {route.path}" for route in app.routes if isinstance(route, APIRoute) for method in route.methods}
+
+async def run_route(client, name, data):
+    make_request = SCENARIOS[name]
+    rng = random.Random(f"{args.seed}:{name}")
+    for _ in range(args.warmup):
+        await make_request(client, rng, data)
+
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(args.requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await make_request(client, rng, data)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": args.requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+def compare(baseline, results):
+    # Percent change per route; worse means lower throughput or higher p95
+    print(f"\nCompared with {args.compare} ({baseline.get('git_commit')}):")
+    regressions = []
+    for name, route in results["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        throughput = change(before["throughput_rps"], route["throughput_rps"])
+        p95 = change(before["p95_ms"], route["p95_ms"])
+        print(f"{name:<50} req/s {throughput:>+7.1f}%  p95 {p95:>+7.1f}%")
+        if args.max_regression is not None and (-throughput > args.max_regression or p95 > args.max_regression):
+            regressions.append(name)
+    return regressions
+
+async def main():
+    missing = app_routes() - SCENARIOS.keys()
+    if missing:
+        sys.exit(f"No load-test scenario for: {', '.join(sorted(missing))}")
+    for name in args.route or []:
+        if name not in SCENARIOS:
+            sys.exit(f"Unknown route {name!r}")
+
+    migrate()
+    with SessionLocal() as db:
+        if not args.database:
+            generate(db, args.seed, args.destinations, args.users, args.bookings)
+        data = Dataset(db)
+    # As the app's lifespan does, which in-process requests skip
+    media_versions.refresh()
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "dataset": data.counts,
+        "settings": {"seed": args.seed, "requests": args.requests, "warmup": args.warmup, "concurrency": args.concurrency},
+        "routes": {},
+    }
+    print(f"{data.counts}; {args.requests} requests per route, concurrency {args.concurrency}")
+    # Exceptions inside the app become 500s and count as errors instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=300) as client:
+        for name in args.route or SCENARIOS:
+            route = results["routes"][name] = await run_route(client, name, data)
+            print(
+                f"{name:<50} {route['throughput_rps']:>9.1f} req/s"
+                f"  p50 {route['p50_ms']:>8.2f} ms  p95 {route['p95_ms']:>8.2f} ms  p99 {route['p99_ms']:>8.2f} ms"
+                f"  errors {route['errors']}"
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results)
+        if regressions:
+            sys.exit(f"Regressed by more than {args.max_regression}%: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
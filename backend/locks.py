@@ -0,0 +1,29 @@
+# locks.py
+# Advisory file locks coordinating the worker processes on one host
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: run a single worker there
+    fcntl = None
+
+@contextmanager
+def locked(fd):
+    if fcntl is None:
+        raise RuntimeError("File locks need fcntl (POSIX); run a single worker on this platform")
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(path):
+    # Held until the block exits; other processes taking the same path wait
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with locked(fd):
+            yield
+    finally:
+        os.close(fd)
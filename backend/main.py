@@ -3,36 +3,75 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import inspect
-from typing import List, Optional
-from datetime import datetime, timedelta
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import date, datetime
+from pydantic import TypeAdapter
+from contextlib import asynccontextmanager
+import asyncio
 import random
 
 # Database imports
-from database import engine, SessionLocal
+from database import engine, async_engine, AsyncSessionLocal
+import config
 import models
 import schemas
+from cache import CachedResponse, cached_json_response, catalog_cache
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page
+from inventory import launch_date_of, launch_loads, reserve_seats
+import pricing
+from pricing import trip_price
+from bulk import ingest_bookings, read_booking_rows
+from export import export_query, stream_bookings
+from metrics import MetricsMiddleware, instrument, metrics_response
+from compression import CompressionMiddleware
+from ratelimit import RateLimitMiddleware
+from quotes import search_quotes
+from search import search_catalog
+from stats import record_trips, status_delta
+from jobs import WorkerPool, enqueue
+from followups import booking_jobs
+from changes import cancel_booking, cancel_launch, keep_completing_trips, modify_booking
+from launches import check_return_after_arrival
+from media import media_response
+import media_versions
+from manage import startup
+from idempotency import IDEMPOTENCY_KEY_HEADER, REPLAYED_HEADER, run_once
 
-# Create database tables - Add check to avoid recreating tables
-def create_tables():
-    # Create tables only if they don't exist
-    inspector = inspect(engine)
-    existing_tables = inspector.get_table_names()
-    
-    if "users" not in existing_tables:
-        models.Base.metadata.create_all(bind=engine)
-        print("Database tables created successfully!")
-    else:
-        print("Tables already exist, skipping creation.")
+# Importing the app does no database I/O: the schema is managed by
+# `python manage.py migrate` and demo data by `python manage.py seed`. With
+# STARTUP_MIGRATE each worker runs manage.startup() as it starts, which does
+# that work once under a file lock however many workers start together.
+job_pool = WorkerPool(config.JOB_WORKERS)
 
-# Create tables with safety check
-create_tables()
+@asynccontextmanager
+async def lifespan(app):
+    if config.STARTUP_MIGRATE:
+        # Off the event loop: migrations and seeding use the sync engine
+        await asyncio.to_thread(startup)
+    # Media versions for list thumbnails, so serializing a list never stats or hashes files
+    await asyncio.to_thread(media_versions.refresh)
+    refresher = asyncio.create_task(media_versions.keep_fresh()) if config.MEDIA_VERSIONS_REFRESH_SECONDS else None
+    completer = asyncio.create_task(keep_completing_trips()) if config.TRIP_COMPLETION_SECONDS else None
+    if job_pool.size:
+        job_pool.start()
+    yield
+    for task in (refresher, completer):
+        if task is not None:
+            task.cancel()
+    await job_pool.stop()
+    await async_engine.dispose()
 
-app = FastAPI(title="Space Travel Booking API")
+app = FastAPI(title="Space Travel Booking API", lifespan=lifespan)
+
+# Load shedding and per-client rate limits. Added first so it sits inside
+# CORS, and 429/503 responses still carry CORS headers browsers can read.
+app.add_middleware(RateLimitMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -41,270 +80,261 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", "Server-Timing", REPLAYED_HEADER, "Retry-After"],
 )
 
+# Negotiated gzip/brotli; added before MetricsMiddleware so it sits inside it
+# and the metrics count bytes on the wire
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency, SQL count, DB time and response size; see /metrics
+app.add_middleware(MetricsMiddleware)
+instrument(engine)
+instrument(async_engine.sync_engine)
+
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# Generate some dummy data for testing
-def initialize_dummy_data(db: Session):
-    # Check if data exists
-    if db.query(models.Destination).count() == 0:
-        # Create destinations
-        destinations = [
-            models.Destination(
-                name="Lunar Gateway Station",
-                description="Experience the moon's orbit in this state-of-the-art space station with breathtaking views of Earth and lunar landscapes.",
-                type="Space Station",
-                travel_time="3 days",
-                base_price=1200000,
-                image_url="/images/lunar-gateway.jpg",
-                next_launch="March 15, 2025"
-            ),
-            models.Destination(
-                name="Mars Base Alpha",
-                description="Be among the first civilians to visit the red planet. Tour the first human settlement on Mars and experience 0.38g gravity.",
-                type="Planetary Base",
-                travel_time="8 months",
-                base_price=4500000,
-                image_url="/images/mars-base.jpg",
-                next_launch="July 22, 2025"
-            ),
-            models.Destination(
-                name="Europa Orbit Research Station",
-                description="Journey to Jupiter's moon and participate in research on extraterrestrial life in Europa's subsurface ocean.",
-                type="Research Station",
-                travel_time="2.5 years",
-                base_price=12000000,
-                image_url="/images/europa-station.jpg",
-                next_launch="December 10, 2025"
-            ),
-            models.Destination(
-                name="Orbital Hotel Artemis",
-                description="Luxury accommodations in Earth's orbit. Experience zero gravity living with five-star amenities.",
-                type="Space Hotel",
-                travel_time="1 day",
-                base_price=850000,
-                image_url="/images/orbital-hotel.jpg",
-                next_launch="April 5, 2025"
-            ),
-            models.Destination(
-                name="Venus Cloud Observatory",
-                description="Float above Venus's atmosphere and study the greenhouse effect from our specialized research platform.",
-                type="Atmospheric Observatory",
-                travel_time="5 months",
-                base_price=3200000,
-                image_url="/images/venus-observatory.jpg",
-                next_launch="September 18, 2025"
-            ),
-        ]
-        db.add_all(destinations)
-        db.commit()
-        
-        # Create seat classes for each destination
-        seat_classes = []
-        for dest in destinations:
-            seat_classes.extend([
-                models.SeatClass(
-                    name="Economy",
-                    description="Standard accommodations with essential life support and minimal personal space.",
-                    price=dest.base_price,
-                    features=["Basic life support", "Shared quarters", "Standard meals", "Limited storage"],
-                    destination_id=dest.id
-                ),
-                models.SeatClass(
-                    name="Luxury Cabin",
-                    description="Premium accommodations with enhanced comfort and private quarters.",
-                    price=int(dest.base_price * 1.75),
-                    features=["Enhanced life support", "Private cabin", "Gourmet meals", "Increased storage", "Entertainment system"],
-                    destination_id=dest.id
-                ),
-                models.SeatClass(
-                    name="VIP Zero-G Suite",
-                    description="The ultimate space travel experience with dedicated staff and exclusive access to all facilities.",
-                    price=int(dest.base_price * 3.5),
-                    features=["Premium life support", "Luxury suite", "Personal chef", "Exclusive excursions", "Full medical support", "Priority scheduling"],
-                    destination_id=dest.id
-                ),
-            ])
-        db.add_all(seat_classes)
-        db.commit()
-        
-        # Create accommodations for each destination
-        accommodations = []
-        for dest in destinations:
-            accommodations.extend([
-                models.Accommodation(
-                    name=f"Standard Pod at {dest.name}",
-                    description="Basic accommodation with essential amenities and shared facilities.",
-                    price_per_night=int(dest.base_price * 0.01),
-                    features=["Shared bathroom", "Basic amenities", "Daily cleaning", "Communal dining"],
-                    rating=3.5,
-                    destination_id=dest.id
-                ),
-                models.Accommodation(
-                    name=f"Comfort Suite at {dest.name}",
-                    description="Mid-tier accommodations with private facilities and enhanced comfort.",
-                    price_per_night=int(dest.base_price * 0.025),
-                    features=["Private bathroom", "Enhanced amenities", "Room service", "Entertainment system", "Small viewport"],
-                    rating=4.2,
-                    destination_id=dest.id
-                ),
-                models.Accommodation(
-                    name=f"Luxury Habitat at {dest.name}",
-                    description="Premium living space with all amenities and spectacular views.",
-                    price_per_night=int(dest.base_price * 0.05),
-                    features=["Luxury bathroom", "Premium amenities", "24/7 butler service", "Gourmet dining", "Large viewport", "Private excursions"],
-                    rating=4.8,
-                    destination_id=dest.id
-                ),
-            ])
-        db.add_all(accommodations)
-        db.commit()
-        
-        # Create a few users
-        users = [
-            models.User(
-                username="astro_explorer",
-                email="alex@example.com",
-                hashed_password="dummy_hash_1",
-                full_name="Alex Astronaut",
-                bio="Space enthusiast and adventure seeker",
-                traveler_level=3,
-                total_miles=15000000,
-                completed_trips=2,
-                destinations=2,
-                avatar_url="/avatars/user1.jpg"
-            ),
-            models.User(
-                username="cosmic_voyager",
-                email="sam@example.com",
-                hashed_password="dummy_hash_2",
-                full_name="Sam Spacefarer",
-                bio="Professional astronomer turned space tourist",
-                traveler_level=4,
-                total_miles=28000000,
-                completed_trips=3,
-                destinations=3,
-                avatar_url="/avatars/user2.jpg"
-            ),
-        ]
-        db.add_all(users)
-        db.commit()
-        
-        # Create some bookings
-        bookings = [
-            models.Booking(
-                user_id=1,
-                destination_id=1,
-                seat_class_id=2,
-                accommodation_id=2,
-                departure_date=datetime.now() + timedelta(days=45),
-                return_date=datetime.now() + timedelta(days=60),
-                passengers=2,
-                total_price=2500000,
-                status="Confirmed",
-                booking_date=datetime.now() - timedelta(days=10)
-            ),
-            models.Booking(
-                user_id=1,
-                destination_id=4,
-                seat_class_id=10,
-                accommodation_id=11,
-                departure_date=datetime.now() + timedelta(days=120),
-                return_date=datetime.now() + timedelta(days=127),
-                passengers=1,
-                total_price=3200000,
-                status="Pending",
-                booking_date=datetime.now() - timedelta(days=3)
-            ),
-            models.Booking(
-                user_id=2,
-                destination_id=2,
-                seat_class_id=5,
-                accommodation_id=5,
-                departure_date=datetime.now() + timedelta(days=90),
-                return_date=datetime.now() + timedelta(days=330),
-                passengers=2,
-                total_price=9500000,
-                status="Confirmed",
-                booking_date=datetime.now() - timedelta(days=20)
-            ),
-        ]
-        db.add_all(bookings)
-        db.commit()
 
 # Routes
-@app.on_event("startup")
-async def startup_event():
-    db = SessionLocal()
-    initialize_dummy_data(db)
-    db.close()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Dubai Space Travel Booking API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return metrics_response()
+
 # Destinations
+# Catalog routes are served from the catalog cache as pre-serialized JSON with
+# ETag/Last-Modified validators; the database is only queried on a miss.
+destination_list_adapter = TypeAdapter(List[schemas.Destination])
+seat_class_list_adapter = TypeAdapter(List[schemas.SeatClass])
+accommodation_list_adapter = TypeAdapter(List[schemas.Accommodation])
+booking_list_adapter = TypeAdapter(List[schemas.BookingWithDetails])
+quote_list_adapter = TypeAdapter(List[schemas.Quote])
+launch_list_adapter = TypeAdapter(List[schemas.Launch])
+
+def json_list_response(adapter, items, headers=None):
+    # Large uncached lists are validated and encoded to JSON bytes in one
+    # pydantic-core pass, skipping jsonable_encoder and json.dumps
+    body = adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/destinations", response_model=List[schemas.Destination])
-async def get_destinations(db: Session = Depends(get_db)):
-    destinations = db.query(models.Destination).all()
-    return destinations
+async def get_destinations(
+    request: Request,
+    type: Optional[str] = None,
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    sort: Optional[Literal["id", "price"]] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    # Every page is one range of an index already in sort order, so deep pages
+    # cost the same as the first: id order on the primary key, or on
+    # ix_destinations_type_id for a type; price order on
+    # ix_destinations_base_price_id, or ix_destinations_type_base_price_id for
+    # a type. A price range is paged in price order unless sort=id is asked
+    # for, which walks ids and skips those outside the range.
+    if sort is None:
+        sort = "price" if min_price is not None or max_price is not None else "id"
 
-@app.get("/destinations/{destination_id}", response_model=schemas.Destination)
-async def get_destination(destination_id: int, db: Session = Depends(get_db)):
-    destination = db.query(models.Destination).filter(models.Destination.id == destination_id).first()
-    if destination is None:
+    async def build():
+        query = select(models.Destination)
+        if type is not None:
+            query = query.where(models.Destination.type == type)
+        if min_price is not None:
+            query = query.where(models.Destination.base_price >= min_price)
+        if max_price is not None:
+            query = query.where(models.Destination.base_price <= max_price)
+
+        if sort == "price":
+            sort_key = [models.Destination.base_price, models.Destination.id]
+        else:
+            sort_key = [models.Destination.id]
+
+        destinations, next_cursor = await keyset_page(db, query, sort_key, cursor, limit)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return destination_list_adapter.dump_json(destination_list_adapter.validate_python(destinations, from_attributes=True)), headers
+
+    key = ("destinations", type, min_price, max_price, sort, cursor, limit)
+    return await cached_json_response(request, key, build)
+
+# Destination bundles: a destination with its seat classes and accommodations,
+# the booking page's three catalog calls in one. Cached per destination, so
+# the single and batch forms share entries; misses are loaded together, with
+# the seat classes and accommodations of all of them eager-loaded in one
+# SELECT each.
+destination_bundle_adapter = TypeAdapter(schemas.DestinationBundle)
+
+async def destination_bundles(db, destination_ids):
+    entries = {}
+    for destination_id in destination_ids:
+        entry = catalog_cache.get(("bundle", destination_id))
+        if entry is not None:
+            entries[destination_id] = entry
+    missing = [destination_id for destination_id in destination_ids if destination_id not in entries]
+    if missing:
+        generations = {destination_id: catalog_cache.generation(destination_id) for destination_id in missing}
+        destinations = await db.scalars(
+            select(models.Destination)
+            .options(selectinload(models.Destination.seat_classes), selectinload(models.Destination.accommodations))
+            .where(models.Destination.id.in_(missing))
+        )
+        for destination in destinations:
+            body = destination_bundle_adapter.dump_json(
+                destination_bundle_adapter.validate_python(destination, from_attributes=True)
+            )
+            entries[destination.id] = catalog_cache.set(
+                ("bundle", destination.id), body, destination.id, generation=generations[destination.id]
+            )
+    # Requested order; unknown ids are left out
+    return [entries[destination_id] for destination_id in destination_ids if destination_id in entries]
+
+# Declared before /destinations/{destination_id} so "bundles" isn't taken for an id
+@app.get("/destinations/bundles", response_model=List[schemas.DestinationBundle])
+async def get_destination_bundles(
+    request: Request,
+    ids: List[int] = Query(...),
+    db: AsyncSession = Depends(get_db),
+):
+    if len(ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+    bundles = await destination_bundles(db, list(dict.fromkeys(ids)))
+    # The cached bodies are already JSON, so the list is joined, not re-encoded
+    body = b"[" + b",".join(bundle.body for bundle in bundles) + b"]"
+    return CachedResponse(body).to_response(request)
+
+@app.get("/destinations/{destination_id}/bundle", response_model=schemas.DestinationBundle)
+async def get_destination_bundle(destination_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    bundles = await destination_bundles(db, [destination_id])
+    if not bundles:
         raise HTTPException(status_code=404, detail="Destination not found")
-    return destination
+    return bundles[0].to_response(request)
+
+@app.get("/destinations/{destination_id}", response_model=schemas.Destination)
+async def get_destination(destination_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    async def build():
+        destination = await db.get(models.Destination, destination_id)
+        if destination is None:
+            raise HTTPException(status_code=404, detail="Destination not found")
+        return schemas.Destination.model_validate(destination).model_dump_json().encode(), None
+
+    return await cached_json_response(request, ("destination", destination_id), build, destination_id)
 
 # Seat Classes
 @app.get("/destinations/{destination_id}/seat-classes", response_model=List[schemas.SeatClass])
-async def get_seat_classes(destination_id: int, db: Session = Depends(get_db)):
-    seat_classes = db.query(models.SeatClass).filter(models.SeatClass.destination_id == destination_id).all()
-    return seat_classes
+async def get_seat_classes(destination_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    async def build():
+        seat_classes = (await db.scalars(
+            select(models.SeatClass).where(models.SeatClass.destination_id == destination_id)
+        )).all()
+        return seat_class_list_adapter.dump_json(seat_class_list_adapter.validate_python(seat_classes, from_attributes=True)), None
+
+    return await cached_json_response(request, ("seat_classes", destination_id), build, destination_id)
 
 # Accommodations
 @app.get("/destinations/{destination_id}/accommodations", response_model=List[schemas.Accommodation])
-async def get_accommodations(destination_id: int, db: Session = Depends(get_db)):
-    accommodations = db.query(models.Accommodation).filter(models.Accommodation.destination_id == destination_id).all()
-    return accommodations
+async def get_accommodations(destination_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    async def build():
+        accommodations = (await db.scalars(
+            select(models.Accommodation).where(models.Accommodation.destination_id == destination_id)
+        )).all()
+        return accommodation_list_adapter.dump_json(accommodation_list_adapter.validate_python(accommodations, from_attributes=True)), None
+
+    return await cached_json_response(request, ("accommodations", destination_id), build, destination_id)
+
+# Launches
+# Upcoming launches in departure order, from now unless `departs_from` says
+# otherwise. Both the all-destinations and the per-destination form are one
+# index range scan per page, however many flights are scheduled.
+@app.get("/launches", response_model=List[schemas.Launch])
+async def get_launches(
+    destination_id: Optional[int] = None,
+    departs_from: Optional[datetime] = None,
+    departs_to: Optional[datetime] = None,
+    status: Literal["Scheduled", "Scrubbed"] = "Scheduled",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(models.Launch).where(models.Launch.status == status)
+    # Later pages start past the cursor, which is already past departs_from;
+    # given both lower bounds SQLite seeks on the first, so deep pages would
+    # rescan the window from its start
+    if cursor is None:
+        query = query.where(models.Launch.departs_at >= (departs_from or datetime.now()))
+    if destination_id is not None:
+        query = query.where(models.Launch.destination_id == destination_id)
+    if departs_to is not None:
+        query = query.where(models.Launch.departs_at < departs_to)
+
+    launches, next_cursor = await keyset_page(db, query, [models.Launch.departs_at, models.Launch.id], cursor, limit)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_list_response(launch_list_adapter, launches, headers)
+
+# Quotes: every (destination, seat class, accommodation) combination priced for
+# the trip like create_booking prices it, cheapest first, from an in-memory
+# index of catalog prices
+@app.get("/quotes", response_model=List[schemas.Quote])
+async def get_quotes(
+    passengers: int = Query(1, ge=1),
+    nights: int = Query(0, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    type: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    return json_list_response(quote_list_adapter, await search_quotes(db, passengers, nights, max_price, type, limit))
+
+# Search
+@app.get("/search", response_model=List[schemas.SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["destination", "accommodation"]] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    return await search_catalog(db, q, kind, limit)
 
 # Bookings
-@app.post("/bookings", response_model=schemas.Booking)
-async def create_booking(booking: schemas.BookingCreate, db: Session = Depends(get_db)):
-    # In a real app, we would verify the user, check availability, process payment, etc.
-    # For this prototype, we'll just create the booking
+async def place_booking(db, booking):
+    # In a real app, we would verify the user, process payment, etc.
+    # For this prototype, we check seat availability and create the booking
     
     # Get the destination, seat class, and accommodation to calculate the price
-    destination = db.query(models.Destination).filter(models.Destination.id == booking.destination_id).first()
+    destination = await db.get(models.Destination, booking.destination_id)
     if not destination:
         raise HTTPException(status_code=404, detail="Destination not found")
     
-    seat_class = db.query(models.SeatClass).filter(models.SeatClass.id == booking.seat_class_id).first()
+    seat_class = await db.get(models.SeatClass, booking.seat_class_id)
     if not seat_class:
         raise HTTPException(status_code=404, detail="Seat class not found")
     
-    accommodation = db.query(models.Accommodation).filter(models.Accommodation.id == booking.accommodation_id).first()
+    accommodation = await db.get(models.Accommodation, booking.accommodation_id)
     if not accommodation:
         raise HTTPException(status_code=404, detail="Accommodation not found")
+
+    # On a scheduled launch the trip can't end before the launch arrives
+    await check_return_after_arrival(db, booking.destination_id, booking.departure_date, booking.return_date)
     
-    # Calculate the price
-    seat_price = seat_class.price * booking.passengers
-    
-    # Calculate the number of nights
-    departure_date = booking.departure_date
-    return_date = booking.return_date
-    nights = (return_date - departure_date).days
-    
-    accommodation_price = accommodation.price_per_night * nights
-    total_price = seat_price + accommodation_price
+    # Calculate the price; demand rules see the launch as it was before these seats
+    now = datetime.now()
+    launch = (booking.seat_class_id, launch_date_of(booking.departure_date))
+    load = (await launch_loads(db, [launch]))[launch] if pricing.engine.uses_demand else 0
+    total_price = trip_price(
+        seat_class.price, accommodation.price_per_night, booking.passengers,
+        booking.departure_date, booking.return_date, now, load,
+    )
     
+    # Take the seats on this launch before inserting; a sold-out class fails
+    # with 409 and the session rolls back without writing anything
+    await reserve_seats(db, *launch, booking.passengers)
+
     # Create the booking
     db_booking = models.Booking(
         user_id=booking.user_id,
@@ -316,74 +346,198 @@ async def create_booking(booking: schemas.BookingCreate, db: Session = Depends(g
         passengers=booking.passengers,
         total_price=total_price,
         status="Confirmed",
-        booking_date=datetime.now()
+        booking_date=now
     )
     
     db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    await db.flush()
+    await record_trips(db, [(booking.user_id, booking.destination_id, status_delta(None, db_booking.status))])
+
+    # Confirmation email and payment capture run in the background; the jobs
+    # commit with the booking, so neither can exist without the other
+    await enqueue(db, booking_jobs(db_booking.id))
     return db_booking
 
+booking_adapter = TypeAdapter(schemas.Booking)
+
+@app.post("/bookings", response_model=schemas.Booking)
+async def create_booking(
+    booking: schemas.BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER),
+    db: AsyncSession = Depends(get_db),
+):
+    if idempotency_key is None:
+        db_booking = await place_booking(db, booking)
+        await db.commit()
+        return db_booking
+
+    # Retries with the same key get the first response back without the
+    # lookups, the seat reservation or the insert running again
+    async def handler(db):
+        db_booking = await place_booking(db, booking)
+        return 200, booking_adapter.dump_json(booking_adapter.validate_python(db_booking, from_attributes=True))
+
+    return await run_once(db, idempotency_key, booking, handler)
+
+# Changes and cancellations name the booking version they were made against;
+# a stale version gets 409 and the client reloads the booking and retries
+@app.patch("/bookings/{booking_id}", response_model=schemas.Booking)
+async def update_booking(booking_id: int, change: schemas.BookingUpdate, db: AsyncSession = Depends(get_db)):
+    booking = await modify_booking(db, booking_id, change)
+    await db.commit()
+    return booking
+
+@app.post("/bookings/{booking_id}/cancel", response_model=schemas.Booking)
+async def cancel(booking_id: int, body: schemas.BookingCancel, db: AsyncSession = Depends(get_db)):
+    booking = await cancel_booking(db, booking_id, body.version)
+    await db.commit()
+    return booking
+
+# A scrubbed launch: every Confirmed or Pending booking departing that day
+@app.post("/destinations/{destination_id}/launches/{launch_date}/cancel", response_model=schemas.LaunchCancellation)
+async def scrub_launch(destination_id: int, launch_date: date, db: AsyncSession = Depends(get_db)):
+    result = await cancel_launch(db, destination_id, launch_date)
+    await db.commit()
+    return result
+
+# Partner agencies submit batches as a JSON array or NDJSON (application/x-ndjson);
+# rows that fail validation, lookup or inventory are reported by index and the
+# rest are inserted in one transaction
+@app.post("/bookings/bulk", response_model=schemas.BulkBookingResult)
+async def create_bookings_bulk(request: Request, db: AsyncSession = Depends(get_db)):
+    rows = await read_booking_rows(request)
+    return await ingest_bookings(db, rows)
+
+# Finance export: every matching booking streamed as NDJSON or CSV
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@app.get("/bookings/export")
+async def export_bookings(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: Optional[str] = None,
+    destination_id: Optional[int] = None,
+    booked_from: Optional[datetime] = None,
+    booked_to: Optional[datetime] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+):
+    query = export_query(status, destination_id, booked_from, booked_to, departure_from, departure_to)
+    return StreamingResponse(
+        stream_bookings(query, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="bookings.{format}"'},
+    )
+
 @app.get("/users/{user_id}/bookings", response_model=List[schemas.BookingWithDetails])
-async def get_user_bookings(user_id: int, db: Session = Depends(get_db)):
+async def get_user_bookings(
+    user_id: int,
+    status: Optional[str] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
     # Check if user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.scalar(select(models.User.id).where(models.User.id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get all bookings for the user
-    bookings = db.query(models.Booking).filter(models.Booking.user_id == user_id).all()
-    
-    # Prepare the response with detailed information
-    result = []
-    for booking in bookings:
-        destination = db.query(models.Destination).filter(models.Destination.id == booking.destination_id).first()
-        seat_class = db.query(models.SeatClass).filter(models.SeatClass.id == booking.seat_class_id).first()
-        accommodation = db.query(models.Accommodation).filter(models.Accommodation.id == booking.accommodation_id).first()
-        
-        booking_with_details = schemas.BookingWithDetails(
-            id=booking.id,
-            user_id=booking.user_id,
-            destination=schemas.Destination.model_validate(destination),  # Changed from from_orm
-            seat_class=schemas.SeatClass.model_validate(seat_class),      # Changed from from_orm
-            accommodation=schemas.Accommodation.model_validate(accommodation),  # Changed from from_orm
-            departure_date=booking.departure_date,
-            return_date=booking.return_date,
-            passengers=booking.passengers,
-            total_price=booking.total_price,
-            status=booking.status,
-            booking_date=booking.booking_date
+    # Get a page of bookings for the user (newest first), loading the destination,
+    # seat class and accommodation in the same statement instead of three
+    # queries per booking
+    query = (
+        select(models.Booking)
+        .options(
+            joinedload(models.Booking.destination),
+            joinedload(models.Booking.seat_class),
+            joinedload(models.Booking.accommodation),
         )
-        result.append(booking_with_details)
-    
-    return result
+        .where(models.Booking.user_id == user_id)
+    )
+    if status is not None:
+        query = query.where(models.Booking.status == status)
+    if departure_from is not None:
+        query = query.where(models.Booking.departure_date >= departure_from)
+    if departure_to is not None:
+        query = query.where(models.Booking.departure_date < departure_to)
+
+    if departure_from is None and departure_to is None:
+        bookings, next_cursor = await keyset_page(
+            db, query, [models.Booking.booking_date, models.Booking.id], cursor, limit, descending=True
+        )
+    else:
+        # A departure window is paged in departure order, soonest first, so the
+        # window and the page are one range of ix_bookings_user_departure_date
+        bookings, next_cursor = await keyset_page(
+            db, query, [models.Booking.departure_date, models.Booking.id], cursor, limit
+        )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return json_list_response(booking_list_adapter, bookings, headers)
 
 # User Profile
 @app.get("/users/{user_id}", response_model=schemas.User)
-async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user_profile(user_id: int, db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+# Leaderboard
+# Each ordering walks its users index backwards from the top, so a page costs
+# `limit` index entries however many users there are
+LEADERBOARD_ORDER = {
+    "miles": [models.User.total_miles, models.User.id],
+    "level": [models.User.traveler_level, models.User.total_miles, models.User.id],
+}
+
+@app.get("/leaderboard", response_model=List[schemas.LeaderboardEntry])
+async def get_leaderboard(
+    response: Response,
+    by: Literal["miles", "level"] = "miles",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    users, next_cursor = await keyset_page(db, select(models.User), LEADERBOARD_ORDER[by], cursor, limit, descending=True)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
+
+# Static media: the files image_url and avatar_url point at, with resized
+# variants (?w=) and immutable caching for versioned URLs (?v=); see media.py
+@app.get("/images/{filename}", include_in_schema=False)
+async def get_image(request: Request, filename: str, w: Optional[int] = None, v: Optional[str] = None):
+    return await media_response(request, "images", filename, w, v)
+
+@app.get("/avatars/{filename}", include_in_schema=False)
+async def get_avatar(request: Request, filename: str, w: Optional[int] = None, v: Optional[str] = None):
+    return await media_response(request, "avatars", filename, w, v)
+
 # AI Space Travel Tips
+# Static, so every worker serves the same list without sharing any state
+SPACE_TRAVEL_TIPS = (
+    "Stay hydrated! In space, your body doesn't signal thirst as effectively.",
+    "Practice your space photography skills - the Earth looks stunning from orbit!",
+    "Pack light, comfortable clothing. Remember that in zero-G, comfort is key.",
+    "Prepare for space adaptation syndrome by practicing balance exercises before your trip.",
+    "Bring a small memento to experience weightlessness with - it makes for a great memory.",
+    "Don't forget to use sunscreen on space walks - solar radiation is much stronger without atmospheric protection.",
+    "Join pre-flight orientation sessions to make the most of your space experience.",
+    "Keep a space journal - you'll want to remember every detail of this once-in-a-lifetime experience."
+)
+
 @app.get("/space-travel-tips", response_model=List[str])
 async def get_space_travel_tips():
-    tips = [
-        "Stay hydrated! In space, your body doesn't signal thirst as effectively.",
-        "Practice your space photography skills - the Earth looks stunning from orbit!",
-        "Pack light, comfortable clothing. Remember that in zero-G, comfort is key.",
-        "Prepare for space adaptation syndrome by practicing balance exercises before your trip.",
-        "Bring a small memento to experience weightlessness with - it makes for a great memory.",
-        "Don't forget to use sunscreen on space walks - solar radiation is much stronger without atmospheric protection.",
-        "Join pre-flight orientation sessions to make the most of your space experience.",
-        "Keep a space journal - you'll want to remember every detail of this once-in-a-lifetime experience."
-    ]
-    
     # Return 4-6 random tips
     num_tips = random.randint(4, 6)
-    return random.sample(tips, num_tips)
+    return random.sample(SPACE_TRAVEL_TIPS, num_tips)
 
 if __name__ == "__main__":
     import uvicorn
+    from manage import setup_database
+
+    # Development entry point: bring the local database up to date first. In
+    # production run `python manage.py serve` instead.
+    setup_database()
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
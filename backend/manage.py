@@ -0,0 +1,120 @@
+# manage.py
+# Database management commands, run once per deployment rather than by every
+# worker at import:
+#
+#   python manage.py migrate     apply pending schema migrations
+#   python manage.py status      list pending migrations
+#   python manage.py seed        insert the demo catalog, users and bookings if empty
+#   python manage.py purge-keys  delete expired idempotency keys
+#   python manage.py reconcile-stats  recompute users' travel stats from bookings
+#   python manage.py complete-trips  mark Confirmed bookings whose return has passed Completed
+#   python manage.py worker      run background job workers until interrupted
+#   python manage.py serve       run the API with WEB_CONCURRENCY worker processes
+import argparse
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import followups  # Registers the booking job handlers
+import migrations
+from changes import complete_trips, keep_completing_trips
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from idempotency import expired_keys
+from jobs import WorkerPool
+from locks import file_lock
+from seed import seed_dummy_data
+from stats import reconcile
+
+def migrate():
+    migrations.upgrade(engine)
+
+def status():
+    pending = migrations.pending(engine)
+    if not pending:
+        print("Database is up to date.")
+    for version, name in pending:
+        print(f"Pending migration {version}: {name}")
+
+def seed():
+    with SessionLocal() as db:
+        seed_dummy_data(db)
+
+def purge_keys():
+    # The API also purges as it goes; this is for cron or a quiet deployment
+    with SessionLocal() as db:
+        deleted = db.execute(expired_keys()).rowcount
+        db.commit()
+    print(f"Deleted {deleted} expired idempotency keys.")
+
+def reconcile_stats():
+    # Stats are kept up to date as bookings change; run this (e.g. nightly)
+    # to repair drift from writes made outside the API
+    with SessionLocal() as db:
+        updated = reconcile(db)
+        db.commit()
+    print(f"Reconciled travel stats for {updated} users.")
+
+def complete_trips_now():
+    # The API completes trips every TRIP_COMPLETION_SECONDS; this is for cron
+    # with that set to 0
+    async def run():
+        try:
+            async with AsyncSessionLocal() as db:
+                completed = await complete_trips(db)
+                await db.commit()
+            return completed
+        finally:
+            await async_engine.dispose()
+
+    print(f"Completed {asyncio.run(run())} trips.")
+
+def worker():
+    # A dedicated worker process; run the API with JOB_WORKERS=0 to leave all
+    # background jobs to processes like this one
+    async def run():
+        pool = WorkerPool(max(config.JOB_WORKERS, 1))
+        pool.start()
+        completer = asyncio.create_task(keep_completing_trips()) if config.TRIP_COMPLETION_SECONDS else None
+        try:
+            await asyncio.Event().wait()
+        finally:
+            if completer is not None:
+                completer.cancel()
+            await pool.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+def serve():
+    # Production entry point: uvicorn's supervisor spawns the workers, which
+    # each import main and share the listening socket
+    import uvicorn
+
+    uvicorn.run(
+        "main:app", host=config.HOST, port=config.PORT, workers=config.WEB_CONCURRENCY,
+        app_dir=os.path.dirname(os.path.abspath(__file__)), access_log=config.ACCESS_LOG,
+    )
+
+def startup():
+    # Run by each worker's lifespan with STARTUP_MIGRATE: whichever takes the
+    # lock first migrates (and seeds); the others then find nothing pending
+    with file_lock(config.STARTUP_LOCK_PATH):
+        migrate()
+        if config.STARTUP_SEED:
+            seed()
+
+def setup_database():
+    # Convenience for development and the benchmark scripts
+    migrate()
+    seed()
+
+COMMANDS = {"migrate": migrate, "status": status, "seed": seed, "purge-keys": purge_keys, "reconcile-stats": reconcile_stats, "complete-trips": complete_trips_now, "worker": worker, "serve": serve}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space Travel Booking database management")
+    parser.add_argument("command", choices=COMMANDS)
+    COMMANDS[parser.parse_args().command]()
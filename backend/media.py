@@ -0,0 +1,102 @@
+# media.py
+import asyncio
+import os
+import stat
+from email.utils import formatdate
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: without it originals are served in place of resized variants
+    Image = None
+
+import config
+from cache import not_modified
+from media_versions import MEDIA_KINDS, THUMBNAIL_WIDTHS, content_version, known_version, record
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+class MediaFile:
+    __slots__ = ("kind", "filename", "path", "stat", "version")
+
+    def __init__(self, kind, filename, path, stat_result, version):
+        self.kind, self.filename, self.path = kind, filename, path
+        self.stat, self.version = stat_result, version
+
+    @property
+    def last_modified(self):
+        # Whole seconds, as HTTP dates carry them
+        return int(self.stat.st_mtime)
+
+async def media_file(kind, filename):
+    # The original under MEDIA_ROOT, or None; names can't leave their directory
+    if kind not in MEDIA_KINDS or not filename or filename.startswith(".") or "/" in filename or os.sep in filename:
+        return None
+    path = os.path.join(config.MEDIA_ROOT, kind, filename)
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    version = known_version(path, stat_result)
+    if version is None:
+        # A new or changed file is read and hashed off the event loop
+        version = await asyncio.to_thread(content_version, path, stat_result)
+    # Lists link this version from now on, without waiting for the next scan
+    record(kind, filename, version)
+    return MediaFile(kind, filename, path, stat_result, version)
+
+def render(source, target, width):
+    # Downscale only, keeping the aspect ratio; written aside and renamed so
+    # readers (and other workers) never see a partial file
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, width * 10))
+        partial = f"{target}.{os.getpid()}.tmp"
+        image.convert("RGB").save(partial, "JPEG", quality=config.MEDIA_THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    os.replace(partial, target)
+
+# Variants being rendered in this process, so concurrent requests for the
+# same one wait on a single render
+_rendering = {}
+
+async def variant(found, width):
+    directory = os.path.join(config.MEDIA_CACHE_DIR, found.kind)
+    stem = os.path.splitext(found.filename)[0]
+    target = os.path.join(directory, f"{stem}.{found.version}.w{width}.q{config.MEDIA_THUMBNAIL_QUALITY}.jpg")
+    if not os.path.exists(target):
+        task = _rendering.get(target)
+        if task is None:
+            os.makedirs(directory, exist_ok=True)
+            task = _rendering[target] = asyncio.ensure_future(asyncio.to_thread(render, found.path, target, width))
+            task.add_done_callback(lambda _: _rendering.pop(target, None))
+        await asyncio.shield(task)
+    return target
+
+async def media_response(request: Request, kind, filename, width=None, version=None):
+    found = await media_file(kind, filename)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if width is not None and width not in THUMBNAIL_WIDTHS:
+        raise HTTPException(status_code=422, detail=f"w must be one of {', '.join(map(str, THUMBNAIL_WIDTHS))}")
+
+    path, stat_result, etag = found.path, found.stat, f'"{found.version}"'
+    if width is not None and Image is not None:
+        path = await variant(found, width)
+        stat_result, etag = os.stat(path), f'"{found.version}-w{width}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(found.last_modified, usegmt=True),
+        # A URL naming the current version never changes content; anything
+        # else may, so it is cached for a while and then revalidated
+        "Cache-Control": IMMUTABLE if version == found.version else f"public, max-age={config.MEDIA_MAX_AGE_SECONDS}",
+    }
+    if not_modified(request, etag, found.last_modified):
+        return Response(status_code=304, headers=headers)
+    # Streams from disk (or hands the path to servers supporting the ASGI
+    # pathsend extension) and answers Range requests with 206
+    return FileResponse(path, headers=headers, stat_result=stat_result)
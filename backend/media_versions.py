@@ -0,0 +1,86 @@
+# media_versions.py
+# The content version of every file under MEDIA_ROOT, by kind and filename,
+# for versioned thumbnail URLs. Lists look versions up here while they are
+# serialized, so building a URL costs a dict lookup: the files are scanned
+# once at startup and again every MEDIA_VERSIONS_REFRESH_SECONDS (in a
+# thread), and a media request that finds a file changed records its new
+# version at once.
+# Only the standard library and config, so schemas can import it.
+import asyncio
+import hashlib
+import logging
+import os
+import stat
+
+import config
+
+logger = logging.getLogger("space_travel.media")
+
+MEDIA_KINDS = ("images", "avatars")
+THUMBNAIL_WIDTHS = sorted(int(width) for width in config.MEDIA_THUMBNAIL_WIDTHS.split(",") if width.strip())
+
+# Content versions by path, rehashed only when a file's size or mtime changes
+_hashes = {}
+
+def content_version(path, stat_result):
+    key = (stat_result.st_mtime_ns, stat_result.st_size)
+    known = _hashes.get(path)
+    if known is None or known[0] != key:
+        with open(path, "rb") as file:
+            known = _hashes[path] = (key, hashlib.sha1(file.read()).hexdigest()[:16])
+    return known[1]
+
+def known_version(path, stat_result):
+    # The version if this exact file has been hashed before, else None
+    known = _hashes.get(path)
+    if known is not None and known[0] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return known[1]
+    return None
+
+# (kind, filename) -> version, empty until the first scan: the app's lifespan
+# scans at startup, and in-process clients that skip it call refresh()
+_versions = {}
+
+def scan():
+    versions = {}
+    for kind in MEDIA_KINDS:
+        directory = os.path.join(config.MEDIA_ROOT, kind)
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                stat_result = entry.stat()
+                if stat.S_ISREG(stat_result.st_mode):
+                    versions[kind, entry.name] = content_version(entry.path, stat_result)
+            except OSError:
+                continue
+    return versions
+
+def refresh():
+    # Swapped in whole, so lookups never see a half-built map
+    global _versions
+    _versions = scan()
+
+def record(kind, filename, version):
+    _versions[kind, filename] = version
+
+async def keep_fresh():
+    while True:
+        await asyncio.sleep(config.MEDIA_VERSIONS_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(refresh)
+        except Exception:
+            logger.exception("Media version refresh failed")
+
+def thumbnail_url(url, width=config.MEDIA_LIST_WIDTH):
+    # "/images/mars-base.jpg" -> "/images/mars-base.jpg?w=320&v=<version>";
+    # None when the file isn't in MEDIA_ROOT
+    kind, _, filename = (url or "").lstrip("/").partition("/")
+    version = _versions.get((kind, filename))
+    if version is None:
+        return None
+    return f"/{kind}/{filename}?w={width}&v={version}"
@@ -0,0 +1,145 @@
+# metrics.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from fastapi import Response
+from sqlalchemy import event
+
+import config
+
+logger = logging.getLogger("space_travel.sql")
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# SQL issued while handling the current request; None outside a request
+request_stats = ContextVar("request_stats", default=None)
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+class RouteMetrics:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.requests = 0
+        self.latency_seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+
+# Totals per (method, route template, status), kept for the process lifetime
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, latency, stats, response_bytes):
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = RouteMetrics()
+            route.bucket_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            route.requests += 1
+            route.latency_seconds += latency
+            route.queries += stats.queries
+            route.db_seconds += stats.db_seconds
+            route.response_bytes += response_bytes
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            for (method, path, status), route in routes:
+                labels = f'method="{method}",route="{path}",status="{status}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), route.bucket_counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {route.latency_seconds:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {route.requests}")
+            for name, description, attribute, fmt in [
+                ("http_db_queries_total", "SQL statements executed by route template.", "queries", "{}"),
+                ("http_db_seconds_total", "Time spent executing SQL by route template.", "db_seconds", "{:.6f}"),
+                ("http_response_bytes_total", "Response body bytes by route template.", "response_bytes", "{}"),
+            ]:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for (method, path, status), route in routes:
+                    labels = f'method="{method}",route="{path}",status="{status}"'
+                    lines.append(f"{name}{{{labels}}} {fmt.format(getattr(route, attribute))}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+def metrics_response():
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
+
+# ASGI middleware rather than BaseHTTPMiddleware, so streamed responses pass
+# through untouched and the byte count covers every body chunk
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+        content_length = None
+
+        async def send_with_metrics(message):
+            nonlocal status, response_bytes, content_length
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_length = dict(message.get("headers", [])).get(b"content-length")
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                server_timing = (
+                    f'app;dur={elapsed_ms:.1f}, '
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing.encode())]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            elif message["type"] == "http.response.pathsend":
+                # The server sends the file itself; count what it was told to send
+                response_bytes += int(content_length or 0)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            request_stats.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            registry.observe((scope["method"], path, status), time.perf_counter() - started, stats, response_bytes)
+
+# SQL hooks: count statements and time them against the current request, and
+# log anything slower than SLOW_QUERY_MS
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= config.SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+def instrument(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
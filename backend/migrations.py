@@ -0,0 +1,182 @@
+# migrations.py
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text, update
+
+import config
+import launches
+import models
+import search
+import seed
+import stats
+
+# Applied migrations are recorded here, one row per version
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Migrations run in version order, each in its own transaction, and must be
+# safe on a database that already has the change: the baseline creates the
+# current models, so on a fresh database later migrations find their work
+# done. Append new ones; never renumber or edit an applied one.
+
+def baseline_schema(conn):
+    # Create whatever is missing, including indexes added to tables that
+    # existed before migrations were tracked
+    models.Base.metadata.create_all(bind=conn)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+def feature_columns_json(conn):
+    # Seat class and accommodation features used to be a TEXT column decoded
+    # on every read; rows written then may hold NULL or '' where the JSON
+    # column expects a list, and PostgreSQL needs the column retyped
+    inspector = inspect(conn)
+    for table in ("seat_classes", "accommodations"):
+        column_type = next(c["type"] for c in inspector.get_columns(table) if c["name"] == "_features")
+        if isinstance(column_type, JSON):
+            continue
+        conn.execute(text(f"UPDATE {table} SET _features = '[]' WHERE _features IS NULL OR _features = ''"))
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN _features TYPE JSON USING _features::json"))
+
+def idempotency_keys(conn):
+    models.IdempotencyKey.__table__.create(bind=conn, checkfirst=True)
+    for index in models.IdempotencyKey.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def user_travel_stats(conn):
+    # Destinations gain a distance (filled in for the demo catalog by name;
+    # others stay 0 until set) and users' travel stats become derived from
+    # flown bookings. Users with no flown trip on record keep the stats they
+    # had, which were entered by hand rather than derived from bookings.
+    columns = {c["name"] for c in inspect(conn).get_columns("destinations")}
+    if "distance_miles" not in columns:
+        conn.execute(text("ALTER TABLE destinations ADD COLUMN distance_miles INTEGER NOT NULL DEFAULT 0"))
+        destinations = models.Destination.__table__
+        for name, distance_miles in seed.DESTINATION_DISTANCES.items():
+            conn.execute(update(destinations).where(destinations.c.name == name).values(distance_miles=distance_miles))
+    models.UserDestinationTrips.__table__.create(bind=conn, checkfirst=True)
+    for index in models.User.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+    stats.reconcile(conn, keep_untracked=True)
+
+def job_queue(conn):
+    models.Job.__table__.create(bind=conn, checkfirst=True)
+    for index in models.Job.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def catalog_search(conn):
+    search.create_search_index(conn)
+
+def booking_versions(conn):
+    # Bookings gain a version for optimistic concurrency (existing rows start
+    # at 1) and an index to find everyone on a launch
+    columns = {c["name"] for c in inspect(conn).get_columns("bookings")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE bookings ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    for index in models.Booking.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def launch_schedule(conn):
+    # Launches get their own table with typed departures and durations. It is
+    # filled from each destination's free-text next_launch and travel_time,
+    # plus every launch day that already has seats sold (at the capacity its
+    # inventory was opened with). Days already on the schedule are skipped.
+    # Text that doesn't parse is reported and left out.
+    models.Launch.__table__.create(bind=conn, checkfirst=True)
+    for index in models.Launch.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+    durations, wanted, unparsed = {}, {}, []
+    for row in conn.execute(select(models.Destination.id, models.Destination.next_launch, models.Destination.travel_time)):
+        hours = launches.parse_travel_time(row.travel_time)
+        if hours is None:
+            unparsed.append(f"destination {row.id} travel_time {row.travel_time!r}")
+            continue
+        durations[row.id] = hours
+        departs_at = launches.parse_launch_date(row.next_launch)
+        if departs_at is None:
+            unparsed.append(f"destination {row.id} next_launch {row.next_launch!r}")
+        else:
+            wanted[row.id, departs_at.date()] = config.SEATS_PER_LAUNCH
+    sold = conn.execute(
+        select(models.SeatClass.destination_id, models.SeatInventory.launch_date, func.max(models.SeatInventory.capacity))
+        .join(models.SeatInventory, models.SeatInventory.seat_class_id == models.SeatClass.id)
+        .group_by(models.SeatClass.destination_id, models.SeatInventory.launch_date)
+    )
+    for destination_id, launch_date, capacity in sold:
+        wanted[destination_id, launch_date] = capacity
+
+    scheduled = {
+        (row.destination_id, row.departs_at.date())
+        for row in conn.execute(select(models.Launch.destination_id, models.Launch.departs_at))
+    }
+    rows = [
+        {"destination_id": destination_id, "departs_at": datetime.combine(launch_date, datetime.min.time()),
+         "duration_hours": durations[destination_id], "capacity": capacity, "status": "Scheduled"}
+        for (destination_id, launch_date), capacity in sorted(wanted.items())
+        if destination_id in durations and (destination_id, launch_date) not in scheduled
+    ]
+    if rows:
+        conn.execute(insert(models.Launch), rows)
+    for problem in unparsed:
+        print(f"  launch schedule: skipped {problem}")
+
+def booking_departure_pages(conn):
+    # /users/{id}/bookings pages a departure window on (departure_date, id);
+    # the index that serves it used to end at departure_date
+    index = next(index for index in models.Booking.__table__.indexes if index.name == "ix_bookings_user_departure_date")
+    existing = {found["name"]: found["column_names"] for found in inspect(conn).get_indexes("bookings")}
+    if existing.get(index.name) not in (None, [column.name for column in index.columns]):
+        index.drop(bind=conn)
+    index.create(bind=conn, checkfirst=True)
+
+def trip_completion(conn):
+    # complete_trips (changes.py) finds returned Confirmed bookings by index
+    for index in models.Booking.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def destination_price_pages(conn):
+    # /destinations pages a type in price order on ix_destinations_type_base_price_id
+    for index in models.Destination.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "baseline schema", baseline_schema),
+    (2, "features as JSON", feature_columns_json),
+    (3, "idempotency keys", idempotency_keys),
+    (4, "user travel stats", user_travel_stats),
+    (5, "job queue", job_queue),
+    (6, "catalog search index", catalog_search),
+    (7, "booking versions", booking_versions),
+    (8, "launch schedule", launch_schedule),
+    (9, "booking departure pages", booking_departure_pages),
+    (10, "trip completion", trip_completion),
+    (11, "destination price pages", destination_price_pages),
+]
+
+def applied_versions(engine):
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.scalars(select(schema_migrations.c.version)))
+
+def upgrade(engine):
+    applied = applied_versions(engine)
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+        print(f"Applied migration {version}: {name}")
+
+def pending(engine):
+    applied = applied_versions(engine)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
@@ -1,8 +1,9 @@
 # models.py
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Text, JSON, ARRAY
+from datetime import timedelta
+
+from sqlalchemy import Boolean, CheckConstraint, Column, Date, ForeignKey, Index, Integer, String, Float, DateTime, Text, JSON, ARRAY, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import json
 
 from database import Base
 
@@ -25,6 +26,13 @@ class User(Base):
     # Relationships
     bookings = relationship("Booking", back_populates="user")
 
+    # The travel stats above are maintained from bookings (see stats.py);
+    # these indexes serve the leaderboard without sorting the table
+    __table_args__ = (
+        Index("ix_users_total_miles_id", "total_miles", "id"),
+        Index("ix_users_level_miles_id", "traveler_level", "total_miles", "id"),
+    )
+
 class Destination(Base):
     __tablename__ = "destinations"
 
@@ -36,12 +44,21 @@ class Destination(Base):
     base_price = Column(Integer)  # Price in USD
     image_url = Column(String)
     next_launch = Column(String)
+    distance_miles = Column(Integer, nullable=False, default=0, server_default="0")  # One way, from Earth
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
     seat_classes = relationship("SeatClass", back_populates="destination")
     accommodations = relationship("Accommodation", back_populates="destination")
     bookings = relationship("Booking", back_populates="destination")
+    launches = relationship("Launch", back_populates="destination")
+
+    # Composite indexes backing the /destinations filters and keyset pagination
+    __table_args__ = (
+        Index("ix_destinations_type_id", "type", "id"),
+        Index("ix_destinations_base_price_id", "base_price", "id"),
+        Index("ix_destinations_type_base_price_id", "type", "base_price", "id"),
+    )
 
 class SeatClass(Base):
     __tablename__ = "seat_classes"
@@ -50,21 +67,16 @@ class SeatClass(Base):
     name = Column(String)  # Economy, Luxury Cabin, VIP Zero-G Suite
     description = Column(Text)
     price = Column(Integer)  # Price in USD
-    _features = Column(Text)  # Stored as JSON string
+    # JSON column: decoded once when the row is loaded, not on every read.
+    # Mapped to the original "_features" TEXT column, which already holds JSON.
+    features = Column("_features", JSON, nullable=False, default=list)
     destination_id = Column(Integer, ForeignKey("destinations.id"))
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships
     destination = relationship("Destination", back_populates="seat_classes")
     bookings = relationship("Booking", back_populates="seat_class")
-    
-    @property
-    def features(self):
-        return json.loads(self._features) if self._features else []
-    
-    @features.setter
-    def features(self, value):
-        self._features = json.dumps(value)
+    inventory = relationship("SeatInventory", back_populates="seat_class")
 
 class Accommodation(Base):
     __tablename__ = "accommodations"
@@ -73,7 +85,7 @@ class Accommodation(Base):
     name = Column(String)
     description = Column(Text)
     price_per_night = Column(Integer)  # Price in USD
-    _features = Column(Text)  # Stored as JSON string
+    features = Column("_features", JSON, nullable=False, default=list)  # Same as SeatClass.features
     rating = Column(Float, default=0.0)
     destination_id = Column(Integer, ForeignKey("destinations.id"))
     created_at = Column(DateTime, server_default=func.now())
@@ -81,14 +93,6 @@ class Accommodation(Base):
     # Relationships
     destination = relationship("Destination", back_populates="accommodations")
     bookings = relationship("Booking", back_populates="accommodation")
-    
-    @property
-    def features(self):
-        return json.loads(self._features) if self._features else []
-    
-    @features.setter
-    def features(self, value):
-        self._features = json.dumps(value)
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -104,9 +108,107 @@ class Booking(Base):
     total_price = Column(Integer)  # Total price in USD
     status = Column(String)  # Confirmed, Pending, Cancelled
     booking_date = Column(DateTime, server_default=func.now())
+    # Bumped by every change; an update names the version it read and fails
+    # if someone else changed the booking first (see changes.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     user = relationship("User", back_populates="bookings")
     destination = relationship("Destination", back_populates="bookings")
     seat_class = relationship("SeatClass", back_populates="bookings")
-    accommodation = relationship("Accommodation", back_populates="bookings")
\ No newline at end of file
+    accommodation = relationship("Accommodation", back_populates="bookings")
+
+    # Composite indexes backing the /users/{user_id}/bookings filters and keyset pagination
+    __table_args__ = (
+        Index("ix_bookings_user_booking_date", "user_id", "booking_date", "id"),
+        Index("ix_bookings_user_status_booking_date", "user_id", "status", "booking_date", "id"),
+        Index("ix_bookings_user_departure_date", "user_id", "departure_date", "id"),
+        # Everyone on one launch, for cancelling it (and exports by destination)
+        Index("ix_bookings_destination_departure_date", "destination_id", "departure_date"),
+        # Confirmed trips whose return has passed, for completing them
+        Index("ix_bookings_status_return_date", "status", "return_date"),
+    )
+
+class SeatInventory(Base):
+    __tablename__ = "seat_inventory"
+
+    id = Column(Integer, primary_key=True, index=True)
+    seat_class_id = Column(Integer, ForeignKey("seat_classes.id"), nullable=False)
+    launch_date = Column(Date, nullable=False)  # Departure day of the launch
+    capacity = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    seat_class = relationship("SeatClass", back_populates="inventory")
+
+    # One row per launch and class; reservations are a conditional UPDATE on it
+    __table_args__ = (
+        UniqueConstraint("seat_class_id", "launch_date", name="uq_seat_inventory_class_launch"),
+        CheckConstraint("reserved >= 0 AND reserved <= capacity", name="ck_seat_inventory_reserved"),
+    )
+
+class Launch(Base):
+    __tablename__ = "launches"
+
+    # Scheduled flights. Destination.next_launch and travel_time remain as
+    # display text; queries and validation use these typed columns.
+    id = Column(Integer, primary_key=True, index=True)
+    destination_id = Column(Integer, ForeignKey("destinations.id"), nullable=False)
+    departs_at = Column(DateTime, nullable=False)
+    duration_hours = Column(Integer, nullable=False)  # One way, Earth to destination
+    capacity = Column(Integer, nullable=False)  # Seats per seat class
+    status = Column(String, nullable=False, default="Scheduled")  # Scheduled, Scrubbed
+
+    # Relationships
+    destination = relationship("Destination", back_populates="launches")
+
+    @property
+    def arrives_at(self):
+        return self.departs_at + timedelta(hours=self.duration_hours)
+
+    # Upcoming launches, overall and per destination, are index range scans in
+    # departure order (and keyset pages on departs_at, id)
+    __table_args__ = (
+        Index("ix_launches_status_departs_at", "status", "departs_at", "id"),
+        Index("ix_launches_destination_status_departs_at", "destination_id", "status", "departs_at", "id"),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Client-chosen Idempotency-Key; the stored response is replayed for
+    # repeats until expires_at, after which the row is purged
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)  # SHA-256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class UserDestinationTrips(Base):
+    __tablename__ = "user_destination_trips"
+
+    # Counted trips per user and destination, so users.destinations (distinct
+    # destinations visited) can be maintained incrementally
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    destination_id = Column(Integer, ForeignKey("destinations.id"), primary_key=True)
+    trips = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # Name of a handler registered in jobs.py
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # When a queued job may next run; for a running job, when its lease expires
+    run_after = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Workers claim the oldest due job with a range scan on this index
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after", "id"),
+    )
@@ -0,0 +1,50 @@
+# pagination.py
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Page size limits shared by all paginated list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values):
+    # Cursors are opaque to clients: the sort key of the last row, base64 encoded
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, types):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor length mismatch")
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(payload, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def keyset_page(db, query, columns, cursor, limit, descending=False):
+    # Seek past the cursor on the sort key instead of using OFFSET, so every
+    # page is an index range scan no matter how deep the client has paged
+    key_types = [column.type.python_type for column in columns]
+    if cursor:
+        last = decode_cursor(cursor, key_types)
+        if descending:
+            query = query.where(tuple_(*columns) < tuple_(*last))
+        else:
+            query = query.where(tuple_(*columns) > tuple_(*last))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = (await db.scalars(query.order_by(*order).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows, next_cursor
@@ -0,0 +1,186 @@
+# pricing.py
+from bisect import bisect_right
+
+try:
+    import numpy
+except ImportError:  # Optional: without it batches are priced column by column in plain Python
+    numpy = None
+
+import config
+
+# Catalog price ladder: seat classes are multiples of a destination's base
+# price and accommodations charge a fraction of it per night
+SEAT_CLASS_FACTORS = {"Economy": 1.0, "Luxury Cabin": 1.75, "VIP Zero-G Suite": 3.5}
+NIGHTLY_RATE_FACTORS = {"Standard Pod": 0.01, "Comfort Suite": 0.025, "Luxury Habitat": 0.05}
+
+# Rule adjustments are integer basis points (1/100 of a percent) applied with
+# floor division, so a batch and a loop over the same rows agree to the unit
+BASIS_POINTS = 10000
+
+def seat_class_price(base_price, name):
+    return int(base_price * SEAT_CLASS_FACTORS[name])
+
+def nightly_rate(base_price, name):
+    return int(base_price * NIGHTLY_RATE_FACTORS[name])
+
+def quote_price(seat_price, price_per_night, passengers, nights):
+    # The base fare: seats are charged per passenger, the accommodation per night
+    return seat_price * passengers + price_per_night * nights
+
+def parse_tiers(text):
+    # "180:10,90:5" -> thresholds [90, 180] and percents as basis points [500, 1000]
+    tiers = sorted(
+        (int(threshold), round(float(percent) * 100))
+        for threshold, percent in (item.split(":") for item in filter(None, (part.strip() for part in text.split(","))))
+    )
+    return [threshold for threshold, _ in tiers], [bps for _, bps in tiers]
+
+def tier(value, thresholds, bps):
+    # The basis points of the highest tier a value reaches, 0 below the first
+    return ([0, *bps])[bisect_right(thresholds, value)]
+
+def tier_column(values, thresholds, bps):
+    table = [0, *bps]
+    if numpy is not None:
+        return numpy.asarray(table)[numpy.searchsorted(thresholds, values, side="right")]
+    return [table[bisect_right(thresholds, value)] for value in values]
+
+def scale_column(amounts, bps):
+    if numpy is not None:
+        return amounts * (BASIS_POINTS + bps) // BASIS_POINTS
+    return [amount * (BASIS_POINTS + bp) // BASIS_POINTS for amount, bp in zip(amounts, bps)]
+
+# Rules see one itinerary (price) or whole columns of them (price_batch) and
+# return basis points to add to their component: "seats" (the per-passenger
+# fare) or "trip" (seats and accommodation alike). Both methods must agree.
+
+class DemandSurge:
+    # Seats get dearer as a launch fills: nothing up to `start` load, rising
+    # linearly to `markup` when sold out. Load is in basis points of capacity.
+    component = "seats"
+    uses_demand = True
+
+    def __init__(self, start, markup):
+        if not 0 <= start < BASIS_POINTS:
+            raise ValueError(f"Surge start must be below {BASIS_POINTS} basis points, not {start}")
+        self.start, self.markup = start, markup
+
+    def adjustment(self, itinerary):
+        return self.markup * max(0, itinerary.load - self.start) // (BASIS_POINTS - self.start)
+
+    def adjustments(self, batch):
+        if numpy is not None:
+            return self.markup * numpy.maximum(0, batch.load - self.start) // (BASIS_POINTS - self.start)
+        return [self.markup * max(0, load - self.start) // (BASIS_POINTS - self.start) for load in batch.load]
+
+class EarlyBooking:
+    # Discount on the whole trip for booking at least N days before launch
+    component = "trip"
+    uses_demand = False
+
+    def __init__(self, tiers):
+        self.thresholds, self.bps = tiers
+
+    def adjustment(self, itinerary):
+        return -tier(itinerary.days_ahead, self.thresholds, self.bps)
+
+    def adjustments(self, batch):
+        bps = tier_column(batch.days_ahead, self.thresholds, self.bps)
+        return -bps if numpy is not None else [-bp for bp in bps]
+
+class PassengerTiers:
+    # Group discount on the seats from N passengers up
+    component = "seats"
+    uses_demand = False
+
+    def __init__(self, tiers):
+        self.thresholds, self.bps = tiers
+
+    def adjustment(self, itinerary):
+        return -tier(itinerary.passengers, self.thresholds, self.bps)
+
+    def adjustments(self, batch):
+        bps = tier_column(batch.passengers, self.thresholds, self.bps)
+        return -bps if numpy is not None else [-bp for bp in bps]
+
+class Itinerary:
+    __slots__ = ("seat_price", "price_per_night", "passengers", "nights", "days_ahead", "load")
+
+    def __init__(self, seat_price, price_per_night, passengers, nights, days_ahead=0, load=0):
+        self.seat_price, self.price_per_night = seat_price, price_per_night
+        self.passengers, self.nights = passengers, nights
+        self.days_ahead, self.load = days_ahead, load
+
+class Itineraries:
+    # The same fields as Itinerary, one column each (numpy arrays when numpy
+    # is installed, else lists)
+    def __init__(self, seat_price, price_per_night, passengers, nights, days_ahead=None, load=None):
+        size = len(seat_price)
+        columns = [seat_price, price_per_night, passengers, nights,
+                   [0] * size if days_ahead is None else days_ahead, [0] * size if load is None else load]
+        if numpy is not None:
+            columns = [numpy.asarray(column, dtype=numpy.int64) for column in columns]
+        else:
+            columns = [list(column) for column in columns]
+        (self.seat_price, self.price_per_night, self.passengers,
+         self.nights, self.days_ahead, self.load) = columns
+
+class PricingEngine:
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    @property
+    def uses_demand(self):
+        # Whether callers need to look up launch loads at all
+        return any(rule.uses_demand for rule in self.rules)
+
+    def price(self, itinerary):
+        seats = itinerary.seat_price * itinerary.passengers
+        stay = itinerary.price_per_night * itinerary.nights
+        for rule in self.rules:
+            bp = rule.adjustment(itinerary)
+            seats = seats * (BASIS_POINTS + bp) // BASIS_POINTS
+            if rule.component == "trip":
+                stay = stay * (BASIS_POINTS + bp) // BASIS_POINTS
+        return seats + stay
+
+    def price_batch(self, batch):
+        # Every rule runs once over whole columns instead of once per row;
+        # returns a list of ints in batch order
+        if numpy is not None:
+            seats = batch.seat_price * batch.passengers
+            stay = batch.price_per_night * batch.nights
+        else:
+            seats = [price * count for price, count in zip(batch.seat_price, batch.passengers)]
+            stay = [price * nights for price, nights in zip(batch.price_per_night, batch.nights)]
+        for rule in self.rules:
+            bps = rule.adjustments(batch)
+            seats = scale_column(seats, bps)
+            if rule.component == "trip":
+                stay = scale_column(stay, bps)
+        if numpy is not None:
+            return (seats + stay).tolist()
+        return [seat + nightly for seat, nightly in zip(seats, stay)]
+
+RULES = {
+    "demand_surge": lambda: DemandSurge(round(config.PRICING_SURGE_START * 100), round(config.PRICING_SURGE_MARKUP * 100)),
+    "early_booking": lambda: EarlyBooking(parse_tiers(config.PRICING_EARLY_BOOKING)),
+    "passenger_tiers": lambda: PassengerTiers(parse_tiers(config.PRICING_PASSENGER_TIERS)),
+}
+
+def build_engine(names):
+    # "demand_surge,early_booking" -> an engine applying those rules in order
+    return PricingEngine(RULES[name.strip()]() for name in names.split(",") if name.strip())
+
+# The engine used for bookings; replace it (e.g. in a benchmark) to try other rules
+engine = build_engine(config.PRICING_RULES)
+
+def days_ahead(booked_at, departure_date):
+    return max(0, (departure_date.date() - booked_at.date()).days)
+
+def trip_price(seat_price, price_per_night, passengers, departure_date, return_date, booked_at, load=0):
+    # `load` is the launch's reserved share of capacity in basis points before this booking
+    nights = (return_date - departure_date).days
+    return engine.price(Itinerary(
+        seat_price, price_per_night, passengers, nights, days_ahead(booked_at, departure_date), load,
+    ))
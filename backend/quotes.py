@@ -0,0 +1,123 @@
+# quotes.py
+import asyncio
+import heapq
+import time
+
+from sqlalchemy import select
+
+import config
+import models
+from cache import catalog_cache, catalog_change_listeners
+from pricing import quote_price
+
+class DestinationPrices:
+    # Price components for one destination, each list sorted cheapest first
+    def __init__(self, destination):
+        self.id = destination.id
+        self.name = destination.name
+        self.type = destination.type
+        self.seats = []   # (price, seat class id, name)
+        self.stays = []   # (price per night, accommodation id, name)
+
+# Seat and nightly prices for the whole catalog, kept in memory and rebuilt
+# after a catalog commit (or after CATALOG_CACHE_TTL_SECONDS, for writes that
+# bypass the ORM). Queries never touch the database while the index is fresh.
+# The catalog cache's list generation moves on every catalog write, including
+# those committed by other workers, so it is part of what the index was built under.
+class PriceIndex:
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._destinations = []
+        self._generation = 0
+        self._built_generation = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, destination_ids=None):
+        self._generation += 1
+
+    def generation(self):
+        return self._generation, catalog_cache.generation()
+
+    def fresh(self):
+        return self._built_generation == self.generation() and time.monotonic() - self._built_at <= self.ttl_seconds
+
+    async def destinations(self, db):
+        if not self.fresh():
+            async with self._lock:
+                if not self.fresh():
+                    # A write that lands mid-rebuild bumps the generation
+                    # again, so the next query rebuilds once more
+                    generation = self.generation()
+                    self._destinations = await self._build(db)
+                    self._built_generation = generation
+                    self._built_at = time.monotonic()
+        return self._destinations
+
+    async def _build(self, db):
+        by_id = {d.id: DestinationPrices(d) for d in (await db.execute(
+            select(models.Destination.id, models.Destination.name, models.Destination.type)
+        ))}
+        for row in await db.execute(
+            select(models.SeatClass.id, models.SeatClass.name, models.SeatClass.price, models.SeatClass.destination_id)
+        ):
+            if row.destination_id in by_id and row.price is not None:
+                by_id[row.destination_id].seats.append((row.price, row.id, row.name))
+        for row in await db.execute(
+            select(models.Accommodation.id, models.Accommodation.name, models.Accommodation.price_per_night,
+                   models.Accommodation.destination_id)
+        ):
+            if row.destination_id in by_id and row.price_per_night is not None:
+                by_id[row.destination_id].stays.append((row.price_per_night, row.id, row.name))
+
+        destinations = [d for d in by_id.values() if d.seats and d.stays]
+        for destination in destinations:
+            destination.seats.sort()
+            destination.stays.sort()
+        return destinations
+
+def cheapest_combinations(destinations, passengers, nights, max_price=None, limit=20):
+    # With both component lists sorted, the cheapest unseen combination of a
+    # destination is always a neighbour of one already taken, so a heap walks
+    # all destinations' combinations in price order and stops after `limit`
+    # (or at the budget) instead of pricing every combination
+    def price(destination, i, j):
+        return quote_price(destination.seats[i][0], destination.stays[j][0], passengers, nights)
+
+    heap = [(price(d, 0, 0), n, 0, 0) for n, d in enumerate(destinations)]
+    heapq.heapify(heap)
+    seen = {(n, 0, 0) for n in range(len(destinations))}
+    results = []
+    while heap and len(results) < limit:
+        total, n, i, j = heapq.heappop(heap)
+        if max_price is not None and total > max_price:
+            break
+        destination = destinations[n]
+        results.append((total, destination, destination.seats[i], destination.stays[j]))
+        for next_i, next_j in ((i + 1, j), (i, j + 1)):
+            if next_i < len(destination.seats) and next_j < len(destination.stays) and (n, next_i, next_j) not in seen:
+                seen.add((n, next_i, next_j))
+                heapq.heappush(heap, (price(destination, next_i, next_j), n, next_i, next_j))
+    return results
+
+price_index = PriceIndex(config.CATALOG_CACHE_TTL_SECONDS)
+catalog_change_listeners.append(price_index.invalidate)
+
+async def search_quotes(db, passengers, nights, max_price=None, type=None, limit=20):
+    destinations = await price_index.destinations(db)
+    if type is not None:
+        destinations = [d for d in destinations if d.type == type]
+    return [
+        {
+            "destination_id": destination.id,
+            "destination_name": destination.name,
+            "seat_class_id": seat[1],
+            "seat_class_name": seat[2],
+            "accommodation_id": stay[1],
+            "accommodation_name": stay[2],
+            "seat_price": seat[0],
+            "price_per_night": stay[0],
+            "total_price": total,
+        }
+        for total, destination, seat, stay in cheapest_combinations(destinations, passengers, nights, max_price, limit)
+    ]
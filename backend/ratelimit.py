@@ -0,0 +1,134 @@
+# ratelimit.py
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+
+import config
+
+# Never limited or shed, so monitoring keeps working under load
+EXEMPT_PATHS = ("/metrics",)
+
+def parse_budget(text):
+    rate, burst = text.split(":")
+    return float(rate), float(burst)
+
+def parse_rules(text):
+    # "GET /destinations=10:30,POST /bookings=2:5" -> [(method, prefix, rate, burst)],
+    # longest prefix first so /bookings/bulk wins over /bookings
+    rules = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        route, budget = item.split("=")
+        method, prefix = route.split()
+        rules.append((method.upper(), prefix, *parse_budget(budget)))
+    return sorted(rules, key=lambda rule: len(rule[1]), reverse=True)
+
+# In-memory token buckets, least recently used evicted past `max_keys`. Any
+# object with the same async take() can stand in, e.g. one backed by a store
+# shared between processes.
+class MemoryBucketStore:
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+
+    async def take(self, key, rate, burst, cost=1.0):
+        # Returns 0 if the request may proceed, else seconds until it could
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate if rate > 0 else math.inf
+
+# How late asyncio.sleep wakes up, sampled continuously: a loop busy with
+# blocking work or more callbacks than it can run falls behind. A spike
+# halves with every sample instead of vanishing at the next one, so a stall
+# keeps shedding until the loop has been caught up for a few intervals.
+class LoopLagMonitor:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.lag = 0.0
+        self._task = None
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - started - self.interval, self.lag / 2)
+
+def client_key(scope):
+    if config.RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+async def reject(send, status, detail, retry_after):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(min(retry_after, 3600)))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+# Charges the client's bucket for the matching route rule (429 when empty),
+# then sheds load (503 while too many requests are in flight or the loop
+# lags). Limiting first means a burst from one client is turned away as 429s
+# before it can fill the in-flight budget everyone shares. Both answer before
+# any routing or database work, with Retry-After.
+class RateLimitMiddleware:
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or MemoryBucketStore(config.RATE_LIMIT_MAX_CLIENTS)
+        self.rules = parse_rules(config.RATE_LIMIT_RULES)
+        self.default = parse_budget(config.RATE_LIMIT_DEFAULT)
+        self.lag_monitor = LoopLagMonitor()
+        self.in_flight = 0
+
+    def budget(self, method, path):
+        for rule_method, prefix, rate, burst in self.rules:
+            if method == rule_method and (path == prefix or path.startswith(prefix.rstrip("/") + "/")):
+                return f"{rule_method} {prefix}", rate, burst
+        return "default", *self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+
+        if config.RATE_LIMIT_ENABLED:
+            rule, rate, burst = self.budget(scope["method"], scope["path"])
+            retry_after = await self.store.take((client_key(scope), rule), rate, burst)
+            if retry_after:
+                return await reject(send, 429, "Too many requests", retry_after)
+
+        if config.SHED_MAX_LOOP_LAG_MS > 0:
+            self.lag_monitor.ensure_started()
+            if self.lag_monitor.lag * 1000 > config.SHED_MAX_LOOP_LAG_MS:
+                return await reject(send, 503, "Server is overloaded", 1)
+        if config.SHED_MAX_IN_FLIGHT > 0 and self.in_flight >= config.SHED_MAX_IN_FLIGHT:
+            return await reject(send, 503, "Server is overloaded", 1)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
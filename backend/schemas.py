@@ -1,7 +1,9 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, computed_field, model_validator
+from typing import List, Literal, Optional
+from datetime import date, datetime
+
+from media_versions import THUMBNAIL_WIDTHS, thumbnail_url
 
 # Base schemas (shared attributes)
 class DestinationBase(BaseModel):
@@ -12,6 +14,7 @@ class DestinationBase(BaseModel):
     base_price: int
     image_url: str
     next_launch: str
+    distance_miles: int = 0
 
 class SeatClassBase(BaseModel):
     name: str
@@ -49,8 +52,33 @@ class SeatClassCreate(SeatClassBase):
 class AccommodationCreate(AccommodationBase):
     destination_id: int
 
+def check_trip_dates(departure_date, return_date):
+    # Shared by every booking write: POST /bookings and bulk ingest through
+    # BookingCreate, and PATCH (changes.py) on the merged dates
+    if return_date < departure_date:
+        raise ValueError("Return date is before the departure date")
+
 class BookingCreate(BookingBase):
     user_id: int
+    passengers: int = Field(ge=1)
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        check_trip_dates(self.departure_date, self.return_date)
+        return self
+
+# Changes name the booking version they were made against (see changes.py);
+# fields left out of a PATCH keep their current value
+class BookingUpdate(BaseModel):
+    version: int
+    seat_class_id: Optional[int] = None
+    accommodation_id: Optional[int] = None
+    departure_date: Optional[datetime] = None
+    return_date: Optional[datetime] = None
+    passengers: Optional[int] = Field(None, ge=1)
+
+class BookingCancel(BaseModel):
+    version: int
 
 class UserCreate(UserBase):
     password: str
@@ -61,6 +89,12 @@ class UserCreate(UserBase):
 class Destination(DestinationBase):
     id: int
     created_at: datetime
+
+    # A MEDIA_LIST_WIDTH variant of image_url for lists and grids
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return thumbnail_url(self.image_url)
     
     class Config:
         from_attributes = True  # Changed from orm_mode = True
@@ -81,12 +115,18 @@ class Accommodation(AccommodationBase):
     class Config:
         from_attributes = True  # Changed from orm_mode = True
 
+# A destination with everything the booking page shows, in one response
+class DestinationBundle(Destination):
+    seat_classes: List[SeatClass]
+    accommodations: List[Accommodation]
+
 class Booking(BookingBase):
     id: int
     user_id: int
     total_price: int
     status: str
     booking_date: datetime
+    version: int
     
     class Config:
         from_attributes = True  # Changed from orm_mode = True
@@ -104,6 +144,33 @@ class User(UserBase):
     class Config:
         from_attributes = True  # Changed from orm_mode = True
 
+class LeaderboardEntry(BaseModel):
+    id: int
+    username: str
+    full_name: str
+    avatar_url: Optional[str]
+    traveler_level: int
+    total_miles: int
+    completed_trips: int
+    destinations: int
+
+    # The smallest variant of avatar_url
+    @computed_field
+    @property
+    def avatar_thumbnail_url(self) -> Optional[str]:
+        return thumbnail_url(self.avatar_url, THUMBNAIL_WIDTHS[0]) if THUMBNAIL_WIDTHS else None
+
+    class Config:
+        from_attributes = True
+
+class SearchResult(BaseModel):
+    kind: Literal["destination", "accommodation"]
+    id: int
+    destination_id: int
+    name: str
+    snippet: str  # Matching part of the description, matches in [brackets]
+    score: float  # Higher is more relevant
+
 # Extended schemas for more detailed responses
 class BookingWithDetails(BaseModel):
     id: int
@@ -117,6 +184,48 @@ class BookingWithDetails(BaseModel):
     total_price: int
     status: str
     booking_date: datetime
+    version: int
     
     class Config:
-        from_attributes = True  # Changed from orm_mode = True
\ No newline at end of file
+        from_attributes = True  # Changed from orm_mode = True
+
+# Bulk booking ingestion
+class BulkBookingError(BaseModel):
+    index: int  # Position of the row in the submitted batch
+    detail: str
+
+class BulkBookingResult(BaseModel):
+    created: int
+    booking_ids: List[int]
+    errors: List[BulkBookingError]
+
+# A scrubbed launch: every open booking on it cancelled at once
+class LaunchCancellation(BaseModel):
+    destination_id: int
+    launch_date: date
+    cancelled: int
+    seats_released: int
+
+class Launch(BaseModel):
+    id: int
+    destination_id: int
+    departs_at: datetime
+    arrives_at: datetime
+    duration_hours: int
+    capacity: int
+    status: str
+
+    class Config:
+        from_attributes = True
+
+# Trip quotes: one priced (destination, seat class, accommodation) combination
+class Quote(BaseModel):
+    destination_id: int
+    destination_name: str
+    seat_class_id: int
+    seat_class_name: str
+    accommodation_id: int
+    accommodation_name: str
+    seat_price: int
+    price_per_night: int
+    total_price: int
@@ -0,0 +1,158 @@
+# search.py
+import re
+
+from sqlalchemy import text
+
+# Full-text search over destinations (name, description, type) and
+# accommodations (name, description, features), ranked with names weighted
+# highest and every query word matched as a prefix ("mar hab" finds "Mars
+# Base Alpha ... habitat").
+#
+# SQLite keeps an FTS5 table, search_index, in step with the catalog through
+# triggers, so every write (ORM or not) updates the index in the same
+# transaction. Row ids encode the source row: destination id * 2, or
+# accommodation id * 2 + 1, so a trigger finds its entry by rowid instead of
+# scanning. PostgreSQL searches the tables directly through GIN expression
+# indexes. Both are created by migration 6.
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+KINDS = {"destination": 0, "accommodation": 1}
+
+SQLITE_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        name, description, tags, destination_id UNINDEXED,
+        prefix='2 3 4', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS destinations_search_insert AFTER INSERT ON destinations BEGIN
+        INSERT INTO search_index (rowid, name, description, tags, destination_id)
+        VALUES (new.id * 2, new.name, new.description, new.type, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS destinations_search_update AFTER UPDATE OF name, description, type ON destinations BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index (rowid, name, description, tags, destination_id)
+        VALUES (new.id * 2, new.name, new.description, new.type, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS destinations_search_delete AFTER DELETE ON destinations BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accommodations_search_insert AFTER INSERT ON accommodations BEGIN
+        INSERT INTO search_index (rowid, name, description, tags, destination_id)
+        VALUES (new.id * 2 + 1, new.name, new.description, new._features, new.destination_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accommodations_search_update
+    AFTER UPDATE OF name, description, _features, destination_id ON accommodations BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index (rowid, name, description, tags, destination_id)
+        VALUES (new.id * 2 + 1, new.name, new.description, new._features, new.destination_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS accommodations_search_delete AFTER DELETE ON accommodations BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+SQLITE_BACKFILL = [
+    """
+    INSERT INTO search_index (rowid, name, description, tags, destination_id)
+    SELECT id * 2, name, description, type, id FROM destinations
+    """,
+    """
+    INSERT INTO search_index (rowid, name, description, tags, destination_id)
+    SELECT id * 2 + 1, name, description, _features, destination_id FROM accommodations
+    """,
+]
+
+# The features column is JSON text on SQLite and JSON on PostgreSQL
+POSTGRESQL_DOCUMENTS = {
+    "destination": "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(type, ''))",
+    "accommodation": "to_tsvector('english', coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(_features::text, ''))",
+}
+
+POSTGRESQL_SCHEMA = [
+    f"CREATE INDEX IF NOT EXISTS ix_destinations_search ON destinations USING gin ({POSTGRESQL_DOCUMENTS['destination']})",
+    f"CREATE INDEX IF NOT EXISTS ix_accommodations_search ON accommodations USING gin ({POSTGRESQL_DOCUMENTS['accommodation']})",
+]
+
+def create_search_index(conn):
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")).first()
+        for statement in SQLITE_SCHEMA:
+            conn.execute(text(statement))
+        if not exists:
+            for statement in SQLITE_BACKFILL:
+                conn.execute(text(statement))
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRESQL_SCHEMA:
+            conn.execute(text(statement))
+
+def query_words(q):
+    return WORD.findall(q.lower())
+
+async def search_sqlite(db, words, kind, limit):
+    # Each word is quoted (so FTS5 syntax in user input is inert) and matched
+    # as a prefix; bm25 weights name 10, description 1, type/features 3
+    match = " ".join(f'"{word}"*' for word in words)
+    kind_filter = "" if kind is None else "AND search_index.rowid % 2 = :kind"
+    rows = await db.execute(text(f"""
+        SELECT search_index.rowid AS rowid, destination_id, name,
+               snippet(search_index, 1, '[', ']', '...', 12) AS snippet,
+               bm25(search_index, 10.0, 1.0, 3.0) AS rank
+        FROM search_index
+        WHERE search_index MATCH :match {kind_filter}
+        ORDER BY rank
+        LIMIT :limit
+    """), {"match": match, "kind": KINDS.get(kind), "limit": limit})
+    return [
+        {
+            "kind": "accommodation" if row.rowid % 2 else "destination",
+            "id": row.rowid // 2,
+            "destination_id": row.destination_id,
+            "name": row.name,
+            "snippet": row.snippet,
+            "score": -row.rank,  # bm25 is lower-is-better
+        }
+        for row in rows
+    ]
+
+async def search_postgresql(db, words, kind, limit):
+    query = "to_tsquery('english', :query)"
+    selects = []
+    for name, table, destination_id in [("destination", "destinations", "id"), ("accommodation", "accommodations", "destination_id")]:
+        if kind in (None, name):
+            document = POSTGRESQL_DOCUMENTS[name]
+            selects.append(f"""
+                SELECT '{name}' AS kind, id, {destination_id} AS destination_id, name,
+                       ts_headline('english', coalesce(description, ''), {query}, 'StartSel=[, StopSel=]') AS snippet,
+                       ts_rank({document}, {query}) AS score
+                FROM {table} WHERE {document} @@ {query}
+            """)
+    rows = await db.execute(
+        text(" UNION ALL ".join(selects) + " ORDER BY score DESC LIMIT :limit"),
+        {"query": " & ".join(f"{word}:*" for word in words), "limit": limit},
+    )
+    return [dict(row._mapping) for row in rows]
+
+SEARCH_BY_DIALECT = {
+    "sqlite": search_sqlite,
+    "postgresql": search_postgresql,
+}
+
+async def search_catalog(db, q, kind=None, limit=20):
+    words = query_words(q)
+    if not words:
+        return []
+    return await SEARCH_BY_DIALECT[db.bind.dialect.name](db, words, kind, limit)
@@ -0,0 +1,259 @@
+# seed.py
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+import config
+import models
+from launches import parse_launch_date, parse_travel_time
+from pricing import nightly_rate, seat_class_price
+from stats import reconcile
+
+# One-way distances of the demo catalog; migration 4 also fills them in for
+# databases created before destinations had a distance
+DESTINATION_DISTANCES = {
+    "Lunar Gateway Station": 238900,
+    "Mars Base Alpha": 140000000,
+    "Europa Orbit Research Station": 390000000,
+    "Orbital Hotel Artemis": 250,
+    "Venus Cloud Observatory": 25000000,
+}
+
+# Generate some dummy data for testing. Everything is added in one session and
+# committed once; relationships (not ids) link the rows, so the unit of work
+# sends one batched INSERT per table.
+def seed_dummy_data(db: Session):
+    # Check if data exists
+    if db.query(models.Destination.id).first() is None:
+        # Create destinations
+        destinations = [
+            models.Destination(
+                name="Lunar Gateway Station",
+                description="Experience the moon's orbit in this state-of-the-art space station with breathtaking views of Earth and lunar landscapes.",
+                type="Space Station",
+                travel_time="3 days",
+                base_price=1200000,
+                image_url="/images/lunar-gateway.jpg",
+                next_launch="March 15, 2025",
+                distance_miles=DESTINATION_DISTANCES["Lunar Gateway Station"],
+            ),
+            models.Destination(
+                name="Mars Base Alpha",
+                description="Be among the first civilians to visit the red planet. Tour the first human settlement on Mars and experience 0.38g gravity.",
+                type="Planetary Base",
+                travel_time="8 months",
+                base_price=4500000,
+                image_url="/images/mars-base.jpg",
+                next_launch="July 22, 2025",
+                distance_miles=DESTINATION_DISTANCES["Mars Base Alpha"],
+            ),
+            models.Destination(
+                name="Europa Orbit Research Station",
+                description="Journey to Jupiter's moon and participate in research on extraterrestrial life in Europa's subsurface ocean.",
+                type="Research Station",
+                travel_time="2.5 years",
+                base_price=12000000,
+                image_url="/images/europa-station.jpg",
+                next_launch="December 10, 2025",
+                distance_miles=DESTINATION_DISTANCES["Europa Orbit Research Station"],
+            ),
+            models.Destination(
+                name="Orbital Hotel Artemis",
+                description="Luxury accommodations in Earth's orbit. Experience zero gravity living with five-star amenities.",
+                type="Space Hotel",
+                travel_time="1 day",
+                base_price=850000,
+                image_url="/images/orbital-hotel.jpg",
+                next_launch="April 5, 2025",
+                distance_miles=DESTINATION_DISTANCES["Orbital Hotel Artemis"],
+            ),
+            models.Destination(
+                name="Venus Cloud Observatory",
+                description="Float above Venus's atmosphere and study the greenhouse effect from our specialized research platform.",
+                type="Atmospheric Observatory",
+                travel_time="5 months",
+                base_price=3200000,
+                image_url="/images/venus-observatory.jpg",
+                next_launch="September 18, 2025",
+                distance_miles=DESTINATION_DISTANCES["Venus Cloud Observatory"],
+            ),
+        ]
+        db.add_all(destinations)
+
+        # Launch schedule: the advertised next launch, then one every four
+        # weeks for the coming year
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        db.add_all([
+            models.Launch(
+                destination=dest,
+                departs_at=departs_at,
+                duration_hours=parse_travel_time(dest.travel_time),
+                capacity=config.SEATS_PER_LAUNCH,
+            )
+            for dest in destinations
+            for departs_at in [parse_launch_date(dest.next_launch)] + [today + timedelta(weeks=4 * n) for n in range(1, 14)]
+        ])
+        
+        # Create seat classes for each destination
+        seat_classes = []
+        for dest in destinations:
+            seat_classes.extend([
+                models.SeatClass(
+                    name="Economy",
+                    description="Standard accommodations with essential life support and minimal personal space.",
+                    price=seat_class_price(dest.base_price, "Economy"),
+                    features=["Basic life support", "Shared quarters", "Standard meals", "Limited storage"],
+                    destination=dest
+                ),
+                models.SeatClass(
+                    name="Luxury Cabin",
+                    description="Premium accommodations with enhanced comfort and private quarters.",
+                    price=seat_class_price(dest.base_price, "Luxury Cabin"),
+                    features=["Enhanced life support", "Private cabin", "Gourmet meals", "Increased storage", "Entertainment system"],
+                    destination=dest
+                ),
+                models.SeatClass(
+                    name="VIP Zero-G Suite",
+                    description="The ultimate space travel experience with dedicated staff and exclusive access to all facilities.",
+                    price=seat_class_price(dest.base_price, "VIP Zero-G Suite"),
+                    features=["Premium life support", "Luxury suite", "Personal chef", "Exclusive excursions", "Full medical support", "Priority scheduling"],
+                    destination=dest
+                ),
+            ])
+        db.add_all(seat_classes)
+        
+        # Create accommodations for each destination
+        accommodations = []
+        for dest in destinations:
+            accommodations.extend([
+                models.Accommodation(
+                    name=f"Standard Pod at {dest.name}",
+                    description="Basic accommodation with essential amenities and shared facilities.",
+                    price_per_night=nightly_rate(dest.base_price, "Standard Pod"),
+                    features=["Shared bathroom", "Basic amenities", "Daily cleaning", "Communal dining"],
+                    rating=3.5,
+                    destination=dest
+                ),
+                models.Accommodation(
+                    name=f"Comfort Suite at {dest.name}",
+                    description="Mid-tier accommodations with private facilities and enhanced comfort.",
+                    price_per_night=nightly_rate(dest.base_price, "Comfort Suite"),
+                    features=["Private bathroom", "Enhanced amenities", "Room service", "Entertainment system", "Small viewport"],
+                    rating=4.2,
+                    destination=dest
+                ),
+                models.Accommodation(
+                    name=f"Luxury Habitat at {dest.name}",
+                    description="Premium living space with all amenities and spectacular views.",
+                    price_per_night=nightly_rate(dest.base_price, "Luxury Habitat"),
+                    features=["Luxury bathroom", "Premium amenities", "24/7 butler service", "Gourmet dining", "Large viewport", "Private excursions"],
+                    rating=4.8,
+                    destination=dest
+                ),
+            ])
+        db.add_all(accommodations)
+        
+        # Create a few users
+        users = [
+            models.User(
+                username="astro_explorer",
+                email="alex@example.com",
+                hashed_password="dummy_hash_1",
+                full_name="Alex Astronaut",
+                bio="Space enthusiast and adventure seeker",
+                avatar_url="/avatars/user1.jpg"
+            ),
+            models.User(
+                username="cosmic_voyager",
+                email="sam@example.com",
+                hashed_password="dummy_hash_2",
+                full_name="Sam Spacefarer",
+                bio="Professional astronomer turned space tourist",
+                avatar_url="/avatars/user2.jpg"
+            ),
+        ]
+        db.add_all(users)
+        
+        # Create some bookings
+        bookings = [
+            models.Booking(
+                user=users[0],
+                destination=destinations[0],
+                seat_class=seat_classes[1],
+                accommodation=accommodations[1],
+                departure_date=datetime.now() + timedelta(days=45),
+                return_date=datetime.now() + timedelta(days=60),
+                passengers=2,
+                total_price=2500000,
+                status="Confirmed",
+                booking_date=datetime.now() - timedelta(days=10)
+            ),
+            models.Booking(
+                user=users[0],
+                destination=destinations[3],
+                seat_class=seat_classes[9],
+                accommodation=accommodations[10],
+                departure_date=datetime.now() + timedelta(days=120),
+                return_date=datetime.now() + timedelta(days=127),
+                passengers=1,
+                total_price=3200000,
+                status="Pending",
+                booking_date=datetime.now() - timedelta(days=3)
+            ),
+            models.Booking(
+                user=users[1],
+                destination=destinations[1],
+                seat_class=seat_classes[4],
+                accommodation=accommodations[4],
+                departure_date=datetime.now() + timedelta(days=90),
+                return_date=datetime.now() + timedelta(days=330),
+                passengers=2,
+                total_price=9500000,
+                status="Confirmed",
+                booking_date=datetime.now() - timedelta(days=20)
+            ),
+            # Past trips, so the travel stats have some history
+            models.Booking(
+                user=users[0],
+                destination=destinations[3],
+                seat_class=seat_classes[9],
+                accommodation=accommodations[9],
+                departure_date=datetime.now() - timedelta(days=400),
+                return_date=datetime.now() - timedelta(days=393),
+                passengers=1,
+                total_price=1900000,
+                status="Completed",
+                booking_date=datetime.now() - timedelta(days=480)
+            ),
+            models.Booking(
+                user=users[1],
+                destination=destinations[0],
+                seat_class=seat_classes[0],
+                accommodation=accommodations[0],
+                departure_date=datetime.now() - timedelta(days=300),
+                return_date=datetime.now() - timedelta(days=290),
+                passengers=1,
+                total_price=1500000,
+                status="Completed",
+                booking_date=datetime.now() - timedelta(days=350)
+            ),
+            models.Booking(
+                user=users[1],
+                destination=destinations[4],
+                seat_class=seat_classes[12],
+                accommodation=accommodations[12],
+                departure_date=datetime.now() - timedelta(days=700),
+                return_date=datetime.now() - timedelta(days=380),
+                passengers=2,
+                total_price=7400000,
+                status="Completed",
+                booking_date=datetime.now() - timedelta(days=760)
+            ),
+        ]
+        db.add_all(bookings)
+        # Users' travel stats are derived from the bookings above, counting
+        # only the Completed ones; the traveler levels these users once had
+        # written in by hand (3 and 4) are replaced by the derived ones
+        db.flush()
+        reconcile(db)
+        db.commit()
@@ -0,0 +1,116 @@
+# stats.py
+from collections import Counter, defaultdict
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+import models
+from inventory import INSERT_BY_DIALECT
+
+# Bookings in these statuses count toward a traveler's stats: only trips
+# actually flown, so a confirmed booking months away adds nothing yet
+COUNTED_STATUSES = ("Completed",)
+
+def counts(status):
+    return status in COUNTED_STATUSES
+
+def status_delta(old_status, new_status):
+    # +1 when a booking starts counting, -1 when it stops, else 0
+    return int(counts(new_status)) - int(counts(old_status))
+
+def traveler_level(completed_trips):
+    # Works on ints and SQL expressions alike
+    return completed_trips + 1
+
+# users.total_miles, completed_trips, destinations and traveler_level are
+# maintained incrementally: every write that makes bookings start or stop
+# counting calls record_trips in the same transaction. user_destination_trips
+# holds the per-destination trip count that makes "distinct destinations"
+# incremental too. reconcile() recomputes everything from bookings.
+
+async def record_trips(db, changes):
+    # `changes` is an iterable of (user_id, destination_id, delta). Costs three
+    # statements however many bookings changed: a distance lookup, one upsert
+    # of the per-destination counts and one executemany UPDATE of users.
+    pairs = Counter()
+    for user_id, destination_id, delta in changes:
+        if delta:
+            pairs[user_id, destination_id] += delta
+    pairs = {pair: delta for pair, delta in pairs.items() if delta}
+    if not pairs:
+        return
+
+    distances = dict((await db.execute(
+        select(models.Destination.id, models.Destination.distance_miles)
+        .where(models.Destination.id.in_({destination_id for _, destination_id in pairs}))
+    )).all())
+
+    # The upsert returns each pair's new count, so the distinct-destination
+    # change is known without reading the old one first
+    upsert = INSERT_BY_DIALECT[db.bind.dialect.name](models.UserDestinationTrips).values([
+        {"user_id": user_id, "destination_id": destination_id, "trips": delta}
+        for (user_id, destination_id), delta in pairs.items()
+    ])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["user_id", "destination_id"],
+        set_={"trips": models.UserDestinationTrips.trips + upsert.excluded.trips},
+    ).returning(models.UserDestinationTrips.user_id, models.UserDestinationTrips.destination_id,
+                models.UserDestinationTrips.trips)
+
+    users = models.User.__table__
+    totals = defaultdict(lambda: {"trips": 0, "miles": 0, "destinations": 0})
+    for user_id, destination_id, trips in await db.execute(upsert):
+        delta = pairs[user_id, destination_id]
+        user = totals[user_id]
+        user["trips"] += delta
+        user["miles"] += delta * round_trip_miles(distances.get(destination_id))
+        user["destinations"] += int(trips > 0) - int(trips - delta > 0)
+
+    await db.execute(
+        # Core table, so a list of parameters is a plain executemany rather
+        # than the ORM's bulk-update-by-primary-key
+        update(users)
+        .where(users.c.id == bindparam("user_id"))
+        .values(
+            completed_trips=users.c.completed_trips + bindparam("trips"),
+            total_miles=users.c.total_miles + bindparam("miles"),
+            destinations=users.c.destinations + bindparam("destinations"),
+            traveler_level=traveler_level(users.c.completed_trips + bindparam("trips")),
+        ),
+        [{"user_id": user_id, **user} for user_id, user in totals.items()],
+    )
+
+def round_trip_miles(distance_miles):
+    return 2 * (distance_miles or 0)
+
+def reconcile(db, keep_untracked=False):
+    # Set-based rebuild from bookings, for drift left by writes that bypassed
+    # record_trips. Runs on a sync Session or Connection (manage.py
+    # reconcile-stats, migrations); every user is updated in one statement
+    # whose correlated subqueries read user_destination_trips by primary key.
+    # With keep_untracked, users without a counted booking keep their stats.
+    trips = models.UserDestinationTrips
+    db.execute(delete(trips))
+    db.execute(insert(trips).from_select(
+        ["user_id", "destination_id", "trips"],
+        select(models.Booking.user_id, models.Booking.destination_id, func.count())
+        .where(models.Booking.status.in_(COUNTED_STATUSES), models.Booking.user_id.is_not(None))
+        .group_by(models.Booking.user_id, models.Booking.destination_id),
+    ))
+
+    trip_count = select(func.coalesce(func.sum(trips.trips), 0)).where(trips.user_id == models.User.id).scalar_subquery()
+    miles = (
+        select(func.coalesce(func.sum(trips.trips * 2 * models.Destination.distance_miles), 0))
+        .join(models.Destination, models.Destination.id == trips.destination_id)
+        .where(trips.user_id == models.User.id)
+        .scalar_subquery()
+    )
+    destination_count = select(func.count()).where(trips.user_id == models.User.id).scalar_subquery()
+    query = update(models.User)
+    if keep_untracked:
+        query = query.where(select(trips.user_id).where(trips.user_id == models.User.id).exists())
+    return db.execute(query.values(
+        completed_trips=trip_count,
+        total_miles=miles,
+        destinations=destination_count,
+        traveler_level=traveler_level(trip_count),
+    )).rowcount
@@ -0,0 +1,91 @@
+# conftest.py
+# Tests run against a throwaway SQLite database, migrated and seeded once per
+# session. config reads the environment at import, so it is set here before
+# any app module is imported.
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'test.db')}"
+os.environ["MEDIA_CACHE_DIR"] = os.path.join(workdir, "media")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["SHED_MAX_IN_FLIGHT"] = "0"
+os.environ["SHED_MAX_LOOP_LAG_MS"] = "0"
+# Jobs run only when a test drives them
+os.environ["JOB_WORKERS"] = "0"
+sys.path.insert(0, BACKEND)
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+import media_versions
+import models
+from database import SessionLocal, async_engine
+from main import app
+from manage import setup_database
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    setup_database()
+    # As the app's lifespan does, which in-process requests skip
+    media_versions.refresh()
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+def api():
+    # Calls the app in process: api("POST", "/bookings", json=...). Each call
+    # gets its own event loop, so the async pool is disposed after it.
+    def call(method, url, **kwargs):
+        async def send():
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                    return await client.request(method, url, **kwargs)
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(send())
+
+    return call
+
+@pytest.fixture
+def new_user(db):
+    # A user with no bookings; returns the id
+    def create():
+        name = uuid.uuid4().hex[:12]
+        user = models.User(username=name, email=f"{name}@example.com", hashed_password="x", full_name="Test User")
+        db.add(user)
+        db.commit()
+        return user.id
+
+    return create
+
+@pytest.fixture
+def booking_for(db):
+    # A POST /bookings body on an upcoming scheduled launch of a seeded destination
+    def body(user_id, passengers=1, destination_id=4, **overrides):
+        launch = db.scalars(
+            select(models.Launch)
+            .where(models.Launch.destination_id == destination_id, models.Launch.status == "Scheduled",
+                   models.Launch.departs_at > datetime.now())
+            .order_by(models.Launch.departs_at)
+        ).first()
+        seat_class = db.scalars(select(models.SeatClass).where(models.SeatClass.destination_id == destination_id)).first()
+        stay = db.scalars(select(models.Accommodation).where(models.Accommodation.destination_id == destination_id)).first()
+        return {
+            "user_id": user_id, "destination_id": destination_id, "seat_class_id": seat_class.id,
+            "accommodation_id": stay.id, "departure_date": launch.departs_at.isoformat(),
+            "return_date": (launch.arrives_at + timedelta(days=3)).isoformat(), "passengers": passengers,
+            **overrides,
+        }
+
+    return body
@@ -0,0 +1,28 @@
+# test_bookings.py
+from datetime import datetime
+
+def reversed_dates(body):
+    departure = datetime.fromisoformat(body["departure_date"])
+    return dict(body, return_date=departure.replace(year=departure.year - 1).isoformat())
+
+def test_booking_cannot_return_before_it_departs(api, new_user, booking_for):
+    response = api("POST", "/bookings", json=reversed_dates(booking_for(new_user())))
+    assert response.status_code == 422
+    assert "Return date is before the departure date" in response.text
+
+def test_bulk_rejects_rows_returning_before_they_depart(api, new_user, booking_for):
+    user_id = new_user()
+    response = api("POST", "/bookings/bulk", json=[booking_for(user_id), reversed_dates(booking_for(user_id))])
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["created"] == 1
+    assert [error["index"] for error in result["errors"]] == [1]
+    assert "Return date is before the departure date" in result["errors"][0]["detail"]
+
+def test_change_cannot_return_before_it_departs(api, new_user, booking_for):
+    created = api("POST", "/bookings", json=booking_for(new_user())).json()
+    response = api("PATCH", f"/bookings/{created['id']}", json={
+        "version": created["version"], "return_date": reversed_dates(created)["return_date"],
+    })
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Return date is before the departure date"
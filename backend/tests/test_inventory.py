@@ -0,0 +1,89 @@
+# test_inventory.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+import config
+import models
+
+def booked_like(booking, user_id, passengers):
+    return {
+        "user_id": user_id, "destination_id": booking.destination_id, "seat_class_id": booking.seat_class_id,
+        "accommodation_id": booking.accommodation_id, "departure_date": booking.departure_date.isoformat(),
+        "return_date": booking.return_date.isoformat(), "passengers": passengers,
+    }
+
+def test_seeded_bookings_hold_their_seats(api, db, new_user):
+    # Seed booking 1 holds 2 seats on its class and day before any inventory
+    # row exists for them, so the first booking there can't take all 100
+    seeded = db.get(models.Booking, 1)
+    assert seeded.status == "Confirmed"
+    assert db.scalars(select(models.SeatInventory).where(models.SeatInventory.seat_class_id == seeded.seat_class_id)).first() is None
+    capacity = 100
+    user_id = new_user()
+
+    response = api("POST", "/bookings", json=booked_like(seeded, user_id, capacity))
+    assert response.status_code == 409, response.text
+    response = api("POST", "/bookings", json=booked_like(seeded, user_id, capacity - seeded.passengers))
+    assert response.status_code == 200, response.text
+    inventory = db.scalars(select(models.SeatInventory).where(models.SeatInventory.seat_class_id == seeded.seat_class_id)).one()
+    assert (inventory.capacity, inventory.reserved) == (capacity, capacity)
+
+def test_moving_a_booking_counts_it_once(api, db, new_user, booking_for):
+    user_id = new_user()
+    created = api("POST", "/bookings", json=booking_for(user_id, passengers=3)).json()
+    moved = db.scalars(
+        select(models.Launch)
+        .where(models.Launch.destination_id == 4, models.Launch.status == "Scheduled",
+               models.Launch.departs_at > created["departure_date"])
+        .order_by(models.Launch.departs_at)
+    ).first()
+    response = api("PATCH", f"/bookings/{created['id']}", json={
+        "departure_date": moved.departs_at.isoformat(),
+        "return_date": (moved.arrives_at + timedelta(days=3)).isoformat(), "version": created["version"],
+    })
+    assert response.status_code == 200, response.text
+    inventory = db.scalars(
+        select(models.SeatInventory)
+        .where(models.SeatInventory.seat_class_id == created["seat_class_id"],
+               models.SeatInventory.launch_date == moved.departs_at.date())
+    ).one()
+    open_seats = sum(db.scalars(
+        select(models.Booking.passengers)
+        .where(models.Booking.seat_class_id == created["seat_class_id"], models.Booking.status.in_(("Confirmed", "Pending")))
+        .where(models.Booking.departure_date >= moved.departs_at.replace(hour=0, minute=0, second=0, microsecond=0))
+        .where(models.Booking.departure_date < moved.departs_at.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
+    ))
+    assert inventory.reserved == open_seats == 3
+
+def test_launch_held_past_capacity_is_sold_out(api, db, new_user, monkeypatch):
+    # A day with no scheduled launch, so SEATS_PER_LAUNCH is the capacity, and
+    # a legacy booking already holding more seats than that
+    monkeypatch.setattr(config, "SEATS_PER_LAUNCH", 5)
+    seat_class = db.scalars(select(models.SeatClass).where(models.SeatClass.destination_id == 5)).first()
+    stay = db.scalars(select(models.Accommodation).where(models.Accommodation.destination_id == 5)).first()
+    departure = datetime(2031, 3, 3, 9)
+    assert db.scalars(select(models.Launch).where(
+        models.Launch.destination_id == 5, models.Launch.departs_at >= departure.replace(hour=0),
+        models.Launch.departs_at < departure.replace(hour=0) + timedelta(days=1),
+    )).first() is None
+    user_id = new_user()
+    legacy = models.Booking(
+        user_id=user_id, destination_id=5, seat_class_id=seat_class.id, accommodation_id=stay.id,
+        departure_date=departure, return_date=departure + timedelta(days=400), passengers=6,
+        total_price=1000, status="Confirmed", booking_date=datetime.now(),
+    )
+    db.add(legacy)
+    db.commit()
+
+    response = api("POST", "/bookings", json=booked_like(legacy, user_id, 1))
+    assert response.status_code == 409, response.text
+    response = api("POST", "/bookings/bulk", json=[booked_like(legacy, user_id, 1)])
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 0
+    # The legacy booking itself can still shrink
+    response = api("PATCH", f"/bookings/{legacy.id}", json={"version": legacy.version, "passengers": 4})
+    assert response.status_code == 200, response.text
+    inventory = db.scalars(select(models.SeatInventory).where(models.SeatInventory.seat_class_id == seat_class.id,
+                                                              models.SeatInventory.launch_date == departure.date())).one()
+    assert (inventory.capacity, inventory.reserved) == (6, 4)
@@ -0,0 +1,152 @@
+# test_jobs.py
+# Booking follow-ups run by draining the queue in the test, against local
+# stand-ins for the mail and payment services
+import asyncio
+import re
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import make_url
+
+import config
+import followups
+import jobs
+import models
+from database import AsyncSessionLocal, async_engine
+
+class StandInMailer:
+    def __init__(self):
+        self.sent = Counter()  # booking id -> emails
+
+    async def send(self, to, subject, body):
+        self.sent[int(re.match(r"Booking (\d+):", body).group(1))] += 1
+
+class StandInPaymentGateway:
+    def __init__(self, fail_first=(), always_fail=()):
+        self.attempts = Counter()  # reference -> capture attempts
+        self.captured = Counter()  # reference -> successful captures
+        self.fail_first, self.always_fail = set(fail_first), set(always_fail)
+
+    async def capture(self, reference, amount):
+        self.attempts[reference] += 1
+        if reference in self.always_fail or (reference in self.fail_first and self.attempts[reference] == 1):
+            raise ConnectionError(f"payment service unavailable for {reference}")
+        self.captured[reference] += 1
+
+    async def refund(self, reference, amount):
+        pass
+
+@pytest.fixture
+def services(db, monkeypatch):
+    # An empty queue and fresh stand-ins; returns (mailer, gateway)
+    db.execute(delete(models.Job))
+    db.commit()
+    mailer, gateway = StandInMailer(), StandInPaymentGateway()
+    monkeypatch.setattr(followups, "mailer", mailer)
+    monkeypatch.setattr(followups, "payment_gateway", gateway)
+    return mailer, gateway
+
+def drain():
+    # Runs jobs until none is due; returns how many ran
+    async def run():
+        try:
+            ran = 0
+            while await jobs.run_next():
+                ran += 1
+            return ran
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+def book(api, user_id, booking_for, count):
+    ids = []
+    for _ in range(count):
+        response = api("POST", "/bookings", json=booking_for(user_id))
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+def capture_job(db, booking_id):
+    return db.scalars(
+        select(models.Job).where(models.Job.kind == "booking.capture_payment")
+        .where(models.Job.payload["booking_id"].as_integer() == booking_id)
+    ).one()
+
+def test_one_email_and_one_capture_per_booking(api, db, new_user, booking_for, services):
+    mailer, gateway = services
+    ids = book(api, new_user(), booking_for, 3)
+    assert drain() == 2 * len(ids)
+
+    assert mailer.sent == Counter({booking_id: 1 for booking_id in ids})
+    assert gateway.captured == Counter({f"booking-{booking_id}": 1 for booking_id in ids})
+    assert drain() == 0
+
+def test_failed_capture_is_retried_after_a_backoff(api, db, new_user, booking_for, services):
+    _, gateway = services
+    booking_id, = book(api, new_user(), booking_for, 1)
+    gateway.fail_first.add(f"booking-{booking_id}")
+    started = datetime.now()
+    drain()
+
+    job = capture_job(db, booking_id)
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert "ConnectionError" in job.last_error
+    # Half to all of the first backoff step, so it isn't due yet
+    assert config.JOB_BACKOFF_SECONDS / 2 <= (job.run_after - started).total_seconds()
+    assert (job.run_after - datetime.now()).total_seconds() <= config.JOB_BACKOFF_SECONDS
+    assert drain() == 0
+
+    # Once the backoff has passed it runs again and succeeds
+    db.execute(update(models.Job).where(models.Job.id == job.id).values(run_after=datetime.now()))
+    db.commit()
+    assert drain() == 1
+    db.refresh(job)
+    assert (job.status, job.attempts, job.last_error) == ("done", 2, None)
+    assert gateway.captured == Counter({f"booking-{booking_id}": 1})
+
+def test_backoff_doubles_up_to_the_cap():
+    for attempts in range(1, 12):
+        step = min(config.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), config.JOB_BACKOFF_MAX_SECONDS)
+        assert step / 2 <= jobs.backoff(attempts).total_seconds() <= step
+
+def test_capture_that_always_fails_ends_failed(api, db, new_user, booking_for, services, monkeypatch):
+    mailer, gateway = services
+    monkeypatch.setattr(config, "JOB_BACKOFF_SECONDS", 0)
+    doomed, fine = book(api, new_user(), booking_for, 2)
+    gateway.always_fail.add(f"booking-{doomed}")
+    drain()
+
+    job = capture_job(db, doomed)
+    assert (job.status, job.attempts) == ("failed", config.JOB_MAX_ATTEMPTS)
+    assert job.finished_at is not None and "ConnectionError" in job.last_error
+    assert gateway.attempts[f"booking-{doomed}"] == config.JOB_MAX_ATTEMPTS
+    assert gateway.captured == Counter({f"booking-{fine}": 1})
+    assert mailer.sent == Counter({doomed: 1, fine: 1})
+
+def test_polling_an_empty_queue_takes_no_write_lock(db):
+    # Another connection holds the write lock, as a long booking transaction
+    # would; an idle worker's poll must neither wait for it nor fail
+    db.execute(delete(models.Job))
+    db.commit()
+    writer = sqlite3.connect(make_url(config.DATABASE_URL).database, isolation_level=None)
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+
+        async def poll():
+            try:
+                async with AsyncSessionLocal() as session:
+                    return await jobs.claim(session)
+            finally:
+                await async_engine.dispose()
+
+        started = time.perf_counter()
+        assert asyncio.run(poll()) is None
+        assert time.perf_counter() - started < 1
+    finally:
+        writer.rollback()
+        writer.close()
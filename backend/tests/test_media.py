@@ -0,0 +1,73 @@
+# test_media.py
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import config
+import media
+import media_versions
+from conftest import BACKEND
+
+def test_schemas_do_not_import_media_or_database():
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, schemas; print(' '.join(sorted(sys.modules)))"],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert not {"media", "cache", "database", "models"} & set(imported)
+
+def test_thumbnail_urls_come_from_the_scan(api, monkeypatch):
+    image = sorted(os.listdir(os.path.join(config.MEDIA_ROOT, "images")))[0]
+    media_versions.refresh()
+
+    def no_file_access(*args, **kwargs):
+        raise AssertionError("thumbnail_url touched the filesystem")
+
+    monkeypatch.setattr(os, "stat", no_file_access)
+    monkeypatch.setattr(media_versions, "open", no_file_access, raising=False)
+    url = media_versions.thumbnail_url(f"/images/{image}")
+    monkeypatch.undo()
+
+    version = media_versions.content_version(os.path.join(config.MEDIA_ROOT, "images", image),
+                                             os.stat(os.path.join(config.MEDIA_ROOT, "images", image)))
+    assert url == f"/images/{image}?w={config.MEDIA_LIST_WIDTH}&v={version}"
+    assert media_versions.thumbnail_url("/images/missing.jpg") is None
+    response = api("GET", url)
+    assert response.status_code == 200 and response.headers["cache-control"].endswith("immutable")
+
+def test_serving_a_changed_file_updates_its_version(api, tmp_path, monkeypatch):
+    root = tmp_path / "media"
+    shutil.copytree(config.MEDIA_ROOT, root)
+    monkeypatch.setattr(config, "MEDIA_ROOT", str(root))
+    image = sorted(os.listdir(root / "images"))[0]
+    media_versions.refresh()
+    before = media_versions.thumbnail_url(f"/images/{image}")
+
+    with open(root / "images" / image, "ab") as file:
+        file.write(b"\0")
+    assert media_versions.thumbnail_url(f"/images/{image}") == before
+    assert api("GET", f"/images/{image}").status_code == 200
+    after = media_versions.thumbnail_url(f"/images/{image}")
+    assert after != before
+    media_versions.refresh()
+    assert media_versions.thumbnail_url(f"/images/{image}") == after
+    monkeypatch.undo()
+    media_versions.refresh()
+
+def test_first_request_hashes_off_the_event_loop(api, monkeypatch):
+    image = sorted(os.listdir(os.path.join(config.MEDIA_ROOT, "images")))[0]
+    monkeypatch.setattr(media_versions, "_hashes", {})
+    threads = []
+
+    def content_version(path, stat_result):
+        threads.append(threading.current_thread())
+        return hash_file(path, stat_result)
+
+    hash_file = media.content_version
+    monkeypatch.setattr(media, "content_version", content_version)
+    assert api("GET", f"/images/{image}").status_code == 200
+    assert threads and threading.main_thread() not in threads
+    # Once hashed, later requests don't hash again
+    assert api("GET", f"/images/{image}").status_code == 200
+    assert len(threads) == 1
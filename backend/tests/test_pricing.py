@@ -0,0 +1,24 @@
+# test_pricing.py
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import BACKEND
+from pricing import BASIS_POINTS, DemandSurge
+
+def test_surge_must_start_below_sold_out():
+    with pytest.raises(ValueError):
+        DemandSurge(BASIS_POINTS, 3000)
+    # Just below: the whole markup applies to a sold-out launch
+    assert DemandSurge(BASIS_POINTS - 1, 3000).adjustment(SimpleNamespace(load=BASIS_POINTS)) == 3000
+
+@pytest.mark.parametrize("start", ["100", "-1"])
+def test_config_rejects_surge_start_out_of_range(start):
+    result = subprocess.run(
+        [sys.executable, "-c", "import config"], cwd=BACKEND, capture_output=True, text=True,
+        env=dict(os.environ, PRICING_SURGE_START=start),
+    )
+    assert result.returncode != 0 and "PRICING_SURGE_START must be" in result.stderr
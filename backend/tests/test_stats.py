@@ -0,0 +1,76 @@
+# test_stats.py
+import asyncio
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+
+import migrations
+import models
+from changes import complete_trips
+from conftest import BACKEND
+from database import AsyncSessionLocal, async_engine
+
+def user_stats(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            "SELECT id, total_miles, completed_trips, traveler_level, destinations FROM users ORDER BY id"
+        ).fetchall()
+
+def test_migrating_shipped_database_keeps_stats(tmp_path):
+    # The shipped database predates booking-derived stats: its users' stats
+    # were entered by hand and none of its bookings is marked flown
+    path = tmp_path / "shipped.db"
+    shutil.copy(os.path.join(BACKEND, "space_travel.db"), path)
+    before = user_stats(path)
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    engine.dispose()
+
+    assert user_stats(path) == before
+    with sqlite3.connect(path) as conn:
+        assert all(miles > 0 for miles, in conn.execute("SELECT distance_miles FROM destinations"))
+
+def test_only_flown_trips_count(db):
+    # Seeded astro_explorer has one Completed trip (Orbital Hotel, 250 miles)
+    # plus a Confirmed and a Pending booking still ahead
+    user = db.scalars(select(models.User).where(models.User.username == "astro_explorer")).one()
+    assert (user.completed_trips, user.total_miles, user.destinations, user.traveler_level) == (1, 500, 1, 2)
+
+def test_confirmed_booking_leaves_stats_alone(api, db, new_user, booking_for):
+    user_id = new_user()
+    response = api("POST", "/bookings", json=booking_for(user_id))
+    assert response.status_code == 200, response.text
+    user = db.get(models.User, user_id)
+    db.refresh(user)
+    assert (user.completed_trips, user.total_miles, user.destinations, user.traveler_level) == (0, 0, 0, 1)
+
+def test_returned_trip_completes_and_counts(api, db, new_user, booking_for):
+    user_id = new_user()
+    created = api("POST", "/bookings", json=booking_for(user_id)).json()
+    # Time passes: the trip has been flown
+    booking = db.get(models.Booking, created["id"])
+    booking.departure_date -= timedelta(days=400)
+    booking.return_date = datetime.now() - timedelta(days=1)
+    db.commit()
+
+    async def complete():
+        try:
+            async with AsyncSessionLocal() as session:
+                completed = await complete_trips(session)
+                await session.commit()
+                return completed
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(complete()) == 1
+    db.refresh(booking)
+    assert booking.status == "Completed"
+    user = db.get(models.User, user_id)
+    db.refresh(user)
+    miles = 2 * db.get(models.Destination, booking.destination_id).distance_miles
+    assert (user.completed_trips, user.total_miles, user.destinations, user.traveler_level) == (1, miles, 1, 2)
+    # A second pass finds nothing left to complete
+    assert asyncio.run(complete()) == 0
@@ -0,0 +1,89 @@
+# test_user_bookings.py
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import make_url
+
+import config
+import migrations
+import models
+from conftest import BACKEND
+from database import async_engine
+
+def add_bookings(db, user_id, count):
+    # Spread over every seeded destination, so each booking joins different rows
+    seat_classes = db.scalars(select(models.SeatClass).order_by(models.SeatClass.id)).all()
+    for n in range(count):
+        seat_class = seat_classes[n % len(seat_classes)]
+        stay = db.scalars(
+            select(models.Accommodation).where(models.Accommodation.destination_id == seat_class.destination_id)
+        ).first()
+        departure = datetime.now() + timedelta(days=30 + n)
+        db.add(models.Booking(
+            user_id=user_id, destination_id=seat_class.destination_id, seat_class_id=seat_class.id,
+            accommodation_id=stay.id, departure_date=departure, return_date=departure + timedelta(days=10),
+            passengers=1, total_price=1000, status="Confirmed", booking_date=datetime.now(),
+        ))
+    db.commit()
+
+def statements_for(api, url):
+    # Statements the app sends to the database while answering one request
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = api("GET", url)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.text
+    return response.json(), statements
+
+def test_booking_list_queries_do_not_grow_with_bookings(api, db, new_user):
+    few, many = new_user(), new_user()
+    add_bookings(db, few, 1)
+    add_bookings(db, many, 12)
+
+    one, one_statements = statements_for(api, f"/users/{few}/bookings")
+    twelve, twelve_statements = statements_for(api, f"/users/{many}/bookings")
+    assert (len(one), len(twelve)) == (1, 12)
+    assert all(booking["destination"] and booking["seat_class"] and booking["accommodation"] for booking in twelve)
+    assert len(twelve_statements) == len(one_statements), twelve_statements
+
+def test_departure_window_pages_in_departure_order(api, db, new_user):
+    user_id = new_user()
+    add_bookings(db, user_id, 12)
+    window = {"departure_from": (datetime.now() + timedelta(days=32)).isoformat(),
+              "departure_to": (datetime.now() + timedelta(days=40)).isoformat()}
+    url = f"/users/{user_id}/bookings?limit=3&departure_from={window['departure_from']}&departure_to={window['departure_to']}"
+
+    departures, cursor = [], None
+    for _ in range(5):
+        response = api("GET", url + (f"&cursor={cursor}" if cursor else ""))
+        departures += [booking["departure_date"] for booking in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert len(departures) == 8 and departures == sorted(departures)
+
+    # The page is one index range: no scan of the user's other bookings and no sort
+    _, statements = statements_for(api, url)
+    statement, parameters = next((s, p) for s, p in statements if "FROM bookings" in s and "departure_date >=" in s)
+    with sqlite3.connect(make_url(config.DATABASE_URL).database) as conn:
+        plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters))
+    assert "ix_bookings_user_departure_date" in plan and "TEMP B-TREE" not in plan, plan
+
+def test_migration_extends_the_departure_index(tmp_path):
+    path = tmp_path / "shipped.db"
+    shutil.copy(os.path.join(BACKEND, "space_travel.db"), path)
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    engine.dispose()
+    with sqlite3.connect(path) as conn:
+        columns = [row[2] for row in conn.execute("PRAGMA index_info(ix_bookings_user_departure_date)")]
+    assert columns == ["user_id", "departure_date", "id"]